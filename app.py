@@ -1,11 +1,22 @@
 import os, time
 import json
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_from_directory
+import base64
+import hashlib
+import itertools
+import threading
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from flask import Flask, render_template, request, jsonify, send_from_directory, has_request_context
+from flask import g as flask_g  # request-scoped state; plain `g` is a common loop variable below
 from dotenv import load_dotenv
 import pymysql
 from pymongo import MongoClient
-from pymongo import ReturnDocument
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+# Appearances schema registry, shared with migrate_appearances.py
+from etl_full import APPEARANCE_COLLECTIONS, APPEARANCE_FIELDS, APPEARANCE_SORT_FIELDS
 import uuid
 
 load_dotenv()
@@ -20,24 +31,550 @@ conn_args = dict(
     autocommit=True
 )
 
+# --- MySQL connection pool ---
+class PoolTimeout(RuntimeError):
+    pass
+
+class MySQLPool:
+    """Bounded pool of PyMySQL connections.
+
+    Idle connections are pinged on checkout if they sat unused for more than
+    `ping_after` seconds and are retired once older than `max_lifetime`.
+    `acquire` blocks up to `timeout` seconds when all `size` connections are busy.
+    """
+
+    def __init__(self, size, max_lifetime, ping_after, timeout, **connect_args):
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.timeout = timeout
+        self.connect_args = connect_args
+        self._idle = deque()  # (conn, created_at, last_used)
+        self._open = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "created": 0,
+            "reused": 0,
+            "retired_lifetime": 0,
+            "discarded_broken": 0,
+            "waits": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "timeouts": 0,
+        }
+
+    def acquire(self):
+        t0 = time.perf_counter()
+        deadline = t0 + self.timeout
+        waited = False
+        conn = created_at = last_used = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, created_at, last_used = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"no MySQL connection available within {self.timeout}s (pool size {self.size})")
+                waited = True
+                self._cond.wait(remaining)
+
+        # Health checks happen outside the lock; the slot stays reserved for us
+        if conn is not None:
+            now = time.time()
+            if now - created_at > self.max_lifetime:
+                self._close(conn)
+                conn = None
+                self._bump("retired_lifetime")
+            elif now - last_used > self.ping_after:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception:
+                    self._close(conn)
+                    conn = None
+                    self._bump("discarded_broken")
+        if conn is None:
+            try:
+                conn = pymysql.connect(**self.connect_args)
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            conn._pool_created_at = time.time()
+            self._bump("created")
+        else:
+            conn._pool_created_at = created_at
+            self._bump("reused")
+
+        wait_ms = (time.perf_counter() - t0) * 1000.0
+        with self._cond:
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["waits"] += 1
+            self._stats["wait_ms_total"] += wait_ms
+            self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+        return conn
+
+    def release(self, conn, broken=False):
+        if broken or not conn.open:
+            self._close(conn)
+            with self._cond:
+                self._open -= 1
+                self._stats["discarded_broken"] += 1
+                self._cond.notify()
+            return
+        with self._cond:
+            self._idle.append((conn, conn._pool_created_at, time.time()))
+            self._cond.notify()
+
+    def snapshot(self):
+        with self._cond:
+            out = dict(self._stats)
+            out["size"] = self.size
+            out["open"] = self._open
+            out["idle"] = len(self._idle)
+            out["in_use"] = self._open - len(self._idle)
+        checkouts = out["checkouts"] or 1
+        out["wait_ms_avg"] = round(out["wait_ms_total"] / checkouts, 3)
+        out["wait_ms_total"] = round(out["wait_ms_total"], 2)
+        out["wait_ms_max"] = round(out["wait_ms_max"], 2)
+        return out
+
+    def _bump(self, key):
+        with self._cond:
+            self._stats[key] += 1
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+sql_pool = MySQLPool(
+    size=int(os.getenv("DB_POOL_SIZE", "10")),
+    max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+    ping_after=float(os.getenv("DB_POOL_PING_AFTER", "30")),
+    timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+    **conn_args
+)
+
+# Within a request the first checkout is pinned to flask.g and reused by every
+# run_sql / run_sql_ex call until the app context tears down.
+@contextmanager
+def sql_connection():
+    if has_request_context():
+        conn = flask_g.get("_sql_conn")
+        if conn is None:
+            conn = flask_g._sql_conn = sql_pool.acquire()
+        try:
+            yield conn
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            flask_g._sql_conn = None
+            sql_pool.release(conn, broken=True)
+            raise
+        return
+    conn = sql_pool.acquire()
+    broken = False
+    try:
+        yield conn
+    except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+        broken = True
+        raise
+    finally:
+        sql_pool.release(conn, broken=broken)
+
+@app.teardown_appcontext
+def release_sql_connection(exc):
+    conn = flask_g.pop("_sql_conn", None)
+    if conn is not None:
+        sql_pool.release(conn)
+
 def run_sql(sql, params=()):
     t0 = time.perf_counter()
-    with pymysql.connect(**conn_args) as conn:
+    with sql_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(sql, params)
             rows = cur.fetchall()
     ms = round((time.perf_counter() - t0) * 1000.0, 2)
     return rows, ms
 
+# Explicit transaction on the same (pinned) connection; pooled connections are
+# autocommit otherwise. Commits when the block exits, rolls back if it raises.
+@contextmanager
+def sql_transaction():
+    with sql_connection() as conn:
+        conn.begin()
+        try:
+            with conn.cursor() as cur:
+                yield cur
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+# --- player_season_stats maintenance (football_db_summary_tables.sql) ---
+# Rows are keyed (player_id, competition_id, season), '' standing in for a NULL
+# competition/season. Appearance and game writers collect the keys they touch
+# and refresh them inside their sql_transaction: each key is recomputed from
+# its appearances (one player's rows via ix_app_player_game), so the table
+# cannot drift the way +/- deltas can. Rows are upserted in key order and only
+# keys left without appearances are deleted (by primary key, existing rows
+# only): a DELETE-then-INSERT takes gap locks under REPEATABLE READ that let
+# two writers on neighbouring keys deadlock.
+PLAYER_SEASON_REFRESH_SQL = """
+  INSERT INTO player_season_stats
+  (player_id, competition_id, season, apps, minutes, goals, assists, yellows, reds, top_club_id, top_club_goals)
+  WITH per AS (
+    SELECT a.player_club_id, COUNT(*) AS apps, SUM(a.minutes_played) AS minutes, SUM(a.goals) AS goals,
+           SUM(a.assists) AS assists, SUM(a.yellow_cards) AS yellows, SUM(a.red_cards) AS reds
+    FROM appearance a
+    JOIN game g ON g.game_id = a.game_id
+    WHERE a.player_id = %s AND COALESCE(g.competition_id,'') = %s AND COALESCE(g.season,'') = %s
+    GROUP BY a.player_club_id
+  ), best AS (
+    SELECT player_club_id, goals FROM per ORDER BY goals DESC LIMIT 1
+  )
+  SELECT %s, %s, %s, SUM(apps), SUM(minutes), SUM(goals), SUM(assists), SUM(yellows), SUM(reds),
+         (SELECT player_club_id FROM best), (SELECT goals FROM best)
+  FROM per
+  HAVING COUNT(*) > 0
+  ON DUPLICATE KEY UPDATE
+    apps = VALUES(apps), minutes = VALUES(minutes), goals = VALUES(goals), assists = VALUES(assists),
+    yellows = VALUES(yellows), reds = VALUES(reds),
+    top_club_id = VALUES(top_club_id), top_club_goals = VALUES(top_club_goals)
+"""
+
+PLAYER_SEASON_EMPTY_SQL = """
+  SELECT EXISTS(SELECT 1 FROM appearance a JOIN game g ON g.game_id = a.game_id
+                WHERE a.player_id = %s AND COALESCE(g.competition_id,'') = %s
+                  AND COALESCE(g.season,'') = %s) AS has_apps,
+         EXISTS(SELECT 1 FROM player_season_stats
+                WHERE player_id = %s AND competition_id = %s AND season = %s) AS has_row
+"""
+
+def player_season_keys(cur, where, params):
+    cur.execute(f"""
+      SELECT DISTINCT a.player_id, COALESCE(g.competition_id,'') AS competition_id,
+             COALESCE(g.season,'') AS season
+      FROM appearance a
+      JOIN game g ON g.game_id = a.game_id
+      WHERE {where}
+    """, params)
+    return {(r["player_id"], r["competition_id"], r["season"]) for r in cur.fetchall()}
+
+def refresh_player_season_stats(cur, keys):
+    for key in sorted(keys):
+        cur.execute(PLAYER_SEASON_REFRESH_SQL, key + key)
+        if cur.rowcount:
+            continue
+        # 0 affected rows: either unchanged, or the key has no appearances left
+        cur.execute(PLAYER_SEASON_EMPTY_SQL, key + key)
+        r = cur.fetchone()
+        if not r["has_apps"] and r["has_row"]:
+            cur.execute("DELETE FROM player_season_stats WHERE player_id=%s AND competition_id=%s AND season=%s", key)
+
+# --- club_market_totals maintenance (football_db_summary_tables.sql) ---
+# Player and club writers refresh the totals of the clubs they touched inside
+# their transaction (primary-key upserts/deletes only, locked in club_id order)
+# and get back the highest old/new total involved. Dense ranks above that bound
+# cannot change, so after commit rerank_club_market() rewrites only the rows at
+# or below it whose rank actually moved, in a short transaction of its own.
+# Concurrent writers coalesce: one thread re-ranks for the highest pending
+# bound while the others return immediately. Across app processes the re-rank
+# runs under the MySQL named lock club_market_rerank: two workers reading the
+# same ranks and writing back their own results would leave stale ones behind.
+def refresh_club_market_totals(cur, club_ids):
+    club_ids = sorted({c for c in club_ids if c is not None})
+    if not club_ids:
+        return None
+    marks = ",".join(["%s"] * len(club_ids))
+    cur.execute(f"SELECT club_id, total_market_value_eur FROM club_market_totals "
+                f"WHERE club_id IN ({marks}) ORDER BY club_id FOR UPDATE", club_ids)
+    totals = [r["total_market_value_eur"] for r in cur.fetchall()]
+    cur.execute(f"""
+      SELECT c.club_id, COALESCE(SUM(p.market_value_eur),0) AS total, COUNT(p.player_id) AS n
+      FROM club c
+      LEFT JOIN player p
+        ON p.current_club_id = c.club_id
+       AND p.market_value_eur IS NOT NULL
+      WHERE c.club_id IN ({marks})
+      GROUP BY c.club_id
+      ORDER BY c.club_id
+    """, club_ids)
+    rows = cur.fetchall()
+    if rows:
+        cur.executemany("""
+          INSERT INTO club_market_totals (club_id, total_market_value_eur, player_count)
+          VALUES (%s, %s, %s)
+          ON DUPLICATE KEY UPDATE total_market_value_eur = VALUES(total_market_value_eur),
+                                  player_count = VALUES(player_count)
+        """, [(r["club_id"], int(r["total"]), r["n"]) for r in rows])
+    # Deleted clubs lose their row
+    gone = [c for c in club_ids if c not in {r["club_id"] for r in rows}]
+    if gone:
+        cur.execute(f"DELETE FROM club_market_totals WHERE club_id IN ({','.join(['%s'] * len(gone))})", gone)
+    totals += [int(r["total"]) for r in rows]
+    return max(totals) if totals else None
+
+# Dense ranks for the clubs with total <= bound, continuing from the lowest
+# club above the bound. rows: (club_id, total, current rank), total DESC.
+# Returns [(new rank, club_id)] for the rows whose rank changed.
+def dense_rank_changes(rows, base_rank):
+    changes, rank, prev = [], base_rank or 0, None
+    for club_id, total, current in rows:
+        if total != prev:
+            rank, prev = rank + 1, total
+        if current != rank:
+            changes.append((rank, club_id))
+    return changes
+
+# GET_LOCK belongs to the session and survives COMMIT, so it is released
+# explicitly after the block (which may run its own sql_transaction).
+@contextmanager
+def sql_named_lock(name, timeout):
+    with sql_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT GET_LOCK(%s, %s) AS got", (name, timeout))
+            if (cur.fetchone() or {}).get("got") != 1:
+                raise TimeoutError(f"could not get MySQL lock {name} within {timeout}s")
+        try:
+            yield
+        finally:
+            with conn.cursor() as cur:
+                cur.execute("SELECT RELEASE_LOCK(%s)", (name,))
+
+CLUB_RANK_LOCK_TIMEOUT = int(os.getenv("CLUB_RANK_LOCK_TIMEOUT", "10"))
+_club_rank_lock = threading.Lock()
+_club_rank_running = threading.Lock()
+_club_rank_pending = None
+
+def rerank_club_market(bound):
+    global _club_rank_pending
+    if bound is None:
+        return
+    with _club_rank_lock:
+        _club_rank_pending = bound if _club_rank_pending is None else max(_club_rank_pending, bound)
+    while True:
+        if not _club_rank_running.acquire(blocking=False):
+            return  # the running thread picks the pending bound up
+        try:
+            while True:
+                with _club_rank_lock:
+                    bound, _club_rank_pending = _club_rank_pending, None
+                if bound is None:
+                    break
+                try:
+                    with sql_named_lock("club_market_rerank", CLUB_RANK_LOCK_TIMEOUT), sql_transaction() as cur:
+                        cur.execute("""
+                          SELECT market_value_rank AS r FROM club_market_totals
+                          WHERE total_market_value_eur > %s
+                          ORDER BY total_market_value_eur ASC LIMIT 1
+                        """, (bound,))
+                        above = cur.fetchone()
+                        cur.execute("""
+                          SELECT club_id, total_market_value_eur, market_value_rank FROM club_market_totals
+                          WHERE total_market_value_eur <= %s
+                          ORDER BY total_market_value_eur DESC
+                        """, (bound,))
+                        changes = dense_rank_changes(
+                            [(r["club_id"], r["total_market_value_eur"], r["market_value_rank"]) for r in cur.fetchall()],
+                            above["r"] if above else 0)
+                        if changes:
+                            cur.executemany("UPDATE club_market_totals SET market_value_rank=%s WHERE club_id=%s",
+                                            sorted(changes, key=lambda c: c[1]))
+                except BaseException:
+                    # Keep the bound queued, so the next re-rank still covers it
+                    with _club_rank_lock:
+                        _club_rank_pending = bound if _club_rank_pending is None else max(_club_rank_pending, bound)
+                    raise
+        finally:
+            _club_rank_running.release()
+        # A bound queued between the drain and the release would otherwise be lost
+        with _club_rank_lock:
+            if _club_rank_pending is None:
+                return
+
+# --- SQL diagnostics (EXPLAIN / session status) ---
+# SQL_DIAGNOSTICS selects when run_sql_ex collects plans:
+#   off     - never
+#   demand  - only for requests carrying perf=1 (default)
+#   sampled - perf=1 inline, plus 1 in SQL_DIAG_SAMPLE_N calls captured on a background worker
+#   async   - perf=1 inline, plus the first call of every query fingerprint captured on a background worker
+# Background captures are cached by query fingerprint (SQL text + parameter
+# shape) and attached to later responses, labelled as a sample when they came
+# from a call with other values, so the request path only pays for the real query.
+SQL_DIAG_MODE = os.getenv("SQL_DIAGNOSTICS", "demand").strip().lower()
+SQL_DIAG_SAMPLE_N = max(int(os.getenv("SQL_DIAG_SAMPLE_N", "100")), 1)
+SQL_DIAG_TTL = float(os.getenv("SQL_DIAG_TTL", "600"))
+SQL_DIAG_CACHE_SIZE = int(os.getenv("SQL_DIAG_CACHE_SIZE", "256"))
+
+_diag_cache = OrderedDict()  # fingerprint -> captured plan
+_diag_inflight = set()
+_diag_lock = threading.Lock()
+_diag_counter = itertools.count(1)
+_diag_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sql-diag")
+
+# Coarse shape of the bound parameters: NULL vs value, type, and the order of
+# magnitude of numbers / length of strings. A plan is only reused for calls of
+# the same shape (e.g. not across NULL vs non-NULL filters or tiny vs huge
+# OFFSETs); within a shape it is still a sample from another call, see
+# explain_query / explain_same_params in run_sql_ex.
+def param_shape(params):
+    def one(v):
+        if v is None:
+            return "n"
+        if isinstance(v, bool):
+            return "b"
+        if isinstance(v, (int, float)):
+            return f"i{len(str(int(abs(v))))}"
+        return f"s{min(len(str(v)), 255).bit_length()}"
+    return ",".join(one(v) for v in params or ())
+
+def sql_fingerprint(sql, params=()):
+    key = " ".join(sql.split()) + "|" + param_shape(params)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+def _want_inline_diagnostics():
+    if SQL_DIAG_MODE == "off" or not has_request_context():
+        return False
+    return request.args.get("perf") == "1"
+
+def _sql_explain(cur, sql, params):
+    """Return (explain_type, explain) preferring EXPLAIN ANALYZE, falling back to FORMAT=JSON."""
+    try:
+        cur.execute(f"EXPLAIN ANALYZE {sql}", params)
+        txt = []
+        for r in cur.fetchall():
+            val = next(iter(r.values())) if isinstance(r, dict) else str(r)
+            if val is not None:
+                txt.append(str(val))
+        return "analyze", ("\n".join(txt) if txt else None)
+    except Exception:
+        try:
+            cur.execute(f"EXPLAIN FORMAT=JSON {sql}", params)
+            exp = cur.fetchone()
+            return "json", (next(iter(exp.values())) if exp else None)
+        except Exception:
+            return None, None
+
+def _estimate_rows_examined(explain_type, explain):
+    # Estimate from EXPLAIN JSON when session counters are unavailable
+    if not explain or explain_type != "json":
+        return None
+    try:
+        ej = json.loads(explain) if isinstance(explain, str) else (explain if isinstance(explain, dict) else None)
+        def sum_rows(node):
+            if node is None:
+                return 0
+            total = 0
+            if isinstance(node, dict):
+                for k in ("rows", "rows_examined_per_scan", "rows_produced_per_join"):
+                    v = node.get(k)
+                    if isinstance(v, (int, float)):
+                        total += int(v)
+                for v in node.values():
+                    total += sum_rows(v)
+            elif isinstance(node, list):
+                for v in node:
+                    total += sum_rows(v)
+            return total
+        est = sum_rows(ej)
+        return int(est) if est > 0 else None
+    except Exception:
+        return None
+
+def _bind_sql_for_display(sql, params):
+    # Display version of the SQL with parameters bound (for UI only)
+    try:
+        def _fmt_param(v):
+            if v is None:
+                return 'NULL'
+            if isinstance(v, (int, float)):
+                return str(v)
+            s = str(v).replace("'", "''")
+            return f"'{s}'"
+        parts = sql.split('%s')
+        bound_fragments = []
+        for i, part in enumerate(parts):
+            bound_fragments.append(part)
+            if i < len(params):
+                bound_fragments.append(_fmt_param(params[i]))
+        return ''.join(bound_fragments)
+    except Exception:
+        return sql
+
+def _diag_cached(fp):
+    with _diag_lock:
+        entry = _diag_cache.get(fp)
+        if entry is None:
+            return None
+        if time.time() - entry["captured_at"] > SQL_DIAG_TTL:
+            del _diag_cache[fp]
+            return None
+        _diag_cache.move_to_end(fp)
+        return entry
+
+def _diag_capture(fp, sql, params):
+    try:
+        t0 = time.perf_counter()
+        with sql_connection() as conn:
+            with conn.cursor() as cur:
+                explain_type, explain = _sql_explain(cur, sql, params)
+        entry = {
+            "explain_type": explain_type,
+            "explain": explain,
+            "diagnostics_ms": round((time.perf_counter() - t0) * 1000.0, 2),
+            "rows_examined_est": _estimate_rows_examined(explain_type, explain),
+            "query": _bind_sql_for_display(sql, params),
+            "params": list(params),
+            "captured_at": time.time(),
+        }
+        with _diag_lock:
+            _diag_cache[fp] = entry
+            _diag_cache.move_to_end(fp)
+            while len(_diag_cache) > SQL_DIAG_CACHE_SIZE:
+                _diag_cache.popitem(last=False)
+    except Exception:
+        pass
+    finally:
+        with _diag_lock:
+            _diag_inflight.discard(fp)
+
+def _diag_maybe_schedule(fp, sql, params, have_cached):
+    if SQL_DIAG_MODE == "sampled":
+        if next(_diag_counter) % SQL_DIAG_SAMPLE_N != 0:
+            return False
+    elif SQL_DIAG_MODE == "async":
+        if have_cached:
+            return False
+    else:
+        return False
+    with _diag_lock:
+        if fp in _diag_inflight:
+            return False
+        _diag_inflight.add(fp)
+    _diag_worker.submit(_diag_capture, fp, sql, tuple(params))
+    return True
+
 # Extended SQL runner with performance diagnostics
 def run_sql_ex(sql, params=()):
     """Execute SQL and collect performance diagnostics with separated timings.
 
     Returns (rows, execution_ms, perf) where perf contains:
         rows_examined, rows_sent, explain_type, explain,
-        execution_ms, diagnostics_ms, total_ms.
-    (Query cache stats removed for simplicity.)
+        execution_ms, diagnostics_ms, total_ms, fingerprint, diagnostics.
+    Plans are only computed inline when the request asks for perf=1; otherwise
+    perf carries the last background capture for this query fingerprint (if any),
+    see SQL_DIAGNOSTICS above. (Query cache stats removed for simplicity.)
     """
+    fp = sql_fingerprint(sql, params)
     perf = {
         "rows_examined": None,
         "rows_sent": None,
@@ -46,18 +583,23 @@ def run_sql_ex(sql, params=()):
         "execution_ms": None,
         "diagnostics_ms": None,
         "total_ms": None,
+        "fingerprint": fp,
+        "diagnostics": "off",
     }
+    inline = _want_inline_diagnostics()
     t_total_start = time.perf_counter()
-    with pymysql.connect(**conn_args) as conn:
+    with sql_connection() as conn:
         with conn.cursor() as cur:
-            # Capture before-status
-            try:
-                cur.execute("SHOW SESSION STATUS LIKE 'Rows_examined'")
-                rex_before = int((cur.fetchone() or {}).get('Value', 0))
-                cur.execute("SHOW SESSION STATUS LIKE 'Rows_sent'")
-                rse_before = int((cur.fetchone() or {}).get('Value', 0))
-            except Exception:
-                rex_before = rse_before = None
+            rex_before = rse_before = None
+            if inline:
+                # Capture before-status
+                try:
+                    cur.execute("SHOW SESSION STATUS LIKE 'Rows_examined'")
+                    rex_before = int((cur.fetchone() or {}).get('Value', 0))
+                    cur.execute("SHOW SESSION STATUS LIKE 'Rows_sent'")
+                    rse_before = int((cur.fetchone() or {}).get('Value', 0))
+                except Exception:
+                    rex_before = rse_before = None
 
             # Main query timing
             t_exec_start = time.perf_counter()
@@ -65,93 +607,61 @@ def run_sql_ex(sql, params=()):
             rows = cur.fetchall()
             perf["execution_ms"] = round((time.perf_counter() - t_exec_start) * 1000.0, 2)
 
-            # After-status deltas
-            try:
-                if rex_before is not None:
-                    cur.execute("SHOW SESSION STATUS LIKE 'Rows_examined'")
-                    rex_after = int((cur.fetchone() or {}).get('Value', 0))
-                    perf["rows_examined"] = max(rex_after - rex_before, 0)
-                if rse_before is not None:
-                    cur.execute("SHOW SESSION STATUS LIKE 'Rows_sent'")
-                    rse_after = int((cur.fetchone() or {}).get('Value', 0))
-                    perf["rows_sent"] = max(rse_after - rse_before, 0)
-            except Exception:
-                pass
-
-            # Diagnostics timing starts
-            t_diag_start = time.perf_counter()
-            explain_sql = f"EXPLAIN ANALYZE {sql}"
-            try:
-                cur.execute(explain_sql, params)
-                exp_rows = cur.fetchall()
-                txt = []
-                for r in exp_rows:
-                    val = next(iter(r.values())) if isinstance(r, dict) else str(r)
-                    if val is not None:
-                        txt.append(str(val))
-                perf["explain_type"] = "analyze"
-                perf["explain"] = "\n".join(txt) if txt else None
-            except Exception:
+            if inline:
+                # After-status deltas
                 try:
-                    cur.execute(f"EXPLAIN FORMAT=JSON {sql}", params)
-                    exp = cur.fetchone()
-                    val = next(iter(exp.values())) if exp else None
-                    perf["explain_type"] = "json"
-                    perf["explain"] = val
+                    if rex_before is not None:
+                        cur.execute("SHOW SESSION STATUS LIKE 'Rows_examined'")
+                        rex_after = int((cur.fetchone() or {}).get('Value', 0))
+                        perf["rows_examined"] = max(rex_after - rex_before, 0)
+                    if rse_before is not None:
+                        cur.execute("SHOW SESSION STATUS LIKE 'Rows_sent'")
+                        rse_after = int((cur.fetchone() or {}).get('Value', 0))
+                        perf["rows_sent"] = max(rse_after - rse_before, 0)
                 except Exception:
-                    perf["explain_type"] = None
-                    perf["explain"] = None
+                    pass
+
+                # Diagnostics timing starts
+                t_diag_start = time.perf_counter()
+                perf["explain_type"], perf["explain"] = _sql_explain(cur, sql, params)
+                perf["diagnostics_ms"] = round((time.perf_counter() - t_diag_start) * 1000.0, 2)
+                perf["diagnostics"] = "inline"
+    perf["total_ms"] = round((time.perf_counter() - t_total_start) * 1000.0, 2)
 
-            perf["diagnostics_ms"] = round((time.perf_counter() - t_diag_start) * 1000.0, 2)
-        perf["total_ms"] = round((time.perf_counter() - t_total_start) * 1000.0, 2)
+    if inline:
         # Fallback: if rows_examined is 0 or None, try to estimate from EXPLAIN JSON
         if not perf.get("rows_examined"):
-            try:
-                import json
-                exp = perf.get("explain")
-                if exp and perf.get("explain_type") == "json":
-                    ej = json.loads(exp) if isinstance(exp, str) else (exp if isinstance(exp, dict) else None)
-                    def sum_rows(node):
-                        if node is None:
-                            return 0
-                        total = 0
-                        if isinstance(node, dict):
-                            for k in ("rows", "rows_examined_per_scan", "rows_produced_per_join"):
-                                v = node.get(k)
-                                if isinstance(v, (int, float)):
-                                    total += int(v)
-                            for v in node.values():
-                                total += sum_rows(v)
-                        elif isinstance(node, list):
-                            for v in node:
-                                total += sum_rows(v)
-                        return total
-                    est = sum_rows(ej)
-                    if isinstance(est, (int, float)) and est > 0:
-                        perf["rows_examined"] = int(est)
-            except Exception:
-                pass
-        # Produce a display version of the SQL with parameters bound (for UI only)
-        try:
-            def _fmt_param(v):
-                if v is None:
-                    return 'NULL'
-                if isinstance(v, (int, float)):
-                    return str(v)
-                s = str(v).replace("'", "''")
-                return f"'{s}'"
-            parts = sql.split('%s')
-            bound_fragments = []
-            for i, part in enumerate(parts):
-                bound_fragments.append(part)
-                if i < len(params):
-                    bound_fragments.append(_fmt_param(params[i]))
-            perf["query"] = ''.join(bound_fragments)
-        except Exception:
-            perf["query"] = sql
+            est = _estimate_rows_examined(perf["explain_type"], perf["explain"])
+            if est:
+                perf["rows_examined"] = est
+    else:
+        perf["rows_sent"] = len(rows)
+        cached = _diag_cached(fp)
+        if cached:
+            perf["explain_type"] = cached["explain_type"]
+            perf["explain"] = cached["explain"]
+            perf["rows_examined"] = cached["rows_examined_est"]
+            perf["explain_captured_at"] = int(cached["captured_at"])
+            # The plan was captured for an earlier call of the same shape,
+            # possibly with other values (another club, season, ...)
+            perf["explain_query"] = cached["query"]
+            perf["explain_same_params"] = cached["params"] == list(params)
+            perf["diagnostics"] = "cached" if perf["explain_same_params"] else "cached_sample"
+        if _diag_maybe_schedule(fp, sql, params, have_cached=bool(cached)):
+            perf["diagnostics"] = "scheduled"
+    perf["query"] = _bind_sql_for_display(sql, params)
     # For backward compatibility ms returns execution time only
     return rows, perf["execution_ms"], perf
 
+# Cached background plans, keyed by query fingerprint (SQL text + parameter shape)
+@app.get("/api/sql/diagnostics")
+def api_sql_diagnostics():
+    with _diag_lock:
+        entries = [dict(fingerprint=fp, **{k: v for k, v in e.items() if k not in ("explain", "params")})
+                   for fp, e in _diag_cache.items()]
+        inflight = len(_diag_inflight)
+    return jsonify(dict(mode=SQL_DIAG_MODE, sample_n=SQL_DIAG_SAMPLE_N, ttl_s=SQL_DIAG_TTL, inflight=inflight, entries=entries))
+
 # Mongo connection for optional data source
 mongo_client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
 mongo_db = mongo_client.get_database(os.getenv("MONGO_DB", "football_nonrelationaldb"))
@@ -162,6 +672,262 @@ def run_mongo(fn):
   ms = round((time.perf_counter() - t0) * 1000.0, 2)
   return result, ms
 
+# etl_full.py skips docs whose stored _hash matches the hash of the SQL row, so
+# every write below that changes ETL-built fields also unsets _hash: the next
+# ETL run then rewrites the doc from MySQL instead of trusting a stale hash.
+
+# Cross-process lock on the Mongo side: one doc per lock name in the locks
+# collection. Taking it is an upsert that only matches an expired doc, so while
+# another process holds it the insert fails on the _id; expires lets a lock
+# left by a dead process go after MONGO_LOCK_TTL seconds.
+MONGO_LOCK_TTL = int(os.getenv("MONGO_LOCK_TTL", "30"))
+
+@contextmanager
+def mongo_lock(db, name, timeout):
+    owner, deadline = uuid.uuid4().hex, time.monotonic() + timeout
+    while True:
+        now = datetime.utcnow()
+        try:
+            db.locks.update_one({"_id": name, "expires": {"$lt": now}},
+                                {"$set": {"owner": owner, "expires": now + timedelta(seconds=MONGO_LOCK_TTL)}},
+                                upsert=True)
+            break
+        except DuplicateKeyError:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"could not get Mongo lock {name} within {timeout}s")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        db.locks.delete_one({"_id": name, "owner": owner})
+
+# Mongo side of club_market_totals: recompute total_market_value_eur /
+# player_count of the given clubs from the players collection, then the stored
+# market_value_rank of the clubs at or below the highest old/new total (same
+# dense rank as etl_full.py; ranks above that bound cannot change). Runs under
+# the club_market_rerank lock, like rerank_club_market().
+def mongo_refresh_club_market(db, club_ids):
+    club_ids = [c for c in set(club_ids) if c is not None]
+    if not club_ids:
+        return
+    with mongo_lock(db, "club_market_rerank", CLUB_RANK_LOCK_TIMEOUT):
+        _mongo_refresh_club_market(db, club_ids)
+
+def _mongo_refresh_club_market(db, club_ids):
+    bound = [d.get("total_market_value_eur") or 0
+             for d in db.clubs.find({"club_id": {"$in": club_ids}}, {"total_market_value_eur": 1})]
+    totals = {d["_id"]: d for d in db.players.aggregate([
+        {"$match": {"current_club_id": {"$in": club_ids}, "market_value_eur": {"$ne": None}}},
+        {"$group": {"_id": "$current_club_id", "total": {"$sum": "$market_value_eur"}, "n": {"$sum": 1}}},
+    ])}
+    for cid in club_ids:
+        t = totals.get(cid) or {}
+        db.clubs.update_one({"club_id": cid}, {"$set": {
+            "total_market_value_eur": t.get("total", 0), "player_count": t.get("n", 0)},
+            "$unset": {"_hash": ""}})
+        bound.append(t.get("total", 0))
+    bound = max(bound)
+    above = db.clubs.find_one({"total_market_value_eur": {"$gt": bound}}, {"market_value_rank": 1},
+                              sort=[("total_market_value_eur", 1)])
+    rows = ((d["_id"], d.get("total_market_value_eur") or 0, d.get("market_value_rank"))
+            for d in db.clubs.find({"$or": [{"total_market_value_eur": {"$lte": bound}},
+                                            {"total_market_value_eur": None}]},
+                                   {"total_market_value_eur": 1, "market_value_rank": 1})
+                                  .sort("total_market_value_eur", -1))
+    # market_value_rank is set outside club_doc and not hashed, so _hash can stay
+    ops = [UpdateOne({"_id": _id}, {"$set": {"market_value_rank": rank}})
+           for rank, _id in dense_rank_changes(rows, (above or {}).get("market_value_rank"))]
+    if ops:
+        db.clubs.bulk_write(ops, ordered=False)
+
+# --- Mongo club_transfer_roi maintenance ---
+# One doc per transfer with the player's appearance totals on or after the
+# transfer date (built by etl_full.py --transferroi). The write endpoints
+# recompute the affected transfers server-side and $merge them back; a match
+# on transfers._id or player_id is index-backed on both collections.
+def _roi_per(num, den):
+    # NULL for a 0/NULL fee or denominator, like the SQL table's NULLIF()s
+    return {"$cond": [{"$and": [{"$gt": [num, 0]}, {"$gt": [den, 0]}]},
+                      {"$round": [{"$divide": [num, den]}, 2]}, None]}
+
+def transfer_roi_pipeline(match):
+    return [
+        {"$match": match},
+        {"$lookup": {
+            "from": "appearances",
+            "let": {"pid": "$player_id", "tdate": "$transfer_date"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$player_id", "$$pid"]},
+                    {"$gte": ["$date", "$$tdate"]},
+                ]}}},
+                {"$group": {
+                    "_id": None,
+                    "apps": {"$sum": 1},
+                    "minutes": {"$sum": {"$ifNull": ["$minutes_played", 0]}},
+                    "goals": {"$sum": {"$ifNull": ["$goals", 0]}},
+                    "assists": {"$sum": {"$ifNull": ["$assists", 0]}},
+                }},
+            ],
+            "as": "post",
+        }},
+        {"$set": {"post": {"$ifNull": [{"$arrayElemAt": ["$post", 0]}, {}]}}},
+        {"$project": {
+            "_id": 1,
+            "player_id": 1,
+            "player_name": 1,
+            "transfer_date": 1,
+            "transfer_season": 1,
+            "to": {"club_id": "$to.club_id", "name": "$to.name"},
+            "transfer_fee": 1,
+            "market_value_in_eur": 1,
+            "post_apps": {"$ifNull": ["$post.apps", 0]},
+            "post_minutes": {"$ifNull": ["$post.minutes", 0]},
+            "post_goals": {"$ifNull": ["$post.goals", 0]},
+            "post_assists": {"$ifNull": ["$post.assists", 0]},
+        }},
+        {"$set": {
+            "eur_per_minutes": _roi_per("$transfer_fee", "$post_minutes"),
+            "eur_per_contrib": _roi_per("$transfer_fee", {"$add": ["$post_goals", "$post_assists"]}),
+            "updated_at": int(time.time()),
+        }},
+    ]
+
+def mongo_refresh_transfer_roi(db, match):
+    db.transfers.aggregate(transfer_roi_pipeline(match) + [
+        {"$merge": {"into": "club_transfer_roi", "on": "_id",
+                    "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ])
+
+# --- Keyset pagination for the list endpoints ---
+# ?after=<token> (the previous response's next_after) seeks past the last row's
+# (sort key, id) instead of OFFSET/skip, so a deep page costs the same as the
+# first. ?page=N still works (OFFSET) when no token is given. NULL sort keys
+# sort lowest in MySQL and MongoDB alike, but a token only carries the last row
+# of the backend that issued it: clubs sort by name under MySQL's
+# utf8mb4_0900_ai_ci collation (case/accent-insensitive) and under MongoDB's
+# binary order, so pages can end on different rows. Clients keep one token per
+# backend (see compare mode in the list templates).
+def encode_after(*key):
+    raw = json.dumps(key, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_after(token):
+    if not token:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except Exception:
+        raise ValueError("Invalid after token")
+    if not isinstance(key, list) or len(key) != 2:
+        raise ValueError("Invalid after token")
+    return key
+
+def next_after(rows, page_size, sort_key, id_key):
+    if len(rows) < page_size:
+        return None
+    return encode_after(rows[-1].get(sort_key), rows[-1].get(id_key))
+
+def sql_seek(col, id_col, after, desc=True):
+    val, last_id = after
+    op = "<" if desc else ">"
+    if val is None:
+        if desc:
+            return f"({col} IS NULL AND {id_col} < %s)", [last_id]
+        return f"(({col} IS NULL AND {id_col} > %s) OR {col} IS NOT NULL)", [last_id]
+    cond = f"{col} {op} %s OR ({col} = %s AND {id_col} {op} %s)"
+    if desc:
+        cond += f" OR {col} IS NULL"
+    return f"({cond})", [val, val, last_id]
+
+def mongo_seek(query, field, id_field, after, desc=True):
+    val, last_id = after
+    op = "$lt" if desc else "$gt"
+    if val is None:
+        if desc:
+            seek = {field: None, id_field: {"$lt": last_id}}
+        else:
+            seek = {"$or": [{field: None, id_field: {"$gt": last_id}}, {field: {"$ne": None}}]}
+    else:
+        ors = [{field: {op: val}}, {field: val, id_field: {op: last_id}}]
+        if desc:
+            ors.append({field: None})
+        seek = {"$or": ors}
+    return {"$and": [query, seek]} if query else seek
+
+# --- Totals for the paginated lists ---
+# The lists' COUNT(*) / count_documents ran on every page flip and often cost
+# more than the page itself. list_total() caches exact counts per backend, list
+# and normalized filter for COUNT_CACHE_TTL seconds; writes drop the affected
+# lists' entries (see _invalidate_list_counts). Unfiltered lists answer from
+# table statistics instead (information_schema TABLE_ROWS for InnoDB,
+# estimated_document_count for Mongo) and report total_is_estimate=true.
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "300"))
+COUNT_CACHE_SIZE = int(os.getenv("COUNT_CACHE_SIZE", "1024"))
+COUNT_ESTIMATE_UNFILTERED = os.getenv("COUNT_ESTIMATE_UNFILTERED", "1") == "1"
+
+_count_cache = OrderedDict()  # (backend, table, filters) -> (total, counted_at)
+_count_gen = {}  # table -> write generation; a count started before a write is not cached
+_count_lock = threading.Lock()
+
+# Write endpoint resource (/api/<resource>/..., /api/mongo/<resource>/...) ->
+# lists whose totals it can change. Player and club names are searched by the
+# appearance and transfer lists, and deletes cascade.
+COUNT_INVALIDATES = {
+    "player": ("player", "appearance", "transfer"),
+    "club": ("club", "player", "game", "appearance", "transfer"),
+    "match": ("game", "appearance", "game_event"),
+    "game-event": ("game_event",),
+    "appearance": ("appearance",),
+    "transfer": ("transfer",),
+}
+
+def sql_estimated_rows(table):
+    rows, _ = run_sql(
+        "SELECT TABLE_ROWS AS n FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,))
+    return int(rows[0]["n"] or 0) if rows else 0
+
+def list_total(backend, table, filters, count_fn, estimate_fn=None):
+    """Return (total, total_is_estimate) for a list endpoint."""
+    key = tuple(sorted(
+        (k, v.strip().lower() if k == "search" else v)
+        for k, v in filters.items() if v not in (None, "")
+    ))
+    if not key and estimate_fn is not None and COUNT_ESTIMATE_UNFILTERED:
+        return estimate_fn(), True
+    cache_key = (backend, table, key)
+    with _count_lock:
+        entry = _count_cache.get(cache_key)
+        if entry is not None and time.time() - entry[1] <= COUNT_CACHE_TTL:
+            _count_cache.move_to_end(cache_key)
+            return entry[0], False
+        gen = _count_gen.get(table, 0)
+    total = count_fn()
+    with _count_lock:
+        if _count_gen.get(table, 0) == gen:
+            _count_cache[cache_key] = (total, time.time())
+            _count_cache.move_to_end(cache_key)
+            while len(_count_cache) > COUNT_CACHE_SIZE:
+                _count_cache.popitem(last=False)
+    return total, False
+
+def invalidate_counts(*tables):
+    with _count_lock:
+        for table in tables:
+            _count_gen[table] = _count_gen.get(table, 0) + 1
+        for cache_key in [k for k in _count_cache if k[1] in tables]:
+            del _count_cache[cache_key]
+
+@app.after_request
+def _invalidate_list_counts(resp):
+    if request.method in ("POST", "PUT", "DELETE") and resp.status_code < 400 and request.url_rule is not None:
+        parts = [p for p in request.url_rule.rule.split("/") if p and p not in ("api", "mongo")]
+        tables = COUNT_INVALIDATES.get(parts[0]) if parts else None
+        if tables:
+            invalidate_counts(*tables)
+    return resp
+
 # Helper: extract execution stats totals from Mongo explain output (executionStats verbosity)
 def mongo_exec_stats_totals(explain_obj):
     try:
@@ -195,6 +961,11 @@ def mongo_exec_stats_totals(explain_obj):
     except Exception:
         return {}
 
+# MySQL pool usage (size it under load: watch waits / wait_ms_max / timeouts)
+@app.get("/api/sql/pool-stats")
+def api_sql_pool_stats():
+    return jsonify(sql_pool.snapshot())
+
 @app.route("/")
 def index():
     return render_template("index.html")
@@ -343,28 +1114,20 @@ def api_top_scorers():
     page = max(int(request.args.get("page", 1)), 1)
     page_size = min(max(int(request.args.get("page_size", 20)), 1), 100)
     offset = (page - 1) * page_size
+    # player_season_stats keeps each player's best-scoring club per
+    # competition-season (top_club_*), so this is a range scan on
+    # (competition_id, season, top_club_goals)
     sql = """
-            WITH per AS (
-                SELECT a.player_id, a.player_club_id, SUM(a.goals) AS goals
-                FROM appearance a
-                JOIN game g ON g.game_id = a.game_id
-                WHERE g.competition_id = %s AND g.season = %s
-                GROUP BY a.player_id, a.player_club_id
-            ), best AS (
-          SELECT player_id, player_club_id, goals,
-              ROW_NUMBER() OVER (PARTITION BY player_id ORDER BY goals DESC) AS rn
-                FROM per
-            )
-         SELECT b.player_id, p.name AS player_name, pb.image_url,
-             b.goals, c.name AS club_name
-            FROM best b
-            JOIN player p ON p.player_id = b.player_id
-            JOIN player_bio pb ON pb.player_id = b.player_id
-            LEFT JOIN club c ON c.club_id = b.player_club_id
-            WHERE b.rn = 1 AND b.goals > 0
-            ORDER BY b.goals DESC
-            LIMIT %s OFFSET %s
-        """
+      SELECT s.player_id, p.name AS player_name, pb.image_url,
+             s.top_club_goals AS goals, c.name AS club_name
+      FROM player_season_stats s
+      JOIN player p ON p.player_id = s.player_id
+      JOIN player_bio pb ON pb.player_id = s.player_id
+      LEFT JOIN club c ON c.club_id = s.top_club_id
+      WHERE s.competition_id = %s AND s.season = %s AND s.top_club_goals > 0
+      ORDER BY s.top_club_goals DESC
+      LIMIT %s OFFSET %s
+    """
     rows, ms, perf = run_sql_ex(sql, (comp, season, page_size, offset))
     return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, perf=perf))
 
@@ -651,27 +1414,34 @@ def api_update_match(game_id):
             WHERE game_id=%s
         """
 
-        run_sql(sql_update, (
-            data.get("date"),
-            data.get("match_time") or None,
-            data.get("competition_id"),
-            data.get("season"),
-            data.get("round") or None,
-            data.get("home_club_id"),
-            as_int(data.get("home_club_goals")),
-            data.get("home_club_formation") or None,
-            as_int(data.get("home_club_position")),
-            data.get("home_club_manager_name") or None,
-            data.get("away_club_id"),
-            as_int(data.get("away_club_goals")),
-            data.get("away_club_formation") or None,
-            as_int(data.get("away_club_position")),
-            data.get("away_club_manager_name") or None,
-            data.get("stadium") or None,
-            as_int(data.get("attendance")),
-            data.get("referee") or None,
-            game_id
-        ))
+        with sql_transaction() as cur:
+            # A changed competition/season moves every appearance of the game
+            # to another player_season_stats key
+            keys = player_season_keys(cur, "a.game_id = %s", (game_id,))
+            cur.execute(sql_update, (
+                data.get("date"),
+                data.get("match_time") or None,
+                data.get("competition_id"),
+                data.get("season"),
+                data.get("round") or None,
+                data.get("home_club_id"),
+                as_int(data.get("home_club_goals")),
+                data.get("home_club_formation") or None,
+                as_int(data.get("home_club_position")),
+                data.get("home_club_manager_name") or None,
+                data.get("away_club_id"),
+                as_int(data.get("away_club_goals")),
+                data.get("away_club_formation") or None,
+                as_int(data.get("away_club_position")),
+                data.get("away_club_manager_name") or None,
+                data.get("stadium") or None,
+                as_int(data.get("attendance")),
+                data.get("referee") or None,
+                game_id
+            ))
+            new_keys = player_season_keys(cur, "a.game_id = %s", (game_id,))
+            if new_keys != keys:
+                refresh_player_season_stats(cur, keys | new_keys)
 
         # ---------------------------------------------------------
         # FETCH HOME & AWAY CLUB NAMES (from SQL → Mongo)
@@ -723,7 +1493,8 @@ def api_update_match(game_id):
                         "referee": data.get("referee") or None,
                         "match_time": data.get("match_time") or None,
                         "updated_at": int(time.time())
-                    }
+                    },
+                    "$unset": {"_hash": ""}
                 }
             )
 
@@ -883,28 +1654,29 @@ def club_page():
 # Club profile
 @app.get("/api/club/<int:cid>/profile")
 def api_club_profile(cid):
-        # Compute totals for all clubs first (subquery), then filter outside so window functions see full set
+        # Totals and rank come precomputed from club_market_totals (primary-key lookup)
         sql = """
-            SELECT * FROM (
-                SELECT c.club_id,
-                             c.name,
-                             c.average_age,
-                             c.stadium_name,
-                             c.stadium_seats,
-                             COALESCE(SUM(p.market_value_eur), 0) AS total_market_value_eur,
-                             DENSE_RANK() OVER (ORDER BY COALESCE(SUM(p.market_value_eur),0) DESC) AS market_value_rank,
-                             COUNT(*) OVER () AS clubs_ranked
-                FROM club c
-                LEFT JOIN player p
-                    ON p.current_club_id = c.club_id
-                 AND p.market_value_eur IS NOT NULL
-                GROUP BY c.club_id, c.name, c.average_age, c.stadium_name, c.stadium_seats
-            ) t
-            WHERE t.club_id=%s
+            SELECT c.club_id,
+                   c.name,
+                   c.average_age,
+                   c.stadium_name,
+                   c.stadium_seats,
+                   COALESCE(t.total_market_value_eur, 0) AS total_market_value_eur,
+                   t.market_value_rank,
+                   (SELECT COUNT(*) FROM club_market_totals) AS clubs_ranked
+            FROM club c
+            LEFT JOIN club_market_totals t ON t.club_id = c.club_id
+            WHERE c.club_id=%s
         """
         rows, ms, perf = run_sql_ex(sql, (cid,))
         return jsonify(dict(ms=ms, row=(rows[0] if rows else None), perf=perf))
 
+# Club name only (edit forms resolve ids to names with this)
+@app.get("/api/club/<int:cid>/name")
+def api_club_name(cid):
+    rows, ms = run_sql("SELECT club_id, name FROM club WHERE club_id=%s", (cid,))
+    return jsonify(dict(ms=ms, row=(rows[0] if rows else None)))
+
 # Mongo: Club profile
 @app.get("/api/mongo/club/<int:cid>/profile")
 def api_mongo_club_profile(cid):
@@ -914,19 +1686,14 @@ def api_mongo_club_profile(cid):
             "club_id": 1, "name": 1, "average_age": 1,
             "stadium_name": 1, "stadium_seats": 1,
             "total_market_value_eur": 1, "squad_size": 1,
-            "player_count": 1
+            "player_count": 1, "market_value_rank": 1
         })
         if not doc:
             return None
-        mv = doc.get("total_market_value_eur")
-        total = db.clubs.count_documents({}) or 0
-        rank = None
-        if mv is not None:
-            # Count clubs with strictly greater market value to derive rank
-            rank = (db.clubs.count_documents({"total_market_value_eur": {"$gt": mv}}) or 0) + 1
+        # market_value_rank is stored by the ETL and player writes, no per-request counting
         doc.pop("_id", None)
-        doc["market_value_rank"] = rank
-        doc["clubs_ranked"] = total
+        doc.setdefault("market_value_rank", None)
+        doc["clubs_ranked"] = db.clubs.estimated_document_count()
         return doc
     row, ms = run_mongo(_q)
     # Perf object
@@ -1160,52 +1927,36 @@ def api_clubs_market_ranking():
     limit_n = min(max(int(request.args.get("limit", 100)), 1), 500)
     comp = request.args.get("competition_id")
     if comp:
+        # Rank within the league's clubs (a few dozen rows) from the precomputed totals
         sql = """
-          WITH club_totals AS (
-            SELECT c.club_id,
-                   c.name,
-                   COALESCE(SUM(p.market_value_eur), 0) AS total_market_value_eur
-            FROM club c
-            LEFT JOIN player p
-              ON p.current_club_id = c.club_id
-             AND p.market_value_eur IS NOT NULL
-            GROUP BY c.club_id, c.name
-          ),
-          club_in_league AS (
+          WITH club_in_league AS (
             SELECT DISTINCT g.home_club_id AS club_id
             FROM game g WHERE g.competition_id=%s
             UNION
             SELECT DISTINCT g.away_club_id AS club_id
             FROM game g WHERE g.competition_id=%s
           )
-          SELECT ct.club_id,
-                 ct.name,
-                 ct.total_market_value_eur,
-                 DENSE_RANK() OVER (ORDER BY ct.total_market_value_eur DESC) AS market_value_rank
-          FROM club_totals ct
-          JOIN club_in_league l ON l.club_id = ct.club_id
-          ORDER BY ct.total_market_value_eur DESC
+          SELECT t.club_id,
+                 c.name,
+                 t.total_market_value_eur,
+                 DENSE_RANK() OVER (ORDER BY t.total_market_value_eur DESC) AS market_value_rank
+          FROM club_market_totals t
+          JOIN club_in_league l ON l.club_id = t.club_id
+          JOIN club c ON c.club_id = t.club_id
+          ORDER BY t.total_market_value_eur DESC
           LIMIT %s
         """
         rows, ms, perf = run_sql_ex(sql, (comp, comp, limit_n))
     else:
+        # Stored global rank: an index scan of ix_cmt_rank
         sql = """
-          WITH club_totals AS (
-            SELECT c.club_id,
-                   c.name,
-                   COALESCE(SUM(p.market_value_eur), 0) AS total_market_value_eur
-            FROM club c
-            LEFT JOIN player p
-              ON p.current_club_id = c.club_id
-             AND p.market_value_eur IS NOT NULL
-            GROUP BY c.club_id, c.name
-          )
-          SELECT club_id,
-                 name,
-                 total_market_value_eur,
-                 DENSE_RANK() OVER (ORDER BY total_market_value_eur DESC) AS market_value_rank
-          FROM club_totals
-          ORDER BY total_market_value_eur DESC
+          SELECT t.club_id,
+                 c.name,
+                 t.total_market_value_eur,
+                 t.market_value_rank
+          FROM club_market_totals t
+          JOIN club c ON c.club_id = t.club_id
+          ORDER BY t.market_value_rank
           LIMIT %s
         """
         rows, ms, perf = run_sql_ex(sql, (limit_n,))
@@ -1219,10 +1970,12 @@ def api_mongo_clubs_market_ranking():
     def _q(db):
         # If a competition_id (domestic league) is provided, filter by a club's domestic_competition_id
         if comp:
-            filt = {"domestic_competition_id": comp}
+            cur = db.clubs.find({"domestic_competition_id": comp},
+                                {"club_id":1, "name":1, "total_market_value_eur":1}).sort("total_market_value_eur", -1).limit(limit_n)
         else:
-            filt = {"total_market_value_eur": {"$ne": None}}
-        cur = db.clubs.find(filt, {"club_id":1, "name":1, "total_market_value_eur":1}).sort("total_market_value_eur", -1).limit(limit_n)
+            # Global ranking reads the stored dense rank (market_value_rank index)
+            cur = db.clubs.find({"market_value_rank": {"$ne": None}},
+                                {"club_id":1, "name":1, "total_market_value_eur":1, "market_value_rank":1}).sort("market_value_rank", 1).limit(limit_n)
         rows = []
         rank = 1
         for d in cur:
@@ -1230,7 +1983,7 @@ def api_mongo_clubs_market_ranking():
                 "club_id": d.get("club_id"),
                 "name": d.get("name"),
                 "total_market_value_eur": d.get("total_market_value_eur"),
-                "market_value_rank": rank
+                "market_value_rank": rank if comp else d.get("market_value_rank")
             })
             rank += 1
         return rows
@@ -1298,26 +2051,23 @@ def api_club_roi():
     order   = "DESC" if request.args.get("order","desc").lower()=="desc" else "ASC"
     cols = {"post_minutes","post_goals","post_assists","eur_per_minutes","eur_per_contrib","transfer_fee","market_value_in_eur"}
     if sort_by not in cols: sort_by = "post_minutes"
+    # club_transfer_roi is trigger-maintained (football_db_summary_tables.sql):
+    # an index range scan on (club_id, transfer_season) instead of the view's
+    # transfer x appearance aggregation on every call
     sql = f"""
-      SELECT player_id, transfer_season, transfer_fee, market_value_in_eur,
-             post_minutes, post_goals, post_assists,
-             eur_per_minutes, eur_per_contrib
-      FROM view_club_transfer_roi
-      WHERE club_id=%s AND transfer_season=%s AND transfer_fee IS NOT NULL AND transfer_fee > 0
-      ORDER BY {sort_by} {order}
+      SELECT r.player_id, p.name AS player_name, r.transfer_season, r.transfer_fee, r.market_value_in_eur,
+             r.post_minutes, r.post_goals, r.post_assists,
+             r.eur_per_minutes, r.eur_per_contrib
+      FROM club_transfer_roi r
+      LEFT JOIN player p ON p.player_id = r.player_id
+      WHERE r.club_id=%s AND r.transfer_season=%s AND r.transfer_fee > 0
+      ORDER BY r.{sort_by} {order}
       LIMIT 200
     """
     rows, ms, perf = run_sql_ex(sql, (club_id, season))
-    if rows:
-        ids = tuple({r["player_id"] for r in rows})
-        in_clause = ",".join(["%s"]*len(ids))
-        psql = f"SELECT player_id, name FROM player WHERE player_id IN ({in_clause})"
-        plist, _, perf_names = run_sql_ex(psql, ids)
-        name_map = {p["player_id"]: p["name"] for p in plist}
-        for r in rows: r["player_name"] = name_map.get(r["player_id"])
-    return jsonify(dict(ms=ms, rows=rows, perf=perf, perf_names=perf_names))
-
-# Mongo: Club transfer ROI data (basic from transfers collection)
+    return jsonify(dict(ms=ms, rows=rows, perf=perf))
+
+# Mongo: Club transfer ROI data (one aggregation over transfers + appearances)
 @app.get("/api/mongo/club/roi")
 def api_mongo_club_roi():
     club_id = int(request.args.get("club_id"))
@@ -1327,199 +2077,43 @@ def api_mongo_club_roi():
     debug = request.args.get("debug") == "1"
     want_perf = (request.args.get("perf") == "1")
 
-    def _q(db):
-        flt = {"to.club_id": club_id}
-        if season:
-            flt["transfer_season"] = season
-        transfers = list(db.transfers.find(flt, {
-            "_id": 1,
-            "player_id": 1,
-            "player_name": 1,
-            "transfer_fee": 1,
-            "market_value_in_eur": 1,
-            "transfer_season": 1,
-            "transfer_date": 1,
-        }))
-        transfers = [t for t in transfers if (t.get("transfer_fee") or 0) > 0]
-        if not transfers:
-            return []
+    sort_fields = {"post_minutes","post_goals","post_assists","eur_per_minutes","eur_per_contrib","transfer_fee","market_value_in_eur"}
+    if sort_by not in sort_fields: sort_by = "post_minutes"
 
-        player_ids = [t.get("player_id") for t in transfers if t.get("player_id") is not None]
-        apps_by_player = {}
-        game_ids = set()
-        if player_ids:
-            # Relax filter: pull all appearances for these players, then restrict by season/date later
-            ap_cur = db.appearances.find({
-                "player_id": {"$in": player_ids}
-            }, {
-                "game_id": 1,
-                "player_id": 1,
-                "minutes_played": 1,
-                "goals": 1,
-                "assists": 1,
-                "date": 1,
-                "player_club_id": 1,
-                "player_current_club_id": 1,
-            })
-            for ap in ap_cur:
-                pid = ap.get("player_id")
-                if pid is None:
-                    continue
-                apps_by_player.setdefault(pid, []).append(ap)
-                gid = ap.get("game_id")
-                if gid is not None:
-                    game_ids.add(gid)
-        game_seasons = {}
-        if game_ids:
-            for gdoc in db.games.find({"_id": {"$in": list(game_ids)}}, {"_id":1, "season":1}):
-                game_seasons[gdoc.get("_id")] = gdoc.get("season")
-
-        from datetime import datetime
-        def parse_date(s):
-            try:
-                return datetime.strptime(s, "%Y-%m-%d").date()
-            except Exception:
-                return None
-
-        # Map season formats like '22/23' -> '2022' for game season matching
-        season_game_key = season
-        if season and '/' in season:
-            try:
-                part = season.split('/')[0]
-                if len(part) == 2 and part.isdigit():
-                    season_game_key = f"20{part}"
-            except Exception:
-                pass
+    # Same rows as /api/club/roi: one per paid transfer into the club, read from
+    # the precomputed club_transfer_roi collection (etl_full.py --transferroi,
+    # kept current by the transfer/appearance write endpoints below). The
+    # (to.club_id, transfer_season, post_minutes) index serves the default sort.
+    flt = {"to.club_id": club_id, "transfer_fee": {"$gt": 0}}
+    if season:
+        flt["transfer_season"] = season
+    projection = {"_id": 0, "player_id": 1, "player_name": 1, "transfer_season": 1,
+                  "transfer_fee": 1, "market_value_in_eur": 1, "post_apps": 1,
+                  "post_minutes": 1, "post_goals": 1, "post_assists": 1,
+                  "eur_per_minutes": 1, "eur_per_contrib": 1}
+    sort = [(sort_by, order), ("_id", 1)]
 
+    def _q(db):
         rows = []
-        for t in transfers:
-            pid = t.get("player_id")
-            fee = t.get("transfer_fee") or 0
-            tdate = parse_date(t.get("transfer_date"))
-            aps = apps_by_player.get(pid, [])
-            mins = goals = assists = 0
-            # Post-transfer pass
-            for ap in aps:
-                gid = ap.get("game_id")
-                if season and game_seasons.get(gid) not in (season, season_game_key):
-                    continue
-                ap_date = parse_date(ap.get("date"))
-                if tdate and ap_date and ap_date < tdate:
-                    continue
-                mins += int(ap.get("minutes_played") or 0)
-                goals += int(ap.get("goals") or 0)
-                assists += int(ap.get("assists") or 0)
-            # Fallback include whole season if still zero
-            if mins == 0 and aps:
-                mins = goals = assists = 0
-                for ap in aps:
-                    gid = ap.get("game_id")
-                    if season and game_seasons.get(gid) not in (season, season_game_key):
-                        continue
-                    mins += int(ap.get("minutes_played") or 0)
-                    goals += int(ap.get("goals") or 0)
-                    assists += int(ap.get("assists") or 0)
-            contrib = goals + assists
-            eur_per_minutes = round(fee / mins, 3) if mins else None
-            eur_per_contrib = round(fee / contrib, 3) if contrib else None
-            row = {
-                "player_id": pid,
-                "player_name": t.get("player_name"),
-                "transfer_season": t.get("transfer_season"),
-                "transfer_fee": fee,
-                "market_value_in_eur": t.get("market_value_in_eur"),
-                "post_minutes": mins,
-                "post_goals": goals,
-                "post_assists": assists,
-                "eur_per_minutes": eur_per_minutes,
-                "eur_per_contrib": eur_per_contrib,
-            }
+        for d in db.club_transfer_roi.find(flt, projection).sort(sort).limit(200):
+            apps = d.pop("post_apps", 0)
             if debug:
-                row["_debug_apps"] = len(aps)
-                row["_debug_transfer_date"] = t.get("transfer_date")
-                row["_debug_mapped_season"] = season_game_key
-            rows.append(row)
-
-        key_map = {
-            "transfer_fee": lambda r: r.get("transfer_fee") or 0,
-            "market_value_in_eur": lambda r: r.get("market_value_in_eur") or 0,
-            "post_minutes": lambda r: r.get("post_minutes") or -1,
-            "post_goals": lambda r: r.get("post_goals") or -1,
-            "post_assists": lambda r: r.get("post_assists") or -1,
-            "eur_per_minutes": lambda r: r.get("eur_per_minutes") or -1,
-            "eur_per_contrib": lambda r: r.get("eur_per_contrib") or -1,
-        }
-        key_fn = key_map.get(sort_by, key_map["transfer_fee"])
-        rows.sort(key=key_fn, reverse=(order==-1))
+                d["_debug_apps"] = apps
+            rows.append(d)
         return rows
 
     rows, ms = run_mongo(_q)
 
-    # Build basic perf object (always include lightweight query description)
-    import json
     perf = {
-        "query": json.dumps({
-            "transfers.match": {"to.club_id": club_id, **({"transfer_season": season} if season else {})},
-            "filter_fee_gt": 0,
-            "sort_by": sort_by,
-            "order": "desc" if order == -1 else "asc"
-        }, ensure_ascii=False, indent=2),
+        "query": json.dumps({"find": "club_transfer_roi", "filter": flt, "sort": dict(sort), "limit": 200}, ensure_ascii=False, indent=2),
         "stats": {"docs_returned": len(rows)}
     }
 
     if want_perf:
         try:
-            # Construct aggregation pipeline analogous to Python logic for explain
-            match_stage = {"$match": {"to.club_id": club_id}}
-            if season:
-                match_stage["$match"]["transfer_season"] = season
-            pipeline = [
-                match_stage,
-                {"$match": {"transfer_fee": {"$gt": 0}}},
-                {"$lookup": {
-                    "from": "appearances",
-                    "localField": "player_id",
-                    "foreignField": "player_id",
-                    "as": "apps"
-                }},
-                {"$unwind": {"path": "$apps", "preserveNullAndEmptyArrays": False}},
-                {"$lookup": {
-                    "from": "games",
-                    "localField": "apps.game_id",
-                    "foreignField": "_id",
-                    "as": "g"
-                }},
-                {"$unwind": {"path": "$g", "preserveNullAndEmptyArrays": False}},
-            ]
-            # Season mapping (e.g. '24/25' -> '2024')
-            season_game_key = season
-            if season and '/' in season:
-                try:
-                    part = season.split('/')[0]
-                    if len(part) == 2 and part.isdigit():
-                        season_game_key = f"20{part}"
-                except Exception:
-                    pass
-            if season:
-                pipeline.append({"$match": {"$expr": {"$in": ["$g.season", [season, season_game_key]]}}})
-            # Post-transfer date filter
-            pipeline.append({"$match": {"$expr": {"$gte": ["$apps.date", "$transfer_date"]}}})
-            pipeline.append({"$group": {
-                "_id": "$player_id",
-                "post_minutes": {"$sum": {"$ifNull": ["$apps.minutes_played", 0]}},
-                "post_goals": {"$sum": {"$ifNull": ["$apps.goals", 0]}},
-                "post_assists": {"$sum": {"$ifNull": ["$apps.assists", 0]}},
-                "transfer_fee": {"$first": "$transfer_fee"},
-                "market_value_in_eur": {"$first": "$market_value_in_eur"},
-                "player_id": {"$first": "$player_id"},
-                "player_name": {"$first": "$player_name"}
-            }})
             explain_out = mongo_db.command({
-                "explain": {
-                    "aggregate": "transfers",
-                    "pipeline": pipeline,
-                    "cursor": {}
-                },
+                "explain": {"find": "club_transfer_roi", "filter": flt, "projection": projection,
+                            "sort": dict(sort), "limit": 200},
                 "verbosity": "executionStats"
             })
             perf["explain"] = explain_out
@@ -1833,17 +2427,20 @@ def api_create_player():
         if highest_market_value == "": highest_market_value = None
         else: highest_market_value = int(highest_market_value) if highest_market_value else None
         
-        run_sql(sql_player, (
-            player_id,
-            data.get("name"),
-            data.get("position") or None,
-            data.get("sub_position") or None,
-            current_club_id,
-            market_value,
-            highest_market_value,
-            data.get("first_name") or None,  # Add this
-            data.get("last_name") or None    # Add this
-        ))
+        with sql_transaction() as cur:
+            cur.execute(sql_player, (
+                player_id,
+                data.get("name"),
+                data.get("position") or None,
+                data.get("sub_position") or None,
+                current_club_id,
+                market_value,
+                highest_market_value,
+                data.get("first_name") or None,  # Add this
+                data.get("last_name") or None    # Add this
+            ))
+            rank_bound = refresh_club_market_totals(cur, [current_club_id])
+        rerank_club_market(rank_bound)
         
         # Insert into player_bio table
         sql_bio = """
@@ -1947,11 +2544,14 @@ def api_mongo_create_player():
         }
         
         # Upsert into MongoDB (insert if new, update if exists)
-        mongo_db.players.update_one(
+        before = mongo_db.players.find_one_and_update(
             {"_id": player_id},
-            {"$set": doc},
-            upsert=True
+            {"$set": doc, "$unset": {"_hash": ""}},
+            projection={"current_club_id": 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
         )
+        mongo_refresh_club_market(mongo_db, [doc["current_club_id"], (before or {}).get("current_club_id")])
         
         return jsonify({"player_id": player_id, "success": True}), 201
         
@@ -1962,12 +2562,11 @@ def api_mongo_create_player():
 @app.get("/api/players/<int:pid>/competitions")
 def api_player_competitions(pid):
     sql = """
-      SELECT DISTINCT g.competition_id, c.name AS competition_name, c.type AS competition_type
-      FROM appearance a
-      JOIN game g ON g.game_id = a.game_id
-      JOIN competition c ON c.competition_id = g.competition_id
-      WHERE a.player_id = %s
-      ORDER BY g.competition_id
+      SELECT DISTINCT s.competition_id, c.name AS competition_name, c.type AS competition_type
+      FROM player_season_stats s
+      JOIN competition c ON c.competition_id = s.competition_id
+      WHERE s.player_id = %s
+      ORDER BY s.competition_id
     """
     rows, ms = run_sql(sql, (pid,))
     return jsonify(dict(ms=ms, rows=rows))
@@ -2034,11 +2633,10 @@ def api_mongo_player_competitions(pid):
 def api_player_seasons(pid):
     comp = request.args.get("competition_id")
     sql = """
-      SELECT DISTINCT g.season
-      FROM appearance a
-      JOIN game g ON g.game_id = a.game_id
-      WHERE a.player_id = %s AND g.competition_id = %s
-      ORDER BY g.season DESC
+      SELECT NULLIF(season,'') AS season
+      FROM player_season_stats
+      WHERE player_id = %s AND competition_id = %s
+      ORDER BY season DESC
     """
     rows, ms = run_sql(sql, (pid, comp))
     return jsonify(dict(ms=ms, rows=rows))
@@ -2098,17 +2696,12 @@ def api_mongo_player_profile(pid):
 @app.get("/api/player/<int:pid>/season-summary")
 def api_player_season_summary(pid):
     sql = """
-      SELECT g.competition_id, g.season,
-             COUNT(*) AS apps,
-             SUM(a.minutes_played) AS minutes,
-             SUM(a.goals) AS goals,
-             SUM(a.assists) AS assists,
-             SUM(a.yellow_cards) AS yellows,
-             SUM(a.red_cards) AS reds
-      FROM appearance a JOIN game g ON g.game_id=a.game_id
-      WHERE a.player_id=%s
-      GROUP BY g.competition_id, g.season
-      ORDER BY g.season DESC, g.competition_id
+      SELECT NULLIF(competition_id,'') AS competition_id, NULLIF(season,'') AS season,
+             apps, minutes, goals, assists, yellows, reds,
+             goals_per90, assists_per90, ga_per90
+      FROM player_season_stats
+      WHERE player_id=%s
+      ORDER BY season DESC, competition_id
     """
     rows, ms, perf = run_sql_ex(sql, (pid,))
     return jsonify(dict(ms=ms, rows=rows, perf=perf))
@@ -2375,6 +2968,14 @@ def api_market_compare():
   rows, ms = run_sql(sql, tuple(params))
   return jsonify(dict(ms=ms, rows=rows, category=category, value=value, limit=limit_n))
 
+# dob is stored as YYYY-MM-DD: age N today <=> born after today N+1 years ago
+# and no later than today N years ago (string order = date order). On Feb 29
+# the "YYYY-02-29" bounds still order correctly in non-leap years, matching
+# TIMESTAMPDIFF(YEAR, dob, CURDATE()) in the SQL endpoint.
+def age_dob_bounds(age, today):
+    md = today.strftime("%m-%d")
+    return f"{today.year - age - 1:04d}-{md}", f"{today.year - age:04d}-{md}"
+
 # Mongo: market compare
 @app.get("/api/mongo/market-compare")
 def api_mongo_market_compare():
@@ -2384,56 +2985,52 @@ def api_mongo_market_compare():
     allowed = {"age", "citizenship", "club", "position", "agent", "city"}
     if category not in allowed or value is None or value == "":
         return jsonify(dict(ms=0, rows=[], error="invalid-params")), 400
-    from datetime import date
-    today = date.today()
-    def compute_age(dob_str):
+    want_perf = (request.args.get("perf") == "1")
+
+    # One indexed query per category: equality on the category field (or a dob
+    # range for age), then sort + limit on market_value_eur. The (field,
+    # market_value_eur) indexes return matches already in value order, so the
+    # server stops after limit_n documents.
+    fields = {"citizenship": "country_of_citizenship", "club": "current_club_id", "position": "position",
+              "agent": "agent_name", "city": "city_of_birth"}
+    if category == "age":
         try:
-            if not dob_str:
-                return None
-            y, m, d = map(int, dob_str.split('-'))
-            age = today.year - y - ((today.month, today.day) < (m, d))
-            return age
-        except Exception:
-            return None
+            age_val = int(value)
+        except ValueError:
+            return jsonify(dict(ms=0, rows=[], error="invalid-age")), 400
+        lo, hi = age_dob_bounds(age_val, datetime.now().date())
+        flt = {"dob": {"$gt": lo, "$lte": hi}}
+    elif category == "club":
+        try:
+            flt = {"current_club_id": int(value)}
+        except ValueError:
+            return jsonify(dict(ms=0, rows=[], error="invalid-club")), 400
+    else:
+        flt = {fields[category]: value}
+    flt["market_value_eur"] = {"$ne": None}
+    projection = {"_id": 0, "player_id": 1, "name": 1, "market_value_eur": 1}
+    sort = [("market_value_eur", -1)]
+
     def _q(db):
-        cur = db.players.find({}, {"player_id":1,"name":1,"market_value_eur":1,"dob":1,"country_of_citizenship":1,"current_club_id":1,"position":1,"agent_name":1,"city_of_birth":1})
-        out = []
-        for d in cur:
-            if category == 'age':
-                try:
-                    target_age = int(value)
-                except ValueError:
-                    continue
-                age = compute_age(d.get('dob'))
-                if age is None or age != target_age:
-                    continue
-            elif category == 'citizenship':
-                if d.get('country_of_citizenship') != value:
-                    continue
-            elif category == 'club':
-                try:
-                    club_id = int(value)
-                except ValueError:
-                    continue
-                if d.get('current_club_id') != club_id:
-                    continue
-            elif category == 'position':
-                if d.get('position') != value:
-                    continue
-            elif category == 'agent':
-                if d.get('agent_name') != value:
-                    continue
-            elif category == 'city':
-                if d.get('city_of_birth') != value:
-                    continue
-            mv = d.get('market_value_eur')
-            if mv is None:
-                continue
-            out.append({"player_id": d.get("player_id"), "name": d.get("name"), "market_value_eur": mv})
-        out.sort(key=lambda r: (r.get('market_value_eur') or 0), reverse=True)
-        return out[:limit_n]
+        return list(db.players.find(flt, projection).sort(sort).limit(limit_n))
     rows, ms = run_mongo(_q)
-    return jsonify(dict(ms=ms, rows=rows, category=category, value=value, limit=limit_n, source='mongo'))
+    perf = {
+        "query": json.dumps({"find": "players", "filter": flt, "sort": dict(sort), "limit": limit_n}, ensure_ascii=False, indent=2),
+        "stats": {"docs_returned": len(rows)},
+        "explain": None,
+    }
+    if want_perf:
+        try:
+            exp = mongo_db.command({
+                "explain": {"find": "players", "filter": flt, "projection": projection,
+                            "sort": dict(sort), "limit": limit_n},
+                "verbosity": "executionStats"
+            })
+            perf["explain"] = exp
+            perf["stats"].update(mongo_exec_stats_totals(exp))
+        except Exception:
+            perf["explain"] = None
+    return jsonify(dict(ms=ms, rows=rows, category=category, value=value, limit=limit_n, source='mongo', perf=perf))
 
 # Players list (SQL)
 @app.get("/api/players")
@@ -2441,7 +3038,11 @@ def api_players_list():
     page = max(int(request.args.get("page", 1)), 1)
     page_size = min(max(int(request.args.get("page_size", 20)), 1), 100)
     search = request.args.get("search", "").strip()
-    offset = (page - 1) * page_size
+    try:
+        after = decode_after(request.args.get("after"))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    offset = 0 if after else (page - 1) * page_size
 
     sql = """
       SELECT p.player_id, p.name, p.position, p.sub_position,
@@ -2451,24 +3052,37 @@ def api_players_list():
       LEFT JOIN club c ON c.club_id = p.current_club_id
       LEFT JOIN player_bio pb ON pb.player_id = p.player_id
     """
-    params = []
+    where, params = [], []
 
     if search:
-        sql += " WHERE p.name LIKE %s"
+        where.append("p.name LIKE %s")
         params.append(f"%{search}%")
 
     count_sql = "SELECT COUNT(*) as total FROM player p"
     if search:
         count_sql += " WHERE p.name LIKE %s"
 
-    count_rows, _ = run_sql(count_sql, tuple(params) if search else ())
-    total = count_rows[0]["total"] if count_rows else 0
-
-    sql += " ORDER BY p.market_value_eur DESC LIMIT %s OFFSET %s"
+    def _count():
+        count_rows, _ = run_sql(count_sql, tuple(params))
+        return count_rows[0]["total"] if count_rows else 0
+    total, total_is_estimate = list_total("sql", "player", {"search": search}, _count,
+                                          lambda: sql_estimated_rows("player"))
+
+    if after:
+        cond, vals = sql_seek("p.market_value_eur", "p.player_id", after)
+        where.append(cond)
+        params.extend(vals)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+
+    # player_id breaks ties so the seek is exact (ix_player_mv)
+    sql += " ORDER BY p.market_value_eur DESC, p.player_id DESC LIMIT %s OFFSET %s"
     params.extend([page_size, offset])
 
     rows, ms, perf = run_sql_ex(sql, tuple(params))
-    return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total, perf=perf))
+    return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total,
+                        total_is_estimate=total_is_estimate, perf=perf,
+                        next_after=next_after(rows, page_size, "market_value_eur", "player_id")))
 
 # Players list (MongoDB)
 @app.get("/api/mongo/players")
@@ -2476,32 +3090,41 @@ def api_mongo_players_list():
     page = max(int(request.args.get("page", 1)), 1)
     page_size = min(max(int(request.args.get("page_size", 20)), 1), 100)
     search = request.args.get("search", "").strip()
-    skip = (page - 1) * page_size
+    try:
+        after = decode_after(request.args.get("after"))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    skip = 0 if after else (page - 1) * page_size
 
     def _q(db):
         query = {}
         if search:
             query["name"] = {"$regex": search, "$options": "i"}
         
-        total = db.players.count_documents(query)
+        total = list_total("mongo", "player", {"search": search},
+                           lambda: db.players.count_documents(query), db.players.estimated_document_count)
+        if after:
+            query = mongo_seek(query, "market_value_eur", "_id", after)
         cur = db.players.find(query, {
             "player_id": 1, "name": 1, "position": 1, "sub_position": 1,
             "market_value_eur": 1, "current_club_name": 1,
             "image_url": 1, "dob": 1, "country_of_citizenship": 1
-        }).sort("market_value_eur", -1).skip(skip).limit(page_size)
+        }).sort([("market_value_eur", -1), ("_id", -1)]).skip(skip).limit(page_size)
         
         rows = list(cur)
         return rows, total
 
     rows, ms = run_mongo(lambda db: _q(db))
-    rows_list, total = rows
+    rows_list, (total, total_is_estimate) = rows
+    token = next_after(rows_list, page_size, "market_value_eur", "_id")
     
     # Convert MongoDB _id to match expected structure
     for r in rows_list:
         if "_id" in r:
             del r["_id"]
     
-    return jsonify(dict(ms=ms, rows=rows_list, page=page, page_size=page_size, total=total))
+    return jsonify(dict(ms=ms, rows=rows_list, page=page, page_size=page_size, total=total,
+                        total_is_estimate=total_is_estimate, next_after=token))
 
 @app.route("/players")
 def players_page():
@@ -2573,17 +3196,23 @@ def api_update_player(pid):
         if highest_market_value == "": highest_market_value = None
         else: highest_market_value = int(highest_market_value) if highest_market_value else None
         
-        run_sql(sql_player, (
-            data.get("name"),
-            data.get("first_name") or None,
-            data.get("last_name") or None,
-            data.get("position") or None,
-            data.get("sub_position") or None,
-            current_club_id,
-            market_value,
-            highest_market_value,
-            pid
-        ))
+        with sql_transaction() as cur:
+            # Both the old and the new club's market totals can change
+            cur.execute("SELECT current_club_id FROM player WHERE player_id=%s FOR UPDATE", (pid,))
+            old = cur.fetchone()
+            cur.execute(sql_player, (
+                data.get("name"),
+                data.get("first_name") or None,
+                data.get("last_name") or None,
+                data.get("position") or None,
+                data.get("sub_position") or None,
+                current_club_id,
+                market_value,
+                highest_market_value,
+                pid
+            ))
+            rank_bound = refresh_club_market_totals(cur, [current_club_id, old["current_club_id"] if old else None])
+        rerank_club_market(rank_bound)
         
         # Update player_bio table
         sql_bio = """
@@ -2650,11 +3279,15 @@ def api_update_player(pid):
             "contract_expiration_date": fmt_date(data.get("contract_expiration_date")),
             "updated_at": int(time.time())
         }
-        mongo_db.players.update_one(
+        before = mongo_db.players.find_one_and_update(
             {"_id": pid},
-            {"$set": mongo_update_doc},
-            upsert=False
+            {"$set": mongo_update_doc, "$unset": {"_hash": ""}},
+            projection={"current_club_id": 1},
+            upsert=False,
+            return_document=ReturnDocument.BEFORE
         )
+        if before:
+            mongo_refresh_club_market(mongo_db, [before.get("current_club_id"), mongo_update_doc["current_club_id"]])
         
         return jsonify({"player_id": pid, "success": True}), 200
         
@@ -2675,10 +3308,19 @@ def api_delete_player(pid):
         
         # Delete from player
         sql_player = "DELETE FROM player WHERE player_id=%s"
-        run_sql(sql_player, (pid,))
+        with sql_transaction() as cur:
+            cur.execute("SELECT current_club_id FROM player WHERE player_id=%s FOR UPDATE", (pid,))
+            old = cur.fetchone()
+            cur.execute(sql_player, (pid,))
+            rank_bound = refresh_club_market_totals(cur, [old["current_club_id"] if old else None])
+        rerank_club_market(rank_bound)
 
         # Delete from MongoDB
-        run_mongo(lambda db: db.players.delete_one({"_id": pid}))
+        def _del(db):
+            doc = db.players.find_one_and_delete({"_id": pid}, projection={"current_club_id": 1})
+            if doc:
+                mongo_refresh_club_market(db, [doc.get("current_club_id")])
+        run_mongo(_del)
         
         # Delete the image file if it exists
         if image_rows and image_rows[0].get('image_url'):
@@ -2708,36 +3350,59 @@ def api_clubs_list():
     page = max(int(request.args.get("page", 1)), 1)
     page_size = min(max(int(request.args.get("page_size", 20)), 1), 100)
     search = request.args.get("search", "").strip()
-    offset = (page - 1) * page_size
+    try:
+        after = decode_after(request.args.get("after"))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    offset = 0 if after else (page - 1) * page_size
 
-    sql = """
-      SELECT c.club_id, c.name, c.domestic_competition_id, c.squad_size, c.average_age,
-             c.stadium_name, c.stadium_seats,
-             COALESCE(SUM(p.market_value_eur), 0) AS total_market_value_eur,
-             COUNT(p.player_id) AS player_count
-      FROM club c
-      LEFT JOIN player p ON p.current_club_id = c.club_id
-    """
-    params = []
+    where, params = [], []
 
     if search:
-        sql += " WHERE c.name LIKE %s"
+        where.append("c.name LIKE %s")
         params.append(f"%{search}%")
 
-    sql += " GROUP BY c.club_id, c.name, c.domestic_competition_id, c.squad_size, c.average_age, c.stadium_name, c.stadium_seats"
-
     count_sql = "SELECT COUNT(*) as total FROM club c"
     if search:
         count_sql += " WHERE c.name LIKE %s"
 
-    count_rows, _ = run_sql(count_sql, tuple(params) if search else ())
-    total = count_rows[0]["total"] if count_rows else 0
+    def _count():
+        count_rows, _ = run_sql(count_sql, tuple(params))
+        return count_rows[0]["total"] if count_rows else 0
+    total, total_is_estimate = list_total("sql", "club", {"search": search}, _count,
+                                          lambda: sql_estimated_rows("club"))
 
-    sql += " ORDER BY c.name LIMIT %s OFFSET %s"
+    if after:
+        cond, vals = sql_seek("c.name", "c.club_id", after, desc=False)
+        where.append(cond)
+        params.extend(vals)
+
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+
+    # Page the clubs first (ix_club_name_id), then total only that page's players
+    sql = f"""
+      SELECT c.club_id, c.name, c.domestic_competition_id, c.squad_size, c.average_age,
+             c.stadium_name, c.stadium_seats,
+             COALESCE(SUM(p.market_value_eur), 0) AS total_market_value_eur,
+             COUNT(p.player_id) AS player_count
+      FROM (
+        SELECT c.club_id, c.name, c.domestic_competition_id, c.squad_size, c.average_age,
+               c.stadium_name, c.stadium_seats
+        FROM club c
+        {where_sql}
+        ORDER BY c.name, c.club_id
+        LIMIT %s OFFSET %s
+      ) c
+      LEFT JOIN player p ON p.current_club_id = c.club_id
+      GROUP BY c.club_id, c.name, c.domestic_competition_id, c.squad_size, c.average_age, c.stadium_name, c.stadium_seats
+      ORDER BY c.name, c.club_id
+    """
     params.extend([page_size, offset])
 
     rows, ms, perf = run_sql_ex(sql, tuple(params))
-    return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total, perf=perf))
+    return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total,
+                        total_is_estimate=total_is_estimate, perf=perf,
+                        next_after=next_after(rows, page_size, "name", "club_id")))
 
 
 # Clubs list (MongoDB)
@@ -2746,32 +3411,41 @@ def api_mongo_clubs_list():
     page = max(int(request.args.get("page", 1)), 1)
     page_size = min(max(int(request.args.get("page_size", 20)), 1), 100)
     search = request.args.get("search", "").strip()
-    skip = (page - 1) * page_size
+    try:
+        after = decode_after(request.args.get("after"))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    skip = 0 if after else (page - 1) * page_size
 
     def _q(db):
         query = {}
         if search:
             query["name"] = {"$regex": search, "$options": "i"}
         
-        total = db.clubs.count_documents(query)
+        total = list_total("mongo", "club", {"search": search},
+                           lambda: db.clubs.count_documents(query), db.clubs.estimated_document_count)
+        if after:
+            query = mongo_seek(query, "name", "club_id", after, desc=False)
         cur = db.clubs.find(query, {
             "club_id": 1, "name": 1, "squad_size": 1, "average_age": 1,
             "stadium_name": 1, "stadium_seats": 1, "total_market_value_eur": 1,
             "player_count": 1
-        }).sort("name", 1).skip(skip).limit(page_size)
+        }).sort([("name", 1), ("club_id", 1)]).skip(skip).limit(page_size)
         
         rows = list(cur)
         return rows, total
 
     rows, ms = run_mongo(lambda db: _q(db))
-    rows_list, total = rows
+    rows_list, (total, total_is_estimate) = rows
     
     # Clean up MongoDB _id field
     for r in rows_list:
         if "_id" in r:
             del r["_id"]
     
-    return jsonify(dict(ms=ms, rows=rows_list, page=page, page_size=page_size, total=total))
+    return jsonify(dict(ms=ms, rows=rows_list, page=page, page_size=page_size, total=total,
+                        total_is_estimate=total_is_estimate,
+                        next_after=next_after(rows_list, page_size, "name", "club_id")))
 
 # Create club page
 @app.route("/club/create")
@@ -2812,15 +3486,19 @@ def api_create_club():
             VALUES (%s, %s, %s, %s, %s, %s, %s)
         """
         
-        run_sql(sql_club, (
-            club_id,
-            data.get("name"),
-            domestic_competition_id,
-            squad_size,
-            average_age,
-            data.get("stadium_name") or None,
-            stadium_seats
-        ))
+        with sql_transaction() as cur:
+            cur.execute(sql_club, (
+                club_id,
+                data.get("name"),
+                domestic_competition_id,
+                squad_size,
+                average_age,
+                data.get("stadium_name") or None,
+                stadium_seats
+            ))
+            # New club enters the ranking with a 0 total
+            rank_bound = refresh_club_market_totals(cur, [club_id])
+        rerank_club_market(rank_bound)
 
         # ---------------------------------------
         #  INSERT INTO MONGODB (SYNC)
@@ -2839,6 +3517,7 @@ def api_create_club():
             })
         
         run_mongo(mongo_insert)
+        run_mongo(lambda db: mongo_refresh_club_market(db, [club_id]))
         
         return jsonify({"club_id": club_id, "success": True}), 201
         
@@ -2922,7 +3601,7 @@ def api_update_club(cid):
                     "stadium_name": data.get("stadium_name") or None,
                     "stadium_seats": as_int(data.get("stadium_seats")),
                     "updated_at": int(time.time())
-                }}
+                }, "$unset": {"_hash": ""}}
             )
 
         run_mongo(update_mongo)
@@ -3008,12 +3687,17 @@ def api_upload_player_image():
 @app.delete("/api/club/<int:cid>")
 def api_delete_club(cid):
     try:
-        # 1. Delete from SQL
-        run_sql("DELETE FROM club WHERE club_id=%s", (cid,))
+        # 1. Delete from SQL (its totals row goes, the other clubs are re-ranked)
+        with sql_transaction() as cur:
+            cur.execute("DELETE FROM club WHERE club_id=%s", (cid,))
+            rank_bound = refresh_club_market_totals(cur, [cid])
+        rerank_club_market(rank_bound)
 
         # 2. Delete from Mongo
         def mongo_delete(db):
-            return db.clubs.delete_one({"club_id": cid})
+            res = db.clubs.delete_one({"club_id": cid})
+            mongo_refresh_club_market(db, [cid])
+            return res
 
         run_mongo(mongo_delete)
 
@@ -3038,7 +3722,11 @@ def api_games_list():
     date = request.args.get("date", "").strip()
     competition = request.args.get("competition_id", "").strip()
     season = request.args.get("season", "").strip()
-    offset = (page - 1) * page_size
+    try:
+        after = decode_after(request.args.get("after"))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    offset = 0 if after else (page - 1) * page_size
 
     sql = """
       SELECT g.game_id, DATE_FORMAT(g.date, '%%Y-%%m-%%d') AS date_str,
@@ -3074,14 +3762,25 @@ def api_games_list():
     if season:
         count_sql += " AND g.season = %s"
 
-    count_rows, _ = run_sql(count_sql, tuple(params))
-    total = count_rows[0]["total"] if count_rows else 0
+    def _count():
+        count_rows, _ = run_sql(count_sql, tuple(params))
+        return count_rows[0]["total"] if count_rows else 0
+    total, total_is_estimate = list_total("sql", "game", {"date": date, "competition_id": competition, "season": season},
+                                          _count, lambda: sql_estimated_rows("game"))
+
+    if after:
+        cond, vals = sql_seek("g.date", "g.game_id", after)
+        sql += " AND " + cond
+        params.extend(vals)
 
-    sql += " ORDER BY g.date DESC LIMIT %s OFFSET %s"
+    # ix_game_date_id / ix_game_comp_season_date serve the order and the seek
+    sql += " ORDER BY g.date DESC, g.game_id DESC LIMIT %s OFFSET %s"
     params.extend([page_size, offset])
 
     rows, ms, perf = run_sql_ex(sql, tuple(params))
-    return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total, perf=perf))
+    return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total,
+                        total_is_estimate=total_is_estimate, perf=perf,
+                        next_after=next_after(rows, page_size, "date_str", "game_id")))
 
 # Mongo: Games list
 @app.get("/api/mongo/games/list")
@@ -3091,7 +3790,11 @@ def api_mongo_games_list():
     date = request.args.get("date", "").strip()
     competition = request.args.get("competition_id", "").strip()
     season = request.args.get("season", "").strip()
-    skip = (page - 1) * page_size
+    try:
+        after = decode_after(request.args.get("after"))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    skip = 0 if after else (page - 1) * page_size
 
     def _q(db):
         # Build query filters
@@ -3102,7 +3805,10 @@ def api_mongo_games_list():
             query["competition_id"] = competition
         if season:
             query["season"] = season
-        total = db.games.count_documents(query)
+        total = list_total("mongo", "game", {"date": date, "competition_id": competition, "season": season},
+                           lambda: db.games.count_documents(query), db.games.estimated_document_count)
+        if after:
+            query = mongo_seek(query, "date", "_id", after)
 
         # We project nested home/away subdocuments if present. Older ETL versions flattened names/goals.
         projection = {
@@ -3116,7 +3822,7 @@ def api_mongo_games_list():
             "home_club_name": 1, "away_club_name": 1,
             "stadium": 1, "attendance": 1
         }
-        cur = db.games.find(query, projection).sort("date", -1).skip(skip).limit(page_size)
+        cur = db.games.find(query, projection).sort([("date", -1), ("_id", -1)]).skip(skip).limit(page_size)
         out = []
         for g in cur:
             home = g.get("home") or {}
@@ -3132,7 +3838,7 @@ def api_mongo_games_list():
             away_goals = away.get("goals") if away.get("goals") is not None else g.get("away_club_goals")
 
             out.append({
-                "game_id": g.get("game_id"),
+                "game_id": g.get("game_id", g["_id"]),
                 "date_str": g.get("date"),
                 "competition_id": g.get("competition_id"),
                 "league_name": g.get("competition_name"),
@@ -3149,8 +3855,10 @@ def api_mongo_games_list():
             })
         return out, total
 
-    (rows, total), ms = run_mongo(_q)
-    return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total, source="mongo"))
+    (rows, (total, total_is_estimate)), ms = run_mongo(_q)
+    return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total,
+                        total_is_estimate=total_is_estimate, source="mongo",
+                        next_after=next_after(rows, page_size, "date_str", "game_id")))
 
 @app.delete("/api/match/<int:game_id>")
 def api_delete_match(game_id):
@@ -3160,6 +3868,8 @@ def api_delete_match(game_id):
 
         # Delete from Mongo
         def mongo_delete(db):
+            # game_events rows cascade with the game in SQL
+            db.game_events.delete_many({"game_id": game_id})
             return db.games.delete_one({"_id": game_id})
 
         run_mongo(mongo_delete)
@@ -3209,7 +3919,11 @@ def api_appearances_list():
     page = max(int(request.args.get("page", 1)), 1)
     page_size = min(max(int(request.args.get("page_size", 20)), 1), 100)
     search = request.args.get("search", "").strip()
-    offset = (page - 1) * page_size
+    try:
+        after = decode_after(request.args.get("after"))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    offset = 0 if after else (page - 1) * page_size
 
     sql = """
       SELECT a.appearance_id, a.game_id, a.player_id, a.player_club_id, 
@@ -3232,14 +3946,99 @@ def api_appearances_list():
     if search:
         count_sql += " AND (a.game_id LIKE %s OR p.name LIKE %s OR c.name LIKE %s)"
 
-    count_rows, _ = run_sql(count_sql, tuple(params))
-    total = count_rows[0]["total"] if count_rows else 0
+    def _count():
+        count_rows, _ = run_sql(count_sql, tuple(params))
+        return count_rows[0]["total"] if count_rows else 0
+    total, total_is_estimate = list_total("sql", "appearance", {"search": search}, _count,
+                                          lambda: sql_estimated_rows("appearance"))
 
-    sql += " ORDER BY a.date DESC LIMIT %s OFFSET %s"
+    if after:
+        cond, vals = sql_seek("a.date", "a.appearance_id", after)
+        sql += " AND " + cond
+        params.extend(vals)
+
+    sql += " ORDER BY a.date DESC, a.appearance_id DESC LIMIT %s OFFSET %s"
     params.extend([page_size, offset])
 
     rows, ms, perf = run_sql_ex(sql, tuple(params))
-    return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total, perf=perf))
+    return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total,
+                        total_is_estimate=total_is_estimate, perf=perf,
+                        next_after=next_after(rows, page_size, "date", "appearance_id")))
+
+# --- Mongo appearances schema registry ---
+# Older appearance loads used other collection and field names (gameId, mins,
+# stats.goals, ...). Instead of list_collection_names(), five sort-field probes
+# and a ~40-field synonym projection per request, the collection, the stored
+# name(s) of each canonical field and the sort key are resolved once, on first
+# use, from a $sample of the documents, and kept until
+# POST /api/mongo/appearances/schema/refresh. After migrate_appearances.py the
+# etl_state marker short-circuits the sampling and every field is stored under
+# its canonical name only, so the list projects exactly those fields. The name
+# lists (APPEARANCE_COLLECTIONS, APPEARANCE_FIELDS) live in etl_full.py.
+APPEARANCE_SCHEMA_SAMPLE = int(os.getenv("APPEARANCE_SCHEMA_SAMPLE", "2000"))
+
+_appearance_schema = None
+_appearance_schema_lock = threading.Lock()
+
+def _sampled_keys(coll, n):
+    # Top-level keys plus stats.<key> of up to n random documents
+    stats = {"$cond": [{"$eq": [{"$type": "$stats"}, "object"]}, "$stats", {}]}
+    return {d["_id"] for d in coll.aggregate([
+        {"$sample": {"size": n}},
+        {"$project": {"kv": {"$concatArrays": [
+            {"$objectToArray": "$$ROOT"},
+            {"$map": {"input": {"$objectToArray": stats}, "as": "s",
+                      "in": {"k": {"$concat": ["stats.", "$$s.k"]}, "v": "$$s.v"}}},
+        ]}}},
+        {"$unwind": "$kv"},
+        {"$group": {"_id": "$kv.k"}},
+    ])}
+
+def resolve_appearance_schema(db):
+    names = set(db.list_collection_names())
+    coll_name = next((c for c in APPEARANCE_COLLECTIONS if c in names), None)
+    if not coll_name:
+        return {"collection": None}
+    marker = db.etl_state.find_one({"_id": "appearance_schema"}) or {}
+    if marker.get("collection") == coll_name and marker.get("normalized"):
+        keys = set(APPEARANCE_FIELDS) | {"_id"}
+    else:
+        keys = _sampled_keys(db[coll_name], APPEARANCE_SCHEMA_SAMPLE)
+    fields = {}
+    for canonical, stored in APPEARANCE_FIELDS.items():
+        present = [f for f in stored if f in keys]
+        fields[canonical] = present or [canonical]
+    projection = {f: 1 for stored in fields.values() for f in stored}
+    projection.setdefault("_id", 1)
+    return {
+        "collection": coll_name,
+        "fields": fields,
+        "sort_field": next((f for f in APPEARANCE_SORT_FIELDS if f in keys), "appearance_id"),
+        "projection": projection,
+        "normalized": all(v == [k] for k, v in fields.items() if k != "appearance_id"),
+        "resolved_at": int(time.time()),
+    }
+
+def appearance_schema(refresh=False):
+    global _appearance_schema
+    with _appearance_schema_lock:
+        if refresh or _appearance_schema is None or not _appearance_schema["collection"]:
+            _appearance_schema = resolve_appearance_schema(mongo_db)
+        return _appearance_schema
+
+def _doc_value(d, path):
+    for part in path.split("."):
+        if not isinstance(d, dict):
+            return None
+        d = d.get(part)
+    return d
+
+@app.post("/api/mongo/appearances/schema/refresh")
+def api_mongo_appearance_schema_refresh():
+    try:
+        return jsonify(appearance_schema(refresh=True))
+    except Exception as err:
+        return jsonify({"error": str(err), "details": repr(err)}), 500
 
 # Mongo: Appearances list (optional read model)
 @app.get("/api/mongo/appearances/list")
@@ -3247,137 +4046,67 @@ def api_mongo_appearances_list():
     page = max(int(request.args.get("page", 1)), 1)
     page_size = min(max(int(request.args.get("page_size", 20)), 1), 100)
     search = request.args.get("search", "").strip()
-    skip = (page - 1) * page_size
+    try:
+        after = decode_after(request.args.get("after"))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    skip = 0 if after else (page - 1) * page_size
     debug_flag = request.args.get("debug") == "1"
 
     def _q(db):
-        # Support multiple possible collection names for robustness.
-        coll_name = None
-        for cand in ["appearances", "appearance", "player_appearances"]:
-            if cand in db.list_collection_names():
-                coll_name = cand
-                break
-        if not coll_name:
-            return [], 0, {"reason": "no_collection"}
-        coll = db[coll_name]
-
-        # Build search query with synonym matching for player/club names
+        schema = appearance_schema()
+        if not schema["collection"]:
+            return [], (0, False), {"reason": "no_collection"}, None
+        coll = db[schema["collection"]]
+        fields = schema["fields"]
+        sort_field = schema["sort_field"]
+
+        # Search on game_id (numeric) or player/club name, under whichever
+        # names the collection stores them
         query = {}
         if search:
             or_clauses = []
-            # Numeric game_id match
             try:
                 g_id = int(search)
-                or_clauses.append({"game_id": g_id})
-                or_clauses.append({"gameId": g_id})
+                or_clauses += [{f: g_id} for f in fields["game_id"]]
             except ValueError:
                 pass
             regex_clause = {"$regex": search, "$options": "i"}
-            for name_field in ["player_name", "name", "playerName"]:
-                or_clauses.append({name_field: regex_clause})
-            for club_field in ["club_name", "club", "team_name", "clubName"]:
-                or_clauses.append({club_field: regex_clause})
-            if or_clauses:
-                query["$or"] = or_clauses
-
-        total = coll.count_documents(query)
-
-        # Determine sort field – prefer 'date', else fallback to other date synonyms.
-        sort_field = None
-        for sf in ["date", "match_date", "date_str", "game_date", "transfer_date"]:
-            if coll.find_one({sf: {"$exists": True}}):
-                sort_field = sf
-                break
-        if not sort_field:
-            sort_field = "appearance_id"  # fallback deterministic ordering
+            or_clauses += [{f: regex_clause} for f in fields["player_name"] + fields["club_name"]]
+            query["$or"] = or_clauses
 
-        projection = {
-            "appearance_id": 1,
-            "game_id": 1,
-            "gameId": 1,
-            "match_id": 1,
-            "player_id": 1,
-            "playerId": 1,
-            "player_club_id": 1,
-            "club_id": 1,
-            "clubId": 1,
-            "player_current_club_id": 1,
-            "date": 1,
-            "date_str": 1,
-            "match_date": 1,
-            "game_date": 1,
-            "yellow_cards": 1,
-            "yellow": 1,
-            "yc": 1,
-            "red_cards": 1,
-            "red": 1,
-            "rc": 1,
-            "goals": 1,
-            "goal": 1,
-            "goals_scored": 1,
-            "assists": 1,
-            "assist": 1,
-            "minutes_played": 1,
-            "minutes": 1,
-            "mins": 1,
-            "time_played": 1,
-            "player_name": 1,
-            "name": 1,
-            "playerName": 1,
-            "club_name": 1,
-            "club": 1,
-            "team_name": 1,
-            "clubName": 1,
-            "stats": 1
-        }
+        total = list_total("mongo", "appearance", {"search": search},
+                           lambda: coll.count_documents(query), coll.estimated_document_count)
 
-        cur = coll.find(query, projection).sort(sort_field, -1).skip(skip).limit(page_size)
+        if after:
+            query = mongo_seek(query, sort_field, "_id", after)
+        cur = coll.find(query, schema["projection"]).sort([(sort_field, -1), ("_id", -1)]).skip(skip).limit(page_size)
         rows = []
         first_doc_keys = None
+        last = None
         for d in cur:
+            last = d
             if first_doc_keys is None:
                 first_doc_keys = list(d.keys())
-            stats = d.get("stats") or {}
-            def pick(*keys):
-                for k in keys:
-                    v = d.get(k)
+            row = {}
+            for canonical, stored in fields.items():
+                v = None
+                for f in stored:
+                    v = _doc_value(d, f)
                     if v is not None and v != "":
-                        return v
-                return None
-            appearance_id = pick("appearance_id", "_id")
-            game_id = pick("game_id", "gameId", "match_id")
-            player_id = pick("player_id", "playerId")
-            player_club_id = pick("player_club_id", "club_id", "clubId")
-            player_current_club_id = d.get("player_current_club_id")
-            date_val = pick("date", "date_str", "match_date", "game_date")
-            yellow = pick("yellow_cards", "yellow", "yc") or stats.get("yellow_cards")
-            red = pick("red_cards", "red", "rc") or stats.get("red_cards")
-            goals = pick("goals", "goal", "goals_scored") or stats.get("goals")
-            assists = pick("assists", "assist") or stats.get("assists")
-            minutes_played = pick("minutes_played", "minutes", "mins", "time_played") or stats.get("minutes_played")
-            player_name = pick("player_name", "name", "playerName")
-            club_name = pick("club_name", "club", "team_name", "clubName")
-            rows.append({
-                "appearance_id": appearance_id,
-                "game_id": game_id,
-                "player_id": player_id,
-                "player_club_id": player_club_id,
-                "player_current_club_id": player_current_club_id,
-                "date": date_val,
-                "yellow_cards": yellow,
-                "red_cards": red,
-                "goals": goals,
-                "assists": assists,
-                "minutes_played": minutes_played,
-                "player_name": player_name,
-                "club_name": club_name
-            })
-        meta = {"collection": coll_name, "sort_field": sort_field}
+                        break
+                row[canonical] = None if v == "" else v
+            rows.append(row)
+        meta = {"collection": schema["collection"], "sort_field": sort_field,
+                "normalized": schema["normalized"], "schema_resolved_at": schema["resolved_at"]}
         if debug_flag:
             meta["first_doc_keys"] = first_doc_keys
-        return rows, total, meta
-    (rows, total, meta), ms = run_mongo(_q)
-    payload = dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total, source="mongo")
+        # Token from the raw sort field, which may not be the "date" output column
+        token = encode_after(_doc_value(last, sort_field), last["_id"]) if len(rows) == page_size else None
+        return rows, total, meta, token
+    (rows, (total, total_is_estimate), meta, token), ms = run_mongo(_q)
+    payload = dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total,
+                   total_is_estimate=total_is_estimate, source="mongo", next_after=token)
     if debug_flag:
         payload["meta"] = meta
     return jsonify(payload)
@@ -3439,25 +4168,27 @@ def api_create_appearance():
             VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
         """
 
-        run_sql(sql, (
-            appearance_id,
-            as_int(data.get("game_id")),
-            as_int(data.get("player_id")),
-            as_int(data.get("player_club_id")),
-            as_int(data.get("player_current_club_id")),
-            data.get("date"),
-            as_int(data.get("yellow_cards")),
-            as_int(data.get("red_cards")),
-            as_int(data.get("goals")),
-            as_int(data.get("assists")),
-            as_int(data.get("minutes_played"))
-        ))
+        with sql_transaction() as cur:
+            cur.execute(sql, (
+                appearance_id,
+                as_int(data.get("game_id")),
+                as_int(data.get("player_id")),
+                as_int(data.get("player_club_id")),
+                as_int(data.get("player_current_club_id")),
+                data.get("date"),
+                as_int(data.get("yellow_cards")),
+                as_int(data.get("red_cards")),
+                as_int(data.get("goals")),
+                as_int(data.get("assists")),
+                as_int(data.get("minutes_played"))
+            ))
+            refresh_player_season_stats(cur, player_season_keys(cur, "a.appearance_id = %s", (appearance_id,)))
 
         # --------------------------------------------------------
         # INSERT INTO MONGO (CORRECT FORMAT)
         # --------------------------------------------------------
         def mongo_insert(db):
-            return db.appearances.insert_one({
+            res = db.appearances.insert_one({
                 "_id": appearance_id,
                 "appearance_id": appearance_id,
                 "game_id": as_int(data.get("game_id")),
@@ -3475,6 +4206,9 @@ def api_create_appearance():
                 "club_name": club_name,
                 "updated_at": int(time.time())
             })
+            # club_transfer_roi: the appearance counts towards the player's earlier transfers
+            mongo_refresh_transfer_roi(db, {"player_id": as_int(data.get("player_id"))})
+            return res
 
         run_mongo(mongo_insert)
 
@@ -3531,25 +4265,31 @@ def api_update_appearance(appearance_id):
             WHERE appearance_id=%s
         """
 
-        run_sql(sql, (
-            as_int(data.get("game_id")),
-            as_int(data.get("player_id")),
-            as_int(data.get("player_club_id")),
-            as_int(data.get("player_current_club_id")),
-            data.get("date"),
-            as_int(data.get("yellow_cards")),
-            as_int(data.get("red_cards")),
-            as_int(data.get("goals")),
-            as_int(data.get("assists")),
-            as_int(data.get("minutes_played")),
-            appearance_id
-        ))
+        with sql_transaction() as cur:
+            # Keys before and after: the appearance may move to another game or player
+            keys = player_season_keys(cur, "a.appearance_id = %s", (appearance_id,))
+            cur.execute(sql, (
+                as_int(data.get("game_id")),
+                as_int(data.get("player_id")),
+                as_int(data.get("player_club_id")),
+                as_int(data.get("player_current_club_id")),
+                data.get("date"),
+                as_int(data.get("yellow_cards")),
+                as_int(data.get("red_cards")),
+                as_int(data.get("goals")),
+                as_int(data.get("assists")),
+                as_int(data.get("minutes_played")),
+                appearance_id
+            ))
+            keys |= player_season_keys(cur, "a.appearance_id = %s", (appearance_id,))
+            refresh_player_season_stats(cur, keys)
 
         # --------------------------------------------------------
         # MONGO UPDATE (CORRECT ETL FORMAT)
         # --------------------------------------------------------
         def mongo_update(db):
-            return db.appearances.update_one(
+            # BEFORE image: the appearance may have moved off another player's transfers
+            old = db.appearances.find_one_and_update(
                 {"appearance_id": appearance_id},
                 {
                     "$set": {
@@ -3566,9 +4306,17 @@ def api_update_appearance(appearance_id):
                         "player_name": player_name,
                         "club_name": club_name,
                         "updated_at": int(time.time())
-                    }
-                }
+                    },
+                    "$unset": {"_hash": ""}
+                },
+                projection={"player_id": 1},
+                return_document=ReturnDocument.BEFORE
             )
+            pids = {as_int(data.get("player_id"))}
+            if old:
+                pids.add(old.get("player_id"))
+            mongo_refresh_transfer_roi(db, {"player_id": {"$in": list(pids)}})
+            return old
 
         run_mongo(mongo_update)
 
@@ -3583,13 +4331,20 @@ def api_delete_appearance(appearance_id):
         # --------------------------------------------------------
         # DELETE FROM SQL
         # --------------------------------------------------------
-        run_sql("DELETE FROM appearance WHERE appearance_id=%s", (appearance_id,))
+        with sql_transaction() as cur:
+            keys = player_season_keys(cur, "a.appearance_id = %s", (appearance_id,))
+            cur.execute("DELETE FROM appearance WHERE appearance_id=%s", (appearance_id,))
+            refresh_player_season_stats(cur, keys)
 
         # --------------------------------------------------------
         # DELETE FROM MONGO
         # --------------------------------------------------------
         def mongo_delete(db):
-            return db.appearances.delete_one({"appearance_id": appearance_id})
+            old = db.appearances.find_one_and_delete({"appearance_id": appearance_id},
+                                                     projection={"player_id": 1})
+            if old:
+                mongo_refresh_transfer_roi(db, {"player_id": old.get("player_id")})
+            return old
 
         run_mongo(mongo_delete)
 
@@ -3621,7 +4376,11 @@ def api_transfers_list():
     page = max(int(request.args.get("page", 1)), 1)
     page_size = min(max(int(request.args.get("page_size", 20)), 1), 100)
     search = request.args.get("search", "").strip()
-    offset = (page - 1) * page_size
+    try:
+        after = decode_after(request.args.get("after"))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    offset = 0 if after else (page - 1) * page_size
 
     sql = """
       SELECT t.transfer_id, t.player_id, t.transfer_date, t.transfer_season,
@@ -3646,14 +4405,24 @@ def api_transfers_list():
     if search:
         count_sql += " AND (p.name LIKE %s OR fc.name LIKE %s OR tc.name LIKE %s)"
 
-    count_rows, _ = run_sql(count_sql, tuple(params))
-    total = count_rows[0]["total"] if count_rows else 0
+    def _count():
+        count_rows, _ = run_sql(count_sql, tuple(params))
+        return count_rows[0]["total"] if count_rows else 0
+    total, total_is_estimate = list_total("sql", "transfer", {"search": search}, _count,
+                                          lambda: sql_estimated_rows("transfer"))
+
+    if after:
+        cond, vals = sql_seek("t.transfer_date", "t.transfer_id", after)
+        sql += " AND " + cond
+        params.extend(vals)
 
-    sql += " ORDER BY t.transfer_date DESC LIMIT %s OFFSET %s"
+    sql += " ORDER BY t.transfer_date DESC, t.transfer_id DESC LIMIT %s OFFSET %s"
     params.extend([page_size, offset])
 
     rows, ms, perf = run_sql_ex(sql, tuple(params))
-    return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total, perf=perf))
+    return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total,
+                        total_is_estimate=total_is_estimate, perf=perf,
+                        next_after=next_after(rows, page_size, "transfer_date", "transfer_id")))
 
 # Mongo: transfers list with pagination & search
 @app.get("/api/mongo/transfers/list")
@@ -3661,7 +4430,11 @@ def api_mongo_transfers_list():
     page = max(int(request.args.get("page", 1)), 1)
     page_size = min(max(int(request.args.get("page_size", 20)), 1), 100)
     search = request.args.get("search", "").strip()
-    offset = (page - 1) * page_size
+    try:
+        after = decode_after(request.args.get("after"))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    offset = 0 if after else (page - 1) * page_size
 
     def _q(db):
         flt = {}
@@ -3672,8 +4445,11 @@ def api_mongo_transfers_list():
                 {"from.name": regex},
                 {"to.name": regex},
             ]
-        total = db.transfers.count_documents(flt)
-        docs = db.transfers.find(flt).sort("transfer_date", -1).skip(offset).limit(page_size)
+        total, estimate = list_total("mongo", "transfer", {"search": search},
+                                     lambda: db.transfers.count_documents(flt), db.transfers.estimated_document_count)
+        if after:
+            flt = mongo_seek(flt, "transfer_date", "_id", after)
+        docs = db.transfers.find(flt).sort([("transfer_date", -1), ("_id", -1)]).skip(offset).limit(page_size)
         rows = []
         for d in docs:
             rows.append({
@@ -3689,10 +4465,12 @@ def api_mongo_transfers_list():
                 "transfer_fee": d.get("transfer_fee"),
                 "market_value_in_eur": d.get("market_value_in_eur"),
             })
-        return {"rows": rows, "total": total}
+        return {"rows": rows, "total": total, "total_is_estimate": estimate}
 
     data, ms = run_mongo(_q)
-    return jsonify(dict(ms=ms, source="mongo", rows=data["rows"], total=data["total"], page=page, page_size=page_size))
+    return jsonify(dict(ms=ms, source="mongo", rows=data["rows"], total=data["total"],
+                        total_is_estimate=data["total_is_estimate"], page=page, page_size=page_size,
+                        next_after=next_after(data["rows"], page_size, "transfer_date", "transfer_id")))
 
 # Get single transfer
 @app.get("/api/transfer/<int:transfer_id>")
@@ -3772,20 +4550,15 @@ def api_create_transfer():
         def mongo_insert(db):
             doc = {
                 "_id": transfer_id,
-                "from": {
-                    "player_id": as_int(data.get("player_id")),
-                    "market_value_in_eur": as_int(data.get("market_value_in_eur"))
-                },
-                "to": {
-                    "transfer_date": data.get("transfer_date"),
-                    "transfer_fee": as_int(data.get("transfer_fee")),
-                    "transfer_season": data.get("transfer_season")
-                },
+                "player_id": as_int(data.get("player_id")),
+                "from": {"club_id": as_int(data.get("from_club_id")), "name": from_club_name or ""},
+                "to": {"club_id": as_int(data.get("to_club_id")), "name": to_club_name or ""},
 
                 # 🔥 ADD FLATTENED KEYS FOR FRONTEND TABLE
                 "transfer_date": data.get("transfer_date"),
                 "transfer_fee": as_int(data.get("transfer_fee")),
                 "transfer_season": data.get("transfer_season"),
+                "market_value_in_eur": as_int(data.get("market_value_in_eur")),
 
                 "player_name": player_name,
                 "from_club_name": from_club_name,
@@ -3793,7 +4566,10 @@ def api_create_transfer():
                 "updated_at": int(time.time())
             }
 
-            return db.transfers.insert_one(doc)
+            res = db.transfers.insert_one(doc)
+            # club_transfer_roi: compute this transfer's post-transfer totals
+            mongo_refresh_transfer_roi(db, {"_id": transfer_id})
+            return res
 
 
         run_mongo(mongo_insert)
@@ -3881,19 +4657,14 @@ def api_update_transfer(transfer_id):
         # --------------------------------------------------------
         def mongo_update(db):
             new_doc = {
-                "from": {
-                    "player_id": as_int(data.get("player_id")),
-                    "market_value_in_eur": as_int(data.get("market_value_in_eur"))
-                },
-                "to": {
-                    "transfer_date": data.get("transfer_date"),
-                    "transfer_fee": as_int(data.get("transfer_fee")),
-                    "transfer_season": data.get("transfer_season")
-                },
+                "player_id": as_int(data.get("player_id")),
+                "from": {"club_id": as_int(data.get("from_club_id")), "name": from_club_name or ""},
+                "to": {"club_id": as_int(data.get("to_club_id")), "name": to_club_name or ""},
 
                 "transfer_date": data.get("transfer_date"),
                 "transfer_fee": as_int(data.get("transfer_fee")),
                 "transfer_season": data.get("transfer_season"),
+                "market_value_in_eur": as_int(data.get("market_value_in_eur")),
 
                 "player_name": player_name,
                 "from_club_name": from_club_name,
@@ -3901,10 +4672,13 @@ def api_update_transfer(transfer_id):
                 "updated_at": int(time.time())
             }
 
-            return db.transfers.update_one(
+            res = db.transfers.update_one(
                 {"_id": as_int(transfer_id)},
-                {"$set": new_doc}
+                {"$set": new_doc, "$unset": {"_hash": ""}}
             )
+            # club_transfer_roi: player, date or club may have changed, recompute the doc
+            mongo_refresh_transfer_roi(db, {"_id": as_int(transfer_id)})
+            return res
 
         run_mongo(mongo_update)
 
@@ -3937,6 +4711,7 @@ def api_delete_transfer(transfer_id):
             except:
                 transfer_id_cast = transfer_id
 
+            db.club_transfer_roi.delete_one({"_id": transfer_id_cast})
             return db.transfers.delete_one({"_id": transfer_id_cast})
 
         run_mongo(mongo_delete)
@@ -4013,97 +4788,46 @@ def api_game_events_list():
     rows, ms, perf = run_sql_ex(sql, tuple(params))
     return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total, perf=perf))
 
-# Mongo: Game events list (unwinds events embedded in games collection)
+# Mongo: Game events list (flat game_events collection, see etl_full.py --gameevents)
+# Equality on game_id or type plus (minute, _id) order is served by the
+# collection's compound indexes; ?after= seeks like the other lists.
+EVENT_TYPES = ("Cards", "Goals", "Shootout", "Substitutions")
+
 @app.get("/api/mongo/game-events/list")
 def api_mongo_game_events_list():
     page = max(int(request.args.get("page", 1)), 1)
     page_size = min(max(int(request.args.get("page_size", 20)), 1), 100)
     game_id = request.args.get("game_id", "").strip()
     event_type = request.args.get("type", "").strip()
-    skip = (page - 1) * page_size
+    try:
+        after = decode_after(request.args.get("after"))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    skip = 0 if after else (page - 1) * page_size
 
-    # Map UI event categories to underlying type predicates
-    category_filters = {
-        "Goals": lambda t: "goal" in (t or "").lower(),
-        "Cards": lambda t: "card" in (t or "").lower(),
-        "Substitutions": lambda t: "sub" in (t or "").lower(),
-        "Shootout": lambda t: "shoot" in (t or "").lower() or "pen" in (t or "").lower(),
-    }
+    flt = {}
+    if game_id:
+        try:
+            flt["game_id"] = int(game_id)
+        except ValueError:
+            return jsonify({"error": "game_id must be an integer"}), 400
+    if event_type in EVENT_TYPES:
+        flt["type"] = event_type
+    projection = {"_id": 0, "updated_at": 0}
+    sort = [("minute", 1), ("_id", 1)]
 
     def _q(db):
-        if "games" not in db.list_collection_names():
-            return [], 0
-        base_query = {}
-        if game_id:
-            try:
-                base_query["_id"] = int(game_id)
-            except ValueError:
-                base_query["_id"] = game_id  # if string IDs ever used
-
-        # Fetch matching games first (small subset if game_id provided)
-        cur = db.games.find(base_query, {"_id":1, "date":1, "home":1, "away":1, "events":1})
-        all_events = []
-        for g in cur:
-            gid = g.get("_id")
-            home = g.get("home") or {}
-            away = g.get("away") or {}
-            home_id = home.get("club_id")
-            away_id = away.get("club_id")
-            home_name = home.get("name")
-            away_name = away.get("name")
-            events = g.get("events") or []
-            for idx, ev in enumerate(events):
-                t = ev.get("type") or ev.get("event_type")
-                # Category filter
-                if event_type and event_type in category_filters:
-                    if not category_filters[event_type](t):
-                        continue
-                club_id = ev.get("club_id")
-                # Resolve club name using home/away context
-                club_name = None
-                if club_id == home_id:
-                    club_name = home_name
-                elif club_id == away_id:
-                    club_name = away_name
-                # Assist / sub naming
-                assist_name = ev.get("assist_name")
-                player_in_name = ev.get("player_in_name")
-                row = {
-                    # Synthesize stable event id (game_event_id missing in embedded doc)
-                    "game_event_id": ev.get("game_event_id") or f"{gid}_{idx}",
-                    "game_id": gid,
-                    "minute": ev.get("minute"),
-                    "type": t,
-                    "club_id": club_id,
-                    "club_name": club_name,
-                    "player_id": ev.get("player_id"),
-                    "player_name": ev.get("player_name"),
-                    "player_in_id": ev.get("sub_in_id") or ev.get("player_in_id"),
-                    "player_in_name": player_in_name,
-                    "player_assist_id": ev.get("assist_id") or ev.get("player_assist_id"),
-                    "assist_name": assist_name,
-                    "description": ev.get("event_desc") or ev.get("description")
-                }
-                all_events.append(row)
-
-        total = len(all_events)
-        # Sort similar to SQL: minute ascending (nulls last), then synthetic id
-        def sort_key(r):
-            m = r.get("minute")
-            if m is None:
-                m_val = 999999
-            else:
-                try:
-                    m_val = int(m)
-                except Exception:
-                    m_val = 999999
-            return (m_val, str(r.get("game_event_id")))
-        all_events.sort(key=sort_key)
-        page_rows = all_events[skip: skip + page_size]
-        return page_rows, total
-
-    (rows, total), ms = run_mongo(_q)
-    return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total, source="mongo"))
+        total, estimate = list_total("mongo", "game_event", {"game_id": game_id, "type": flt.get("type")},
+                                     lambda: db.game_events.count_documents(flt),
+                                     db.game_events.estimated_document_count)
+        q = mongo_seek(flt, "minute", "_id", after, desc=False) if after else flt
+        rows = list(db.game_events.find(q, projection).sort(sort).skip(skip).limit(page_size))
+        return rows, total, estimate
+
+    (rows, total, total_is_estimate), ms = run_mongo(_q)
+    return jsonify(dict(ms=ms, rows=rows, page=page, page_size=page_size, total=total,
+                        total_is_estimate=total_is_estimate, source="mongo",
+                        next_after=next_after(rows, page_size, "minute", "game_event_id")))
 
 # Helper to generate next sequence for Mongo-only game events
 def mongo_next_sequence(name):
@@ -4115,22 +4839,10 @@ def mongo_next_sequence(name):
 # Mongo: Get single game event
 @app.get("/api/mongo/game-event/<event_id>")
 def api_mongo_game_event_get(event_id):
-    # event_id could be numeric or string
-    try:
-        # try int casting for consistent type matching
-        eid_int = int(event_id)
-        id_query_vals = [eid_int, event_id]
-    except ValueError:
-        id_query_vals = [event_id]
-    game_doc = mongo_db.games.find_one({"events.game_event_id": {"$in": id_query_vals}}, {"_id":1})
-    if not game_doc:
+    row = mongo_db.game_events.find_one({"_id": event_id}, {"_id": 0, "updated_at": 0})
+    if not row:
         return jsonify({"error": "Event not found"}), 404
-    for ev in game_doc.get("events", []):
-        if ev.get("game_event_id") in id_query_vals:
-            ev_out = ev.copy()
-            ev_out["game_id"] = game_doc.get("_id")
-            return jsonify(dict(row=ev_out))
-    return jsonify({"error": "Event not found"}), 404
+    return jsonify(dict(row=row))
 
 def generate_event_id():
     return uuid.uuid4().hex  # 32 character hex
@@ -4214,10 +4926,29 @@ def api_create_game_event():
                 "event_desc": data.get("description"),
             }
 
-            return db.games.update_one(
+            res = db.games.update_one(
                 {"_id": game_id_cast},
-                {"$push": {"events": event_doc}}
+                {"$push": {"events": event_doc}, "$unset": {"_hash": ""}}
             )
+            # Flat copy for the events list (same shape as etl_full.game_event_doc)
+            db.game_events.insert_one({
+                "_id": game_event_id,
+                "game_event_id": game_event_id,
+                "game_id": game_id_cast,
+                "minute": event_doc["minute"],
+                "type": event_doc["type"],
+                "club_id": event_doc["club_id"],
+                "club_name": club_name,
+                "player_id": event_doc["player_id"],
+                "player_name": player_name,
+                "player_in_id": event_doc["sub_in_id"],
+                "player_in_name": player_in_name,
+                "player_assist_id": event_doc["assist_id"],
+                "assist_name": assist_name,
+                "description": event_doc["event_desc"],
+                "updated_at": int(time.time())
+            })
+            return res
 
         run_mongo(mongo_insert)
 
@@ -4245,6 +4976,13 @@ def api_game_event_update(event_id):
         def as_int(v):
             return int(v) if (v not in [None, "", "null"]) else None
 
+        def get_name(table, key):
+            if not data.get(key):
+                return None
+            rows, _ = run_sql(f"SELECT name FROM {table} WHERE {table}_id=%s",
+                              (data[key],))
+            return rows[0]["name"] if rows else None
+
         # --------------------------------------------------------
         # SQL UPDATE
         # --------------------------------------------------------
@@ -4303,12 +5041,29 @@ def api_game_event_update(event_id):
                 if key in data:
                     update_fields[f"events.$.{field}"] = data.get(key)
 
+            # Flat copy: every column plus the names, resolved like the ETL's LEFT JOINs
+            db.game_events.update_one({"_id": event_id}, {"$set": {
+                "game_id": game_id_cast,
+                "minute": as_int(data.get("minute")),
+                "type": data.get("type"),
+                "club_id": as_int(data.get("club_id")),
+                "club_name": get_name("club", "club_id"),
+                "player_id": as_int(data.get("player_id")),
+                "player_name": get_name("player", "player_id"),
+                "player_in_id": as_int(data.get("player_in_id")),
+                "player_in_name": get_name("player", "player_in_id"),
+                "player_assist_id": as_int(data.get("player_assist_id")),
+                "assist_name": get_name("player", "player_assist_id"),
+                "description": data.get("description"),
+                "updated_at": int(time.time())
+            }, "$unset": {"_hash": ""}})
+
             if not update_fields:
                 return None
 
             return db.games.update_one(
                 {"_id": game_id_cast, "events.game_event_id": event_id},
-                {"$set": update_fields}
+                {"$set": update_fields, "$unset": {"_hash": ""}}
             )
 
         run_mongo(mongo_update)
@@ -4397,9 +5152,10 @@ def api_delete_game_event(event_id):
         # DELETE FROM MONGO (games.events[])
         # --------------------------------------------------------
         def mongo_delete(db):
+            db.game_events.delete_one({"_id": event_id})
             return db.games.update_one(
                 {"_id": game_id},
-                {"$pull": {"events": {"game_event_id": event_id}}}
+                {"$pull": {"events": {"game_event_id": event_id}}, "$unset": {"_hash": ""}}
             )
 
         run_mongo(mongo_delete)
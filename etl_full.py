@@ -1,58 +1,221 @@
-import os, sys, time, argparse
+import os, sys, time, argparse, functools, threading, queue, hashlib, json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import pymysql
-from pymongo import MongoClient, UpdateOne
+from pymysql.constants import FIELD_TYPE
+from pymongo import MongoClient, UpdateOne, IndexModel
 from dotenv import load_dotenv
 from decimal import Decimal
+from itertools import groupby
 
 load_dotenv()
 
 # --- Connections ---
-sql = pymysql.connect(
-    host=os.getenv("DB_HOST", "localhost"),
-    user=os.getenv("DB_USER", "root"),
-    password=os.getenv("DB_PASS", ""),
-    database=os.getenv("DB_NAME", "football_db"),
-    cursorclass=pymysql.cursors.DictCursor,
-    autocommit=True,
-)
-mongo = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
-mdb = mongo.get_database(os.getenv("MONGO_DB", "football_nonrelationaldb"))
-
-def ensure_indexes():
-    mdb.games.create_index([("competition_id", 1), ("season", 1), ("date", -1)])
-    mdb.games.create_index([("home.club_id", 1)])
-    mdb.games.create_index([("away.club_id", 1)])
-    mdb.player_seasons.create_index([("player_id", 1), ("competition_id", 1), ("season", -1)])
-    mdb.transfers.create_index([("player_id", 1), ("transfer_date", -1)])
-    mdb.transfers.create_index([("to.club_id", 1), ("transfer_season", -1)])
-    # Transfers additional indexes to support Mongo list search
-    mdb.transfers.create_index([("player_name", 1)])
-    mdb.transfers.create_index([("from.name", 1)])
-    mdb.transfers.create_index([("to.name", 1)])
+def sql_connect(**overrides):
+    args = dict(
+        host=os.getenv("DB_HOST", "localhost"),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASS", ""),
+        database=os.getenv("DB_NAME", "football_db"),
+        cursorclass=pymysql.cursors.DictCursor,
+        autocommit=True,
+    )
+    args.update(overrides)
+    return pymysql.connect(**args)
+
+# Connections are opened lazily, one set per process: stages run in pool
+# workers (see run_stages) and must not share the parent's sockets.
+_conns = {}
+
+def _process_conns():
+    if _conns.get("pid") != os.getpid():
+        _conns.clear()
+        _conns["pid"] = os.getpid()
+    return _conns
+
+def get_sql():
+    conns = _process_conns()
+    if "sql" not in conns:
+        conns["sql"] = sql_connect()
+    return conns["sql"]
+
+def get_mdb():
+    conns = _process_conns()
+    if "mdb" not in conns:
+        mongo = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+        conns["mdb"] = mongo.get_database(os.getenv("MONGO_DB", "football_nonrelationaldb"))
+    return conns["mdb"]
+
+# Collection -> [(keys, options, endpoints the index is there for)]
+INDEXES = {
+    "games": [
+        ([("competition_id", 1), ("season", 1), ("date", -1), ("_id", -1)], {},
+         "mongo player/form, competitions/<id>/seasons, games/list"),
+        ([("date", -1), ("_id", -1)], {}, "mongo games/list order + after seek"),
+        ([("home.club_id", 1)], {}, "mongo club/<id>/matches, club/<id>/competitions"),
+        ([("away.club_id", 1)], {}, "mongo club/<id>/matches, club/<id>/competitions"),
+    ],
+    # Flat events: equality on game or type, minute order (+ _id for the after seek)
+    "game_events": [
+        ([("game_id", 1), ("minute", 1), ("_id", 1)], {}, "mongo game-events/list?game_id="),
+        ([("type", 1), ("minute", 1), ("_id", 1)], {}, "mongo game-events/list?type="),
+        ([("minute", 1), ("_id", 1)], {}, "mongo game-events/list order + after seek"),
+        # _id is the game_event_id, so mongo game-event/<id> uses the _id index
+    ],
+    "player_seasons": [
+        ([("player_id", 1), ("competition_id", 1), ("season", -1)], {},
+         "mongo players/<id>/seasons, competitions, season-summary, player/<id>/matches"),
+    ],
+    "transfers": [
+        ([("player_id", 1), ("transfer_date", -1)], {}, "mongo player/<id>/career"),
+        ([("transfer_date", -1), ("_id", -1)], {}, "mongo transfers/list order + after seek"),
+        ([("to.club_id", 1), ("transfer_season", -1)], {}, "mongo club/roi"),
+        # Transfers additional indexes to support Mongo list search
+        ([("player_name", 1)], {}, "mongo transfers/list search"),
+        ([("from.name", 1)], {}, "mongo transfers/list search"),
+        ([("to.name", 1)], {}, "mongo transfers/list search"),
+    ],
+    # One doc per transfer; equality on club + season, already ordered by the default sort
+    "club_transfer_roi": [
+        ([("to.club_id", 1), ("transfer_season", 1), ("post_minutes", -1)], {},
+         "mongo club/roi (default sort_by=post_minutes)"),
+    ],
     # Players collection indexes (added for profile + market compare queries)
-    mdb.players.create_index([("player_id", 1)], unique=True)
-    mdb.players.create_index([("market_value_eur", -1)])
-    mdb.players.create_index([("position", 1)])
-    mdb.players.create_index([("current_club_id", 1)])
-    mdb.players.create_index([("country_of_citizenship", 1)])
-    mdb.players.create_index([("agent_name", 1)])
-    mdb.players.create_index([("city_of_birth", 1)])
+    "players": [
+        ([("player_id", 1)], {"unique": True}, "mongo player profile/edit lookups, top-scorers"),
+        ([("market_value_eur", -1), ("_id", -1)], {},
+         "mongo players/top-market, players list (order + after seek)"),
+        # market-compare: equality on the category field, then already sorted by value
+        ([("position", 1), ("market_value_eur", -1)], {}, "mongo market-compare?category=position"),
+        ([("current_club_id", 1), ("market_value_eur", -1)], {},
+         "mongo club/<id>/players, market-compare?category=club"),
+        ([("country_of_citizenship", 1), ("market_value_eur", -1)], {}, "mongo market-compare?category=citizenship"),
+        ([("agent_name", 1), ("market_value_eur", -1)], {}, "mongo market-compare?category=agent"),
+        ([("city_of_birth", 1), ("market_value_eur", -1)], {}, "mongo market-compare?category=city"),
+        ([("dob", 1)], {}, "mongo market-compare?category=age (dob range)"),
+    ],
     # Clubs collection indexes (for Mongo club endpoints)
-    mdb.clubs.create_index([("club_id", 1)], unique=True)
-    mdb.clubs.create_index([("name", 1)])
-    mdb.clubs.create_index([("total_market_value_eur", -1)])
+    "clubs": [
+        ([("club_id", 1)], {"unique": True}, "mongo club/<id>/profile"),
+        ([("name", 1), ("club_id", 1)], {}, "mongo clubs/list order + after seek"),
+        ([("total_market_value_eur", -1)], {}, "mongo clubs/market-ranking"),
+        ([("market_value_rank", 1)], {}, "mongo clubs/market-ranking, club profile rank"),
+        ([("domestic_competition_id", 1), ("total_market_value_eur", -1)], {},
+         "mongo clubs/market-ranking?competition_id"),
+    ],
     # Appearances collection indexes (for Mongo appearances list)
-    if "appearances" in mdb.list_collection_names():
-        mdb.appearances.create_index([("game_id", -1), ("date", -1)])
-        mdb.appearances.create_index([("player_id", 1)])
-        mdb.appearances.create_index([("player_name", 1)])
-        mdb.appearances.create_index([("club_name", 1)])
+    "appearances": [
+        ([("date", -1), ("_id", -1)], {}, "mongo appearances/list order + after seek"),
+        ([("player_id", 1), ("date", 1)], {}, "mongo player/form, club/roi $lookup (player, date >= transfer)"),
+        ([("player_name", 1)], {}, "mongo appearances/list search"),
+        ([("club_name", 1)], {}, "mongo appearances/list search"),
+    ],
+}
+
+# pymongo's default index name for a key list
+def index_name(keys):
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+# collections: limit to these names; suffix: index a shadow copy (<name>__building).
+# One createIndexes command per collection, so the server builds them in a single scan.
+# The collections are managed by this script: any other secondary index (e.g. one
+# replaced by a compound index in INDEXES, like players.position_1) is dropped
+# once the spec'd ones exist, so stale indexes do not cost every write.
+def ensure_indexes(collections=None, suffix=""):
+    mdb = get_mdb()
+    existing = set(mdb.list_collection_names())
+    for name, specs in INDEXES.items():
+        if collections is not None and name not in collections:
+            continue
+        # appearances is optional: only index it once the collection exists
+        if name == "appearances" and name + suffix not in existing:
+            continue
+        coll = mdb[name + suffix]
+        coll.create_indexes([IndexModel(keys, **opts) for keys, opts, _ in specs])
+        wanted = {index_name(keys) for keys, _, _ in specs} | {"_id_"}
+        for ix in coll.index_information():
+            if ix not in wanted:
+                coll.drop_index(ix)
+                print(f"  {name + suffix}: dropped stale index {ix}")
+
+# --- Index lifecycle around bulk loads ---
+# Every secondary index is maintained on every upsert. For a full load into a
+# collection that is empty (first run), or with --defer-indexes, the secondary
+# indexes are dropped first and the spec'd ones rebuilt in one pass afterwards;
+# the _id index used by the upserts and hash lookups is never touched.
+# Incremental loads keep their indexes. Returns True when the caller must rebuild.
+def indexes_before_load(name, full_load, defer):
+    coll = get_mdb()[name]
+    if full_load and (defer or coll.estimated_document_count() == 0):
+        dropped = [ix for ix in coll.index_information() if ix != "_id_"]
+        for ix in dropped:
+            coll.drop_index(ix)
+        print(f"  {name}: deferring {len(INDEXES[name])} secondary indexes until after the load"
+              + (f" (dropped {len(dropped)})" if dropped else ""))
+        return True
+    ensure_indexes([name])
+    return False
+
+def indexes_after_load(name, deferred):
+    if deferred:
+        t = time.time()
+        ensure_indexes([name])
+        print(f"  {name}: secondary indexes built in {time.time()-t:.1f}s")
 
 def fetchall(cur, q, args=None):
     cur.execute(q, args or ())
-    return cur.fetchall()
+    return convert_rows(cur.fetchall(), row_converters(cur.description))
+
+# Stream rows through an unbuffered server-side cursor, `chunk` rows per fetch.
+# The connection is busy until the generator is exhausted, so concurrent
+# streams need their own connections (see sql_connect).
+def stream(conn, q, args=None, chunk=2000):
+    with conn.cursor(pymysql.cursors.SSDictCursor) as cur:
+        cur.execute(q, args or ())
+        convs = row_converters(cur.description)
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows:
+                break
+            yield from convert_rows(rows, convs)
+
+# --- Typed row converters ---
+# Built once per query from cursor.description, so only the DECIMAL columns
+# (SUM()s, average_age, ...) and raw DATE columns are touched, instead of
+# sanitize() walking every value of every doc. Doc builders can then use the
+# rows as-is.
+def _decimal_to_int(v):
+    return None if v is None else int(v)
+
+# Scaled DECIMALs keep sanitize()'s typing: whole values (an average_age of
+# 25.0) are stored as int, the rest as float
+def _decimal_to_number(v):
+    if v is None:
+        return None
+    return int(v) if v == v.to_integral_value() else float(v)
+
+def _date_to_str(v):
+    return None if v is None else v.isoformat()
+
+def row_converters(description):
+    convs = []
+    for col in description or ():
+        name, type_code, scale = col[0], col[1], col[5]
+        if type_code in (FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL):
+            convs.append((name, _decimal_to_number if scale else _decimal_to_int))
+        elif type_code in (FIELD_TYPE.DATE, FIELD_TYPE.NEWDATE):
+            convs.append((name, _date_to_str))
+    return convs
+
+def convert_rows(rows, convs):
+    if convs:
+        for r in rows:
+            for name, fn in convs:
+                r[name] = fn(r[name])
+    return rows
 
 # --- Helpers to sanitize Decimal values for Mongo ---
+# (superseded in the stages by the typed converters above; kept for --bench-convert)
 def _to_plain(value):
   if isinstance(value, Decimal):
     # If integer-valued Decimal, cast to int; else cast to float
@@ -89,327 +252,1458 @@ def fmt_date(value):
   except Exception:
     return str(value)
 
-# --- ETL: Games ---
-def upsert_games(batch=1000):
-    print("ETL games...")
+# --- Stage metrics: wall time + peak RSS per stage ---
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except Exception:
+        pass
+    if resource is not None:
+        # No live RSS outside Linux: fall back to the process high-water mark
+        # (ru_maxrss is KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+    return None
+
+STAGE_REPORT = []
+# new/changed/unchanged doc counts of the stage running in this process
+STAGE_COUNTS = {}
+
+# Decorator: time an ETL stage and sample RSS every 0.2s to report the stage's peak
+def stage(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start_rss = current_rss_mb()
+        peak = [start_rss]
+        done = threading.Event()
+        def sample():
+            while not done.wait(0.2):
+                rss = current_rss_mb()
+                if rss is not None and (peak[0] is None or rss > peak[0]):
+                    peak[0] = rss
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        STAGE_COUNTS.clear()
+        t0 = time.time()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            done.set()
+            sampler.join()
+            end_rss = current_rss_mb()
+            if end_rss is not None and (peak[0] is None or end_rss > peak[0]):
+                peak[0] = end_rss
+            t1 = time.time()
+            entry = {"stage": fn.__name__, "seconds": round(t1 - t0, 1),
+                     "start_rss_mb": start_rss, "peak_rss_mb": peak[0],
+                     "started": t0, "ended": t1, "pid": os.getpid(), **STAGE_COUNTS}
+            STAGE_REPORT.append(entry)
+            fmt = lambda v: f"{v:.0f} MB" if v is not None else "n/a"
+            print(f"[{fn.__name__}] {entry['seconds']}s, RSS start {fmt(start_rss)}, peak {fmt(peak[0])}")
+    return wrapper
+
+# Per-stage table plus a timeline (offsets from the first stage start) so
+# overlap between pool workers is visible
+def print_stage_report(width=40):
+    if not STAGE_REPORT:
+        return
+    t0 = min(e["started"] for e in STAGE_REPORT)
+    wall = max(e["ended"] for e in STAGE_REPORT) - t0
+    scale = width / wall if wall > 0 else 0
+    print("\nstage                      seconds   start RSS   peak RSS     pid   start     end  timeline")
+    for e in sorted(STAGE_REPORT, key=lambda e: e["started"]):
+        fmt = lambda v: f"{v:7.0f} MB" if v is not None else "      n/a"
+        a, b = e["started"] - t0, e["ended"] - t0
+        lo = int(a * scale)
+        bar = " " * lo + "#" * max(1, int(b * scale) - lo)
+        print(f"{e['stage']:<25} {e['seconds']:>8}  {fmt(e['start_rss_mb'])}  {fmt(e['peak_rss_mb'])}"
+              f"  {e['pid']:>6}  {a:6.1f}  {b:6.1f}  |{bar:<{width}}|")
+    total = sum(e["ended"] - e["started"] for e in STAGE_REPORT)
+    print(f"wall clock {wall:.1f}s, sum of stages {total:.1f}s")
+    print("\nstage                          new   changed  unchanged")
+    for e in STAGE_REPORT:
+        print(f"{e['stage']:<25} {e.get('new', 0):>8}  {e.get('changed', 0):>8}  {e.get('unchanged', 0):>9}")
+    print(f"{'total':<25} {sum(e.get('new', 0) for e in STAGE_REPORT):>8}  "
+          f"{sum(e.get('changed', 0) for e in STAGE_REPORT):>8}  "
+          f"{sum(e.get('unchanged', 0) for e in STAGE_REPORT):>9}")
+
+# --- Incremental mode: per-collection watermarks (Mongo etl_state) ---
+# Needs the updated_at columns from football_db_etl_watermarks.sql.
+# A watermark is {ts, max_id}: rows with updated_at > ts or pk > max_id are
+# re-extracted. ts comes from the MySQL clock at stage start minus a lag, so
+# rows committed by transactions still open at that moment are picked up again
+# on the next run (upserts make the overlap harmless).
+WATERMARK_LAG_S = int(os.getenv("ETL_WATERMARK_LAG", "60"))
+
+def sql_scalar(q, args=None):
+    with get_sql().cursor() as cur:
+        cur.execute(q, args or ())
+        row = cur.fetchone()
+    return next(iter(row.values())) if row else None
+
+# since: None = full rebuild, "auto" = stored watermark, else an explicit timestamp
+def resolve_since(coll, since):
+    if since is None:
+        return None
+    if since == "auto":
+        doc = get_mdb().etl_state.find_one({"_id": coll})
+        if not doc or "updated_at" not in doc:
+            print(f"{coll}: no watermark recorded yet, running a full rebuild")
+            return None
+        return {"ts": doc["updated_at"], "max_id": doc.get("max_id")}
+    return {"ts": since, "max_id": None}
+
+def watermark_start(max_id_sql=None):
+    ts = sql_scalar("SELECT NOW(3) - INTERVAL %s SECOND", (WATERMARK_LAG_S,))
+    return {"ts": ts, "max_id": sql_scalar(max_id_sql) if max_id_sql else None}
+
+def save_watermark(coll, wm):
+    get_mdb().etl_state.update_one({"_id": coll}, {"$set": {
+        "updated_at": wm["ts"], "max_id": wm["max_id"], "recorded_at": int(time.time())
+    }}, upsert=True)
+
+def since_label(wm):
+    return f" (incremental since {wm['ts']})" if wm else ""
+
+# Deletes: the etl_deletes log filled by the triggers in
+# football_db_etl_watermarks.sql. An incremental stage applies the entries
+# newer than its watermark; prune_deletes() drops those every stage has seen.
+WATERMARKED = ("games", "appearances", "game_events", "player_seasons", "transfers",
+               "club_transfer_roi", "players", "clubs")
+
+def deleted_since(wm, tbl, cols="row_id"):
+    with get_sql().cursor() as cur:
+        return fetchall(cur, f"SELECT DISTINCT {cols} FROM etl_deletes WHERE tbl = %s AND deleted_at > %s",
+                        (tbl, wm["ts"]))
+
+def deleted_ids(wm, tbl, cast=int):
+    return [cast(r["row_id"]) for r in deleted_since(wm, tbl)]
+
+def delete_docs(name, ids, batch, field="_id"):
+    n = 0
+    for i in range(0, len(ids), batch):
+        n += get_mdb()[name].delete_many({field: {"$in": ids[i:i + batch]}}).deleted_count
+    return n
+
+def prune_deletes():
+    marks = [d.get("updated_at") for d in get_mdb().etl_state.find({"_id": {"$in": list(WATERMARKED)}})]
+    if len(marks) < len(WATERMARKED) or None in marks:
+        return 0
+    with get_sql().cursor() as cur:
+        return cur.execute("DELETE FROM etl_deletes WHERE deleted_at <= %s", (min(marks),))
+
+# --- Extract/transform/load pipeline shared by all stages ---
+# reader thread (drains the SQL stream) -> bounded queue -> transform (calling
+# thread) -> bounded queue of doc batches -> writer threads issuing unordered
+# upsert bulk_writes (plain insert_many when loading a shadow collection). A
+# full queue blocks whichever side is ahead, so at most about
+# (ETL_QUEUE_BATCHES * 2 + ETL_WRITERS) batches are in memory while MySQL
+# reads and Mongo writes overlap.
+ETL_WRITERS = int(os.getenv("ETL_WRITERS", "3"))
+ETL_QUEUE_BATCHES = int(os.getenv("ETL_QUEUE_BATCHES", "4"))
+_DONE = object()
+
+# Stable content hash stored as _hash on every doc; updated_at is left out so
+# an unchanged source row hashes the same on every run
+HASH_EXCLUDE = ("_hash", "updated_at")
+
+def content_hash(doc):
+    body = {k: v for k, v in doc.items() if k not in HASH_EXCLUDE}
+    raw = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()
+
+# key/on_checkpoint: batches are numbered as they are transformed; once every
+# batch up to n has been written (writers finish out of order),
+# on_checkpoint(key of its last item, n batches, rows) records the resume point.
+# force: rewrite existing docs even when their stored _hash matches (--force).
+def run_pipeline(coll, source, transform, batch, before_write=None, insert=False,
+                 key=None, on_checkpoint=None, force=False):
+    raw_q = queue.Queue(maxsize=ETL_QUEUE_BATCHES)   # chunks of source items
+    doc_q = queue.Queue(maxsize=ETL_QUEUE_BATCHES)   # batches of docs
+    stats = {"read": 0, "written": 0, "batches": 0, "new": 0, "changed": 0, "unchanged": 0,
+             "reader_blocked_s": 0.0,
+             "transform_idle_s": 0.0, "transform_blocked_s": 0.0, "writers_idle_s": 0.0, "write_s": 0.0}
+    lock = threading.Lock()
+    stop = threading.Event()
+    errors = []
+    batch_info = {}        # seq -> (key of last item, item count)
+    committed = set()
+    frontier = [0, 0]      # contiguous batches written, rows in them
+    ckpt_lock = threading.Lock()
+
+    def count(key, value):
+        with lock:
+            stats[key] += value
+
+    # Blocking put/get that give up once another thread has failed
+    def put(q, item, key):
+        t = time.time()
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                break
+            except queue.Full:
+                pass
+        count(key, time.time() - t)
+
+    def get(q, key):
+        t = time.time()
+        while True:
+            try:
+                item = q.get(timeout=0.5)
+                break
+            except queue.Empty:
+                if stop.is_set():
+                    item = _DONE
+                    break
+        count(key, time.time() - t)
+        return item
+
+    def fail(err):
+        errors.append(err)
+        stop.set()
+
+    def reader():
+        try:
+            chunk = []
+            for item in source:
+                chunk.append(item)
+                if len(chunk) >= batch:
+                    put(raw_q, chunk, "reader_blocked_s"); count("read", len(chunk)); chunk = []
+                    if stop.is_set():
+                        return
+            if chunk:
+                put(raw_q, chunk, "reader_blocked_s"); count("read", len(chunk))
+            put(raw_q, _DONE, "reader_blocked_s")
+        except BaseException as err:
+            fail(err)
+
+    def commit(seq):
+        if on_checkpoint is None:
+            return
+        with ckpt_lock:
+            committed.add(seq)
+            last = _DONE
+            while frontier[0] in committed:
+                committed.discard(frontier[0])
+                last, n = batch_info.pop(frontier[0])
+                frontier[0] += 1
+                frontier[1] += n
+            if last is not _DONE:
+                on_checkpoint(last, frontier[0], frontier[1])
+
+    def writer():
+        try:
+            while True:
+                item = get(doc_q, "writers_idle_s")
+                if item is _DONE:
+                    return
+                seq, docs = item
+                t = time.time()
+                if insert:
+                    new = docs
+                else:
+                    # Skip docs whose stored hash matches: one _id lookup per batch
+                    # instead of rewriting (and re-indexing) unchanged documents
+                    stored = {d["_id"]: d.get("_hash") for d in
+                              coll.find({"_id": {"$in": [d["_id"] for d in docs]}}, {"_hash": 1})}
+                    new = [d for d in docs if d["_id"] not in stored]
+                    changed = [d for d in docs if d["_id"] in stored and (force or stored[d["_id"]] != d["_hash"])]
+                    count("changed", len(changed)); count("unchanged", len(docs) - len(new) - len(changed))
+                    docs = new + changed
+                count("new", len(new))
+                if docs:
+                    if before_write:
+                        before_write(docs)
+                    if insert:
+                        coll.insert_many(docs, ordered=False)
+                    else:
+                        coll.bulk_write([UpdateOne({"_id": d["_id"]}, {"$set": d}, upsert=True) for d in docs],
+                                        ordered=False)
+                    count("batches", 1)
+                count("write_s", time.time() - t); count("written", len(docs))
+                commit(seq)
+        except BaseException as err:
+            fail(err)
+
     t0 = time.time()
-    with sql.cursor() as cur:
-        games = fetchall(cur, r"""
-          SELECT g.game_id,
-                 DATE_FORMAT(g.date,'%%Y-%%m-%%d') AS date,
-                 g.competition_id, c.name AS competition_name,
-                 g.season, g.round,
-                 g.home_club_id, hc.name AS home_name, g.home_club_goals, g.home_club_formation,
-                 g.home_club_position, g.home_club_manager_name,
-                 g.away_club_id, ac.name AS away_name, g.away_club_goals, g.away_club_formation,
-                 g.away_club_position, g.away_club_manager_name,
-                 g.stadium, g.attendance, g.referee,
-                 TIME_FORMAT(COALESCE(g.match_time,'00:00:00'),'%%H:%%i') AS match_time
-          FROM game g
-          JOIN competition c ON c.competition_id=g.competition_id
-          JOIN club hc ON hc.club_id=g.home_club_id
-          JOIN club ac ON ac.club_id=g.away_club_id
-        """)
-    ops, n = [], 0
-    with sql.cursor() as cur:
+    threads = [threading.Thread(target=reader, daemon=True)]
+    threads += [threading.Thread(target=writer, daemon=True) for _ in range(ETL_WRITERS)]
+    for t in threads:
+        t.start()
+    try:
+        seq = 0
+        while True:
+            chunk = get(raw_q, "transform_idle_s")
+            if chunk is _DONE:
+                break
+            docs = [transform(item) for item in chunk]
+            for d in docs:
+                d["_hash"] = content_hash(d)
+            if on_checkpoint is not None:
+                with ckpt_lock:
+                    batch_info[seq] = (key(chunk[-1]), len(chunk))
+            put(doc_q, (seq, docs), "transform_blocked_s")
+            seq += 1
+    except BaseException as err:
+        fail(err)
+    finally:
+        for _ in range(ETL_WRITERS):
+            put(doc_q, _DONE, "transform_blocked_s")
+        for t in threads:
+            t.join()
+    if errors:
+        raise errors[0]
+    elapsed = time.time() - t0
+    for key in ("new", "changed", "unchanged"):
+        STAGE_COUNTS[key] = STAGE_COUNTS.get(key, 0) + stats[key]
+    print(f"  pipeline {coll.name}: {stats['read']} read, {stats['written']} written in "
+          f"{stats['batches']} batches ({stats['new']} new, {stats['changed']} changed, "
+          f"{stats['unchanged']} unchanged skipped), {stats['read'] / max(elapsed, 1e-9):.0f} docs/s; "
+          f"reader blocked {stats['reader_blocked_s']:.1f}s (Mongo behind), "
+          f"writers idle {stats['writers_idle_s']:.1f}s over {ETL_WRITERS} threads (MySQL behind), "
+          f"{'insert_many' if insert else 'bulk_write'} {stats['write_s']:.1f}s")
+    return stats
+
+# --- Full rebuilds into a shadow collection (--rebuild) ---
+# Docs are inserted into <name>__building with no secondary indexes, the
+# indexes are built once over the loaded data, then renameCollection swaps it
+# over the live collection in one step, so readers see the old or the new
+# data, never a half-rebuilt mix. Mongo writes made by the app to the live
+# collection during the rebuild are replaced by the swap.
+SHADOW_SUFFIX = "__building"
+
+# resumed: keep the shadow collection a failed run already half-filled
+def load_target(name, rebuild, resumed=False):
+    mdb = get_mdb()
+    if not rebuild:
+        return mdb[name]
+    if not resumed:
+        mdb.drop_collection(name + SHADOW_SUFFIX)  # leftover from an interrupted rebuild
+    return mdb[name + SHADOW_SUFFIX]
+
+def swap_in(name):
+    t = time.time()
+    ensure_indexes([name], suffix=SHADOW_SUFFIX)
+    t_idx = time.time() - t
+    t = time.time()
+    get_mdb()[name + SHADOW_SUFFIX].rename(name, dropTarget=True)
+    print(f"  {name}: indexes built in {t_idx:.1f}s, swapped in {time.time()-t:.2f}s")
+
+# Keep the last full-load time per collection and mode to compare the two paths
+def record_load_timing(name, rebuild, seconds):
+    mode, other = ("rebuild", "upsert") if rebuild else ("upsert", "rebuild")
+    prev = get_mdb().etl_state.find_one_and_update(
+        {"_id": "load_timings"}, {"$set": {f"{name}.{mode}": round(seconds, 1)}}, upsert=True) or {}
+    last = prev.get(name, {}).get(other)
+    if last:
+        print(f"  {name}: full {mode} {seconds:.1f}s vs last full {other} {last:.1f}s "
+              f"({last / max(seconds, 1e-9):.1f}x)")
+
+# --- Checkpoints and --resume (Mongo etl_runs) ---
+# One doc per run: {status: running|failed|ok, args, stages: {name: {status,
+# mark, last_key, batches, rows}}}. Every stage reads in primary-key order and
+# records the key of its last contiguously written batch, so --resume restarts
+# each unfinished stage with "pk > last_key" (and the watermark mark it started
+# with) instead of from scratch. Stages finished in that run are skipped.
+def start_run(options):
+    run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    get_mdb().etl_runs.insert_one({"_id": run_id, "status": "running", "started_at": int(time.time()),
+                                   "args": options, "stages": {}})
+    return run_id
+
+# Only the latest run can be resumed, and only if it did not finish
+def find_resumable_run():
+    run = get_mdb().etl_runs.find_one({}, sort=[("started_at", -1)])
+    return run if run and run["status"] != "ok" else None
+
+def finish_run(run_id, failed):
+    get_mdb().etl_runs.update_one({"_id": run_id}, {"$set": {
+        "status": "failed" if failed else "ok", "finished_at": int(time.time()), "errors": failed}})
+
+def resume_state(run_id, name):
+    if run_id is None:
+        return {}
+    run = get_mdb().etl_runs.find_one({"_id": run_id}, {f"stages.{name}": 1}) or {}
+    return run.get("stages", {}).get(name, {})
+
+def begin_stage(run_id, name, mark):
+    if run_id is not None:
+        get_mdb().etl_runs.update_one({"_id": run_id}, {"$set": {
+            f"stages.{name}.status": "running", f"stages.{name}.mark": mark}})
+
+def end_stage(run_id, name):
+    if run_id is not None:
+        get_mdb().etl_runs.update_one({"_id": run_id}, {"$set": {f"stages.{name}.status": "done"}})
+
+# on_checkpoint callback for run_pipeline; counts continue from a resumed checkpoint
+def checkpointer(run_id, name, ck):
+    if run_id is None:
+        return None
+    base_batches, base_rows = ck.get("batches", 0), ck.get("rows", 0)
+    def save(last_key, batches, rows):
+        get_mdb().etl_runs.update_one({"_id": run_id}, {"$set": {
+            f"stages.{name}.last_key": list(last_key) if isinstance(last_key, tuple) else last_key,
+            f"stages.{name}.batches": base_batches + batches,
+            f"stages.{name}.rows": base_rows + rows,
+            f"stages.{name}.checkpoint_at": int(time.time())}})
+    return save
+
+def resume_label(ck):
+    if ck.get("last_key") is None:
+        return ""
+    return f" (resuming after {ck['last_key']}, {ck.get('rows', 0)} rows already loaded)"
+
+def where_sql(conds):
+    return " WHERE " + " AND ".join(conds) if conds else ""
+
+# --- ETL: Games ---
+GAMES_SQL = r"""
+  SELECT g.game_id,
+         DATE_FORMAT(g.date,'%%Y-%%m-%%d') AS date,
+         g.competition_id, c.name AS competition_name,
+         g.season, g.round,
+         g.home_club_id, hc.name AS home_name, g.home_club_goals, g.home_club_formation,
+         g.home_club_position, g.home_club_manager_name,
+         g.away_club_id, ac.name AS away_name, g.away_club_goals, g.away_club_formation,
+         g.away_club_position, g.away_club_manager_name,
+         g.stadium, g.attendance, g.referee,
+         TIME_FORMAT(COALESCE(g.match_time,'00:00:00'),'%%H:%%i') AS match_time
+  FROM game g
+  {changed}
+  JOIN competition c ON c.competition_id=g.competition_id
+  JOIN club hc ON hc.club_id=g.home_club_id
+  JOIN club ac ON ac.club_id=g.away_club_id
+  {where}
+  ORDER BY g.game_id
+"""
+
+# Incremental: games whose row or any of whose events changed or were deleted
+# since the watermark, or that show a changed club or event player's name
+# (params: ts, max_id, then ts x4). A NULL max_id makes the id-range test a no-op.
+CHANGED_GAMES_JOIN = """
+  JOIN (SELECT game_id FROM game WHERE updated_at > %s OR game_id > %s
+        UNION
+        SELECT game_id FROM game_events WHERE updated_at > %s
+        UNION
+        SELECT game_id FROM etl_deletes WHERE tbl = 'game_events' AND deleted_at > %s
+        UNION
+        SELECT g3.game_id FROM club c3 JOIN game g3 ON c3.club_id IN (g3.home_club_id, g3.away_club_id)
+        WHERE c3.updated_at > %s
+        UNION
+        SELECT ge3.game_id FROM player p3
+        JOIN game_events ge3 ON p3.player_id IN (ge3.player_id, ge3.player_in_id, ge3.player_assist_id)
+        WHERE p3.updated_at > %s) chg ON chg.game_id = {alias}.game_id
+"""
+
+GAME_EVENTS_SELECT = r"""
+  SELECT ge.game_id,
+         ge.game_event_id,
+         ge.minute,
+         ge.type,
+         ge.club_id,
+         ge.player_id,
+         p1.name AS player_name,
+         ge.player_in_id AS sub_in_id,
+         p2.name AS player_in_name,
+         ge.player_assist_id AS assist_id,
+         p3.name AS assist_name,
+         ge.description AS event_desc
+  FROM game_events ge
+  {changed}
+  LEFT JOIN player p1 ON p1.player_id = ge.player_id
+  LEFT JOIN player p2 ON p2.player_id = ge.player_in_id
+  LEFT JOIN player p3 ON p3.player_id = ge.player_assist_id
+"""
+
+def game_doc(g, evs):
+    return {
+      "_id": g["game_id"],
+      "date": g["date"],
+      "competition_id": g["competition_id"],
+      "competition_name": g.get("competition_name"),
+      "season": g["season"],
+      "round": g["round"],
+      "home": { "club_id": g["home_club_id"], "name": g["home_name"],
+                "goals": g["home_club_goals"],
+                "formation": (g["home_club_formation"] or "").replace("/","-").strip(),
+                "position": g.get("home_club_position"),
+                "manager_name": g.get("home_club_manager_name") },
+      "away": { "club_id": g["away_club_id"], "name": g["away_name"],
+                "goals": g["away_club_goals"],
+                "formation": (g["away_club_formation"] or "").replace("/","-").strip(),
+                "position": g.get("away_club_position"),
+                "manager_name": g.get("away_club_manager_name") },
+      "stadium": g["stadium"], "attendance": g["attendance"], "referee": g["referee"],
+      "match_time": g.get("match_time"),
+      "events": evs,
+      "updated_at": int(time.time())
+    }
+
+# Merge-join two game_id-ordered streams: yields (game, [events]) per game.
+# Events whose game was dropped by the games joins are skipped.
+def merge_game_events(games, events):
+    events = iter(events)
+    ev = next(events, None)
+    for g in games:
+        gid = g["game_id"]
+        while ev is not None and ev["game_id"] < gid:
+            ev = next(events, None)
+        evs = []
+        while ev is not None and ev["game_id"] == gid:
+            ev.pop("game_id")
+            evs.append(ev)
+            ev = next(events, None)
+        yield g, evs
+
+# Legacy path: one events query per game (kept for --games-legacy timing comparison)
+def per_game_events(games):
+    with get_sql().cursor() as cur:
         for g in games:
-            evs = fetchall(cur, r"""
-              SELECT ge.game_event_id,
-                     ge.minute,
-                     ge.type,
-                     ge.club_id,
-                     ge.player_id,
-                     p1.name AS player_name,
-                     ge.player_in_id AS sub_in_id,
-                     p2.name AS player_in_name,
-                     ge.player_assist_id AS assist_id,
-                     p3.name AS assist_name,
-                     ge.description AS event_desc
-              FROM game_events ge
-              LEFT JOIN player p1 ON p1.player_id = ge.player_id
-              LEFT JOIN player p2 ON p2.player_id = ge.player_in_id
-              LEFT JOIN player p3 ON p3.player_id = ge.player_assist_id
+            evs = fetchall(cur, GAME_EVENTS_SELECT.format(changed="") + r"""
               WHERE ge.game_id=%s
               ORDER BY ge.minute, ge.game_event_id
             """, (g["game_id"],))
-            doc = sanitize({
-              "_id": g["game_id"],
-              "date": g["date"],
-              "competition_id": g["competition_id"],
-              "competition_name": g.get("competition_name"),
-              "season": g["season"],
-              "round": g["round"],
-              "home": { "club_id": g["home_club_id"], "name": g["home_name"],
-                        "goals": g["home_club_goals"],
-                        "formation": (g["home_club_formation"] or "").replace("/","-").strip(),
-                        "position": g.get("home_club_position"),
-                        "manager_name": g.get("home_club_manager_name") },
-              "away": { "club_id": g["away_club_id"], "name": g["away_name"],
-                        "goals": g["away_club_goals"],
-                        "formation": (g["away_club_formation"] or "").replace("/","-").strip(),
-                        "position": g.get("away_club_position"),
-                        "manager_name": g.get("away_club_manager_name") },
-              "stadium": g["stadium"], "attendance": g["attendance"], "referee": g["referee"],
-              "match_time": g.get("match_time"),
-              "events": sanitize(evs),
-              "updated_at": int(time.time())
-            })
-            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True))
-            if len(ops) >= batch:
-                mdb.games.bulk_write(ops); n += len(ops); ops = []
-        if ops: mdb.games.bulk_write(ops); n += len(ops)
-    print(f"games upserts: {n} in {time.time()-t0:.1f}s")
+            for ev in evs:
+                ev.pop("game_id")
+            yield g, evs
+
+@stage
+def upsert_games(batch=1000, legacy=False, since=None, rebuild=False, run_id=None, defer_indexes=False, force=False):
+    wm = None if legacy else resolve_since("games", since)
+    ck = {} if legacy else resume_state(run_id, "games")
+    if ck.get("status") == "done":
+        print("games: already completed in this run, skipping")
+        return
+    resumed = ck.get("last_key") is not None
+    rebuild = rebuild and not wm and not legacy
+    print("ETL games..." + (" (legacy per-game events)" if legacy else since_label(wm) + resume_label(ck)))
+    t0 = time.time()
+    mark = ck.get("mark") or watermark_start("SELECT MAX(game_id) FROM game")
+    begin_stage(run_id, "games", mark)
+    deferred = indexes_before_load("games", not wm and not rebuild, defer_indexes)
+    if wm:
+        print(f"  games deleted: {delete_docs('games', deleted_ids(wm, 'game'), batch)}")
+        changed = CHANGED_GAMES_JOIN
+        args = [wm["ts"], wm["max_id"]] + [wm["ts"]] * 4
+    else:
+        changed, args = "", []
+    if legacy:
+        with get_sql().cursor() as cur:
+            games = fetchall(cur, GAMES_SQL.format(changed="", where=""))
+        pairs = per_game_events(games)
+        queries = len(games) + 1
+    else:
+        # Events stream on a second connection so both cursors stay open
+        ev_conn = sql_connect()
+        g_where, ev_where = "", ""
+        if resumed:
+            g_where, ev_where = "WHERE g.game_id > %s", "WHERE ge.game_id > %s"
+            args.append(ck["last_key"])
+        games = stream(get_sql(), GAMES_SQL.format(changed=changed.format(alias="g"), where=g_where), args)
+        events = stream(ev_conn, GAME_EVENTS_SELECT.format(changed=changed.format(alias="ge")) + ev_where + """
+          ORDER BY ge.game_id, ge.minute, ge.game_event_id
+        """, args)
+        pairs = merge_game_events(games, events)
+        queries = 2
+    try:
+        stats = run_pipeline(load_target("games", rebuild, resumed), pairs, lambda pair: game_doc(*pair), batch,
+                             insert=rebuild and not resumed, force=force, key=lambda pair: pair[0]["game_id"],
+                             on_checkpoint=None if legacy else checkpointer(run_id, "games", ck))
+    finally:
+        if not legacy:
+            ev_conn.close()
+    indexes_after_load("games", deferred)
+    if rebuild:
+        swap_in("games")
+    if not wm and not legacy and not resumed:
+        record_load_timing("games", rebuild, time.time() - t0)
+    save_watermark("games", mark)
+    end_stage(run_id, "games")
+    print(f"games upserts: {stats['written']} in {time.time()-t0:.1f}s ({queries} SQL queries)")
 
 # --- ETL: Player seasons ---
-def upsert_player_seasons(batch=1000):
-    print("ETL player_seasons...")
+# One set-based pass: window aggregates give the per-group totals on every
+# row, ROW_NUMBER keeps the 10 latest matches, and rows arrive grouped by
+# (player, competition, season) so they can be folded with groupby.
+PLAYER_SEASONS_SQL = r"""
+  SELECT * FROM (
+    SELECT a.player_id, g.competition_id, g.season,
+           COUNT(*)              OVER w AS apps,
+           SUM(a.minutes_played) OVER w AS minutes,
+           SUM(a.goals)          OVER w AS goals,
+           SUM(a.assists)        OVER w AS assists,
+           SUM(a.yellow_cards)   OVER w AS yc,
+           SUM(a.red_cards)      OVER w AS rc,
+           ROW_NUMBER() OVER (w ORDER BY g.date DESC) AS rn,
+           g.game_id,
+           DATE_FORMAT(g.date,'%%Y-%%m-%%d') AS date,
+           a.minutes_played AS min,
+           a.goals AS g,
+           a.assists AS a,
+           a.player_club_id AS player_club_id,
+           g.home_club_id,
+           hc.name AS home_name,
+           g.away_club_id,
+           ac.name AS away_name,
+           g.home_club_goals,
+           g.away_club_goals
+    FROM appearance a
+    JOIN game g       ON g.game_id = a.game_id
+    {changed}
+    LEFT JOIN club hc ON hc.club_id = g.home_club_id
+    LEFT JOIN club ac ON ac.club_id = g.away_club_id
+    WINDOW w AS (PARTITION BY a.player_id, g.competition_id, g.season)
+  ) x
+  WHERE x.rn <= 10 {resume}
+  ORDER BY {order}, x.rn
+"""
+
+# Group order and the --resume comparison use the same NULL-safe key: a NULL
+# competition/season sorts as '' (ahead of a real '' value), so those groups are
+# neither split nor skipped on resume
+PLAYER_SEASONS_ORDER = ("x.player_id, COALESCE(x.competition_id,''), x.competition_id IS NOT NULL, "
+                        "COALESCE(x.season,''), x.season IS NOT NULL")
+
+def player_season_resume_args(key):
+    pid, comp, season = key
+    return [pid, comp or "", comp is not None, season or "", season is not None]
+
+# Groups an appearance was deleted from or moved out of (moved player or game,
+# or a game moved to another competition/season), from etl_deletes
+LEFT_PLAYER_SEASONS_SQL = """
+  SELECT player_id, competition_id, season FROM etl_deletes
+  WHERE tbl IN ('appearance', 'player_season') AND deleted_at > %s
+"""
+
+# Incremental: the (player, competition, season) groups touched by a changed
+# appearance or game, the groups rows left (above) and the groups showing a
+# renamed club in their latest matches (params: ts x4)
+CHANGED_PLAYER_SEASONS_JOIN = """
+    JOIN (SELECT a2.player_id, g2.competition_id, g2.season
+          FROM appearance a2 JOIN game g2 ON g2.game_id = a2.game_id
+          WHERE a2.updated_at > %s
+          UNION
+          SELECT a2.player_id, g2.competition_id, g2.season
+          FROM game g2 JOIN appearance a2 ON a2.game_id = g2.game_id
+          WHERE g2.updated_at > %s
+          UNION
+          SELECT a2.player_id, g2.competition_id, g2.season
+          FROM club c2 JOIN game g2 ON c2.club_id IN (g2.home_club_id, g2.away_club_id)
+          JOIN appearance a2 ON a2.game_id = g2.game_id
+          WHERE c2.updated_at > %s
+          UNION""" + LEFT_PLAYER_SEASONS_SQL + """) chg
+      ON chg.player_id = a.player_id AND chg.competition_id <=> g.competition_id AND chg.season <=> g.season
+"""
+
+# Which of the left groups still have appearances (params: ts)
+REMAINING_PLAYER_SEASONS_SQL = """
+  SELECT DISTINCT a.player_id, g.competition_id, g.season
+  FROM (""" + LEFT_PLAYER_SEASONS_SQL + """) d
+  JOIN appearance a ON a.player_id = d.player_id
+  JOIN game g ON g.game_id = a.game_id AND g.competition_id <=> d.competition_id AND g.season <=> d.season
+"""
+
+def player_season_id(key):
+    pid, comp, season = key
+    return f"{pid}_{comp}_{season}"
+
+# Sweep for incremental runs, bounded by the delta: of the groups rows left
+# since the watermark, those with no appearances left lose their doc (the rest
+# are recomputed through CHANGED_PLAYER_SEASONS_JOIN). Returns their _ids.
+def sweep_player_seasons(wm):
+    key = lambda r: (r["player_id"], r["competition_id"], r["season"])
+    with get_sql().cursor() as cur:
+        left = {key(r) for r in fetchall(cur, LEFT_PLAYER_SEASONS_SQL, (wm["ts"],))}
+        left -= {key(r) for r in fetchall(cur, REMAINING_PLAYER_SEASONS_SQL, (wm["ts"],))}
+    return sorted(player_season_id(k) for k in left)
+
+LATEST_MATCH_FIELDS = ("game_id", "date", "min", "g", "a", "player_club_id",
+                       "home_club_id", "home_name", "away_club_id", "away_name",
+                       "home_club_goals", "away_club_goals")
+
+def player_season_doc(key, rows):
+    pid, comp, season = key
+    r = rows[0]
+    ga_per90 = ((r["goals"] or 0) + (r["assists"] or 0)) * 90 / max(r["minutes"] or 0, 1)
+    return {
+      "_id": player_season_id(key),
+      "player_id": pid, "competition_id": comp, "season": season,
+      "totals": { "apps": r["apps"], "minutes": r["minutes"], "goals": r["goals"],
+                  "assists": r["assists"], "yc": r["yc"], "rc": r["rc"],
+                  "ga_per90": round(ga_per90, 3) },
+      "latest_matches": [{k: m[k] for k in LATEST_MATCH_FIELDS} for m in rows],
+      "updated_at": int(time.time())
+    }
+
+@stage
+def upsert_player_seasons(batch=1000, since=None, rebuild=False, run_id=None, defer_indexes=False, force=False):
+    wm = resolve_since("player_seasons", since)
+    ck = resume_state(run_id, "player_seasons")
+    if ck.get("status") == "done":
+        print("player_seasons: already completed in this run, skipping")
+        return
+    resumed = ck.get("last_key") is not None
+    rebuild = rebuild and not wm
+    print("ETL player_seasons..." + since_label(wm) + resume_label(ck))
     t0 = time.time()
-    with sql.cursor() as cur:
-        rows = fetchall(cur, """
-          SELECT a.player_id, g.competition_id, g.season,
-                 COUNT(*) apps,
-                 SUM(a.minutes_played) minutes,
-                 SUM(a.goals) goals,
-                 SUM(a.assists) assists,
-                 SUM(a.yellow_cards) yc,
-                 SUM(a.red_cards) rc
-          FROM appearance a
-          JOIN game g ON g.game_id=a.game_id
-          GROUP BY a.player_id, g.competition_id, g.season
-        """)
-    ops, n = [], 0
-    with sql.cursor() as cur:
-        for r in rows:
-            pid, comp, season = r["player_id"], r["competition_id"], r["season"]
-            ga_per90 = ((r["goals"] or 0) + (r["assists"] or 0)) * 90 / max(r["minutes"] or 0, 1)
-            latest = fetchall(cur, r"""
-              SELECT g.game_id,
-                     DATE_FORMAT(g.date,'%%Y-%%m-%%d') AS date,
-                     a.minutes_played AS min,
-                     a.goals AS g,
-                     a.assists AS a,
-                     a.player_club_id AS player_club_id,
-                     g.home_club_id,
-                     hc.name AS home_name,
-                     g.away_club_id,
-                     ac.name AS away_name,
-                     g.home_club_goals,
-                     g.away_club_goals
-              FROM appearance a
-              JOIN game g   ON g.game_id = a.game_id
-              JOIN club hc  ON hc.club_id = g.home_club_id
-              JOIN club ac  ON ac.club_id = g.away_club_id
-              WHERE a.player_id=%s AND g.competition_id=%s AND g.season=%s
-              ORDER BY g.date DESC
-              LIMIT 10
-            """, (pid, comp, season))
-            doc = sanitize({
-              "_id": f"{pid}_{comp}_{season}",
-              "player_id": pid, "competition_id": comp, "season": season,
-              "totals": { "apps": r["apps"], "minutes": r["minutes"], "goals": r["goals"],
-                          "assists": r["assists"], "yc": r["yc"], "rc": r["rc"],
-                          "ga_per90": round(ga_per90, 3) },
-              "latest_matches": sanitize(latest),
-              "updated_at": int(time.time())
-            })
-            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True))
-            if len(ops) >= batch:
-                mdb.player_seasons.bulk_write(ops); n += len(ops); ops = []
-        if ops: mdb.player_seasons.bulk_write(ops); n += len(ops)
-    print(f"player_seasons upserts: {n} in {time.time()-t0:.1f}s")
+    mark = ck.get("mark") or watermark_start()
+    begin_stage(run_id, "player_seasons", mark)
+    deferred = indexes_before_load("player_seasons", not wm and not rebuild, defer_indexes)
+    changed, args = ("", [])
+    if wm:
+        print(f"  player_seasons removed: {delete_docs('player_seasons', sweep_player_seasons(wm), batch)}")
+        changed, args = CHANGED_PLAYER_SEASONS_JOIN, [wm["ts"]] * 4
+    resume = ""
+    if resumed:
+        resume = f"AND ({PLAYER_SEASONS_ORDER}) > (%s, %s, %s, %s, %s)"
+        args += player_season_resume_args(ck["last_key"])
+    rows = stream(get_sql(), PLAYER_SEASONS_SQL.format(changed=changed, resume=resume,
+                                                       order=PLAYER_SEASONS_ORDER), args)
+    groups = ((key, list(group)) for key, group in
+              groupby(rows, key=lambda r: (r["player_id"], r["competition_id"], r["season"])))
+    stats = run_pipeline(load_target("player_seasons", rebuild, resumed), groups, lambda kg: player_season_doc(*kg),
+                         batch, insert=rebuild and not resumed, force=force, key=lambda kg: kg[0],
+                         on_checkpoint=checkpointer(run_id, "player_seasons", ck))
+    indexes_after_load("player_seasons", deferred)
+    if rebuild:
+        swap_in("player_seasons")
+    if not wm and not resumed:
+        record_load_timing("player_seasons", rebuild, time.time() - t0)
+    save_watermark("player_seasons", mark)
+    end_stage(run_id, "player_seasons")
+    print(f"player_seasons upserts: {stats['written']} in {time.time()-t0:.1f}s (1 SQL query)")
 
 # --- ETL: Transfers ---
-def upsert_transfers(batch=2000):
-    print("ETL transfers...")
+TRANSFERS_SQL = r"""
+  SELECT
+    t.transfer_id,
+    t.player_id,
+    DATE_FORMAT(t.transfer_date,'%%Y-%%m-%%d') AS transfer_date,
+    t.transfer_season,
+    t.from_club_id, COALESCE(fc.name,'') AS from_name,
+    t.to_club_id,   COALESCE(tc.name,'') AS to_name,
+    t.transfer_fee,
+    t.market_value_in_eur,
+    p.name AS player_name
+  FROM transfer t
+  LEFT JOIN club fc ON fc.club_id=t.from_club_id
+  LEFT JOIN club tc ON tc.club_id=t.to_club_id
+  JOIN player p ON p.player_id = t.player_id
+"""
+
+def transfer_doc(r):
+    return {
+      "_id": r["transfer_id"],
+      "player_id": r["player_id"],
+      "player_name": r.get("player_name"),
+      "transfer_date": r["transfer_date"],
+      "transfer_season": r["transfer_season"],
+      "from": { "club_id": r["from_club_id"], "name": r["from_name"] },
+      "to":   { "club_id": r["to_club_id"],   "name": r["to_name"] },
+      "transfer_fee": r["transfer_fee"],
+      "market_value_in_eur": r["market_value_in_eur"],
+      # Duplicated flattened fields for fast Mongo list projection (avoid deep lookups)
+      "from_club_name": r["from_name"],
+      "to_club_name": r["to_name"],
+      "updated_at": int(time.time())
+    }
+
+@stage
+def upsert_transfers(batch=2000, since=None, rebuild=False, run_id=None, defer_indexes=False, force=False):
+    wm = resolve_since("transfers", since)
+    ck = resume_state(run_id, "transfers")
+    if ck.get("status") == "done":
+        print("transfers: already completed in this run, skipping")
+        return
+    resumed = ck.get("last_key") is not None
+    rebuild = rebuild and not wm
+    print("ETL transfers..." + since_label(wm) + resume_label(ck))
     t0 = time.time()
-    with sql.cursor() as cur:
-        rows = fetchall(cur, r"""
-          SELECT
-            t.transfer_id,
-            t.player_id,
-            DATE_FORMAT(t.transfer_date,'%%Y-%%m-%%d') AS transfer_date,
-            t.transfer_season,
-            t.from_club_id, COALESCE(fc.name,'') AS from_name,
-            t.to_club_id,   COALESCE(tc.name,'') AS to_name,
-            t.transfer_fee,
-            t.market_value_in_eur,
-            p.name AS player_name
-          FROM transfer t
-          LEFT JOIN club fc ON fc.club_id=t.from_club_id
-          LEFT JOIN club tc ON tc.club_id=t.to_club_id
-          JOIN player p ON p.player_id = t.player_id
-        """)
-    ops, n = [], 0
-    for r in rows:
-        doc = sanitize({
-          "_id": r["transfer_id"],
-          "player_id": r["player_id"],
-          "player_name": r.get("player_name"),
-          "transfer_date": r["transfer_date"],
-          "transfer_season": r["transfer_season"],
-          "from": { "club_id": r["from_club_id"], "name": r["from_name"] },
-          "to":   { "club_id": r["to_club_id"],   "name": r["to_name"] },
-          "transfer_fee": r["transfer_fee"],
-          "market_value_in_eur": r["market_value_in_eur"],
-          # Duplicated flattened fields for fast Mongo list projection (avoid deep lookups)
-          "from_club_name": r["from_name"],
-          "to_club_name": r["to_name"],
-          "updated_at": int(time.time())
-        })
-        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True))
-        if len(ops) >= batch:
-            mdb.transfers.bulk_write(ops); n += len(ops); ops = []
-    if ops: mdb.transfers.bulk_write(ops); n += len(ops)
-    print(f"transfers upserts: {n} in {time.time()-t0:.1f}s")
+    mark = ck.get("mark") or watermark_start("SELECT MAX(transfer_id) FROM transfer")
+    begin_stage(run_id, "transfers", mark)
+    deferred = indexes_before_load("transfers", not wm and not rebuild, defer_indexes)
+    conds, args = [], []
+    if wm:
+        print(f"  transfers deleted: {delete_docs('transfers', deleted_ids(wm, 'transfer'), batch)}")
+        # a renamed player or club changes the denormalized names
+        conds.append("(t.updated_at > %s OR t.transfer_id > %s OR p.updated_at > %s "
+                     "OR fc.updated_at > %s OR tc.updated_at > %s)")
+        args += [wm["ts"], wm["max_id"], wm["ts"], wm["ts"], wm["ts"]]
+    if resumed:
+        conds.append("t.transfer_id > %s"); args.append(ck["last_key"])
+    rows = stream(get_sql(), TRANSFERS_SQL + where_sql(conds) + " ORDER BY t.transfer_id", args)
+    stats = run_pipeline(load_target("transfers", rebuild, resumed), rows, transfer_doc, batch,
+                         insert=rebuild and not resumed, force=force, key=lambda r: r["transfer_id"],
+                         on_checkpoint=checkpointer(run_id, "transfers", ck))
+    indexes_after_load("transfers", deferred)
+    if rebuild:
+        swap_in("transfers")
+    if not wm and not resumed:
+        record_load_timing("transfers", rebuild, time.time() - t0)
+    save_watermark("transfers", mark)
+    end_stage(run_id, "transfers")
+    print(f"transfers upserts: {stats['written']} in {time.time()-t0:.1f}s")
+
+# --- ETL: Club transfer ROI (Mongo twin of club_transfer_roi in football_db_summary_tables.sql) ---
+# One doc per transfer with the player's appearance totals on or after the
+# transfer date, so mongo club/roi is one indexed find. app.py keeps the docs
+# current on transfer/appearance writes; incremental runs also redo transfers
+# whose player has changed, deleted or moved appearances.
+TRANSFER_ROI_SQL = r"""
+  SELECT
+    t.transfer_id,
+    t.player_id,
+    p.name AS player_name,
+    DATE_FORMAT(t.transfer_date,'%%Y-%%m-%%d') AS transfer_date,
+    t.transfer_season,
+    t.to_club_id, COALESCE(tc.name,'') AS to_name,
+    t.transfer_fee,
+    t.market_value_in_eur,
+    COUNT(a.appearance_id) AS post_apps,
+    COALESCE(SUM(a.minutes_played),0) AS post_minutes,
+    COALESCE(SUM(a.goals),0) AS post_goals,
+    COALESCE(SUM(a.assists),0) AS post_assists
+  FROM transfer t
+  LEFT JOIN club tc ON tc.club_id = t.to_club_id
+  JOIN player p ON p.player_id = t.player_id
+  LEFT JOIN appearance a ON a.player_id = t.player_id AND a.date >= t.transfer_date
+  {where}
+  GROUP BY t.transfer_id
+  ORDER BY t.transfer_id
+"""
+
+# Ratios as the SQL table's generated columns: NULL for a 0/NULL fee or denominator
+def transfer_roi_doc(r):
+    fee = r["transfer_fee"]
+    contrib = r["post_goals"] + r["post_assists"]
+    return {
+      "_id": r["transfer_id"],
+      "player_id": r["player_id"],
+      "player_name": r.get("player_name"),
+      "transfer_date": r["transfer_date"],
+      "transfer_season": r["transfer_season"],
+      "to": { "club_id": r["to_club_id"], "name": r["to_name"] },
+      "transfer_fee": fee,
+      "market_value_in_eur": r["market_value_in_eur"],
+      "post_apps": r["post_apps"],
+      "post_minutes": r["post_minutes"],
+      "post_goals": r["post_goals"],
+      "post_assists": r["post_assists"],
+      "eur_per_minutes": round(fee / r["post_minutes"], 2) if fee and r["post_minutes"] else None,
+      "eur_per_contrib": round(fee / contrib, 2) if fee and contrib else None,
+      "updated_at": int(time.time())
+    }
+
+@stage
+def upsert_transfer_roi(batch=2000, since=None, rebuild=False, run_id=None, defer_indexes=False, force=False):
+    wm = resolve_since("club_transfer_roi", since)
+    ck = resume_state(run_id, "club_transfer_roi")
+    if ck.get("status") == "done":
+        print("club_transfer_roi: already completed in this run, skipping")
+        return
+    resumed = ck.get("last_key") is not None
+    rebuild = rebuild and not wm
+    print("ETL club_transfer_roi..." + since_label(wm) + resume_label(ck))
+    t0 = time.time()
+    mark = ck.get("mark") or watermark_start("SELECT MAX(transfer_id) FROM transfer")
+    begin_stage(run_id, "club_transfer_roi", mark)
+    deferred = indexes_before_load("club_transfer_roi", not wm and not rebuild, defer_indexes)
+    conds, args = [], []
+    if wm:
+        print(f"  club_transfer_roi deleted: {delete_docs('club_transfer_roi', deleted_ids(wm, 'transfer'), batch)}")
+        conds.append("(t.updated_at > %s OR t.transfer_id > %s OR p.updated_at > %s OR tc.updated_at > %s "
+                     "OR t.player_id IN (SELECT ca.player_id FROM appearance ca WHERE ca.updated_at > %s) "
+                     "OR t.player_id IN (SELECT d.player_id FROM etl_deletes d "
+                     "WHERE d.tbl IN ('appearance', 'player_season') AND d.deleted_at > %s))")
+        args += [wm["ts"], wm["max_id"], wm["ts"], wm["ts"], wm["ts"], wm["ts"]]
+    if resumed:
+        conds.append("t.transfer_id > %s"); args.append(ck["last_key"])
+    rows = stream(get_sql(), TRANSFER_ROI_SQL.format(where=where_sql(conds)), args)
+    stats = run_pipeline(load_target("club_transfer_roi", rebuild, resumed), rows, transfer_roi_doc, batch,
+                         insert=rebuild and not resumed, force=force, key=lambda r: r["transfer_id"],
+                         on_checkpoint=checkpointer(run_id, "club_transfer_roi", ck))
+    indexes_after_load("club_transfer_roi", deferred)
+    if rebuild:
+        swap_in("club_transfer_roi")
+    if not wm and not resumed:
+        record_load_timing("club_transfer_roi", rebuild, time.time() - t0)
+    save_watermark("club_transfer_roi", mark)
+    end_stage(run_id, "club_transfer_roi")
+    print(f"club_transfer_roi upserts: {stats['written']} in {time.time()-t0:.1f}s")
 
 # --- ETL: Players (for Mongo player profile & market compare) ---
-def upsert_players(batch=2000):
-    print("ETL players...")
+# Before overwriting player docs, remember the clubs players are leaving so the
+# next incremental clubs run also refreshes the old club's totals.
+def note_club_moves(docs):
+    prev = {d["_id"]: d.get("current_club_id") for d in
+            get_mdb().players.find({"_id": {"$in": [d["_id"] for d in docs]}}, {"current_club_id": 1})}
+    left = {prev[d["_id"]] for d in docs
+            if prev.get(d["_id"]) is not None and prev[d["_id"]] != d.get("current_club_id")}
+    if left:
+        get_mdb().etl_state.update_one({"_id": "clubs"},
+                                 {"$addToSet": {"pending_club_ids": {"$each": sorted(left)}}}, upsert=True)
+
+PLAYERS_SQL = r"""
+  SELECT p.player_id, p.name, p.position, p.sub_position,
+         p.current_club_id, c.name AS current_club_name,
+         p.market_value_eur, p.highest_market_value_eur,
+         pb.image_url, pb.height_in_cm, pb.dob, pb.country_of_citizenship,
+         pb.foot, pb.city_of_birth, pb.agent_name, pb.contract_expiration_date
+  FROM player p
+  LEFT JOIN club c ON c.club_id = p.current_club_id
+  LEFT JOIN player_bio pb ON pb.player_id = p.player_id
+"""
+
+def player_doc(r):
+    return {
+      "_id": r["player_id"],
+      "player_id": r["player_id"],
+      "name": r["name"],
+      "position": r["position"],
+      "sub_position": r.get("sub_position"),
+      "current_club_id": r.get("current_club_id"),
+      "current_club_name": r.get("current_club_name"),
+      "market_value_eur": r.get("market_value_eur"),
+      "highest_market_value_eur": r.get("highest_market_value_eur"),
+      "image_url": r.get("image_url"),
+      "height_in_cm": r.get("height_in_cm"),
+      "dob": r.get("dob"),
+      "country_of_citizenship": r.get("country_of_citizenship"),
+      "foot": r.get("foot"),
+      "city_of_birth": r.get("city_of_birth"),
+      "agent_name": r.get("agent_name"),
+      "contract_expiration_date": r.get("contract_expiration_date"),
+      "updated_at": int(time.time())
+    }
+
+@stage
+def upsert_players(batch=2000, since=None, rebuild=False, run_id=None, defer_indexes=False, force=False):
+    wm = resolve_since("players", since)
+    ck = resume_state(run_id, "players")
+    if ck.get("status") == "done":
+        print("players: already completed in this run, skipping")
+        return
+    resumed = ck.get("last_key") is not None
+    rebuild = rebuild and not wm
+    print("ETL players..." + since_label(wm) + resume_label(ck))
     t0 = time.time()
-    with sql.cursor() as cur:
-        rows = fetchall(cur, r"""
-          SELECT p.player_id, p.name, p.position, p.sub_position,
-                 p.current_club_id, c.name AS current_club_name,
-                 p.market_value_eur, p.highest_market_value_eur,
-                 pb.image_url, pb.height_in_cm, pb.dob, pb.country_of_citizenship,
-                 pb.foot, pb.city_of_birth, pb.agent_name, pb.contract_expiration_date
-          FROM player p
-          LEFT JOIN club c ON c.club_id = p.current_club_id
-          LEFT JOIN player_bio pb ON pb.player_id = p.player_id
-        """)
-    ops, n = [], 0
-    for r in rows:
-        doc = sanitize({
-          "_id": r["player_id"],
-          "player_id": r["player_id"],
-          "name": r["name"],
-          "position": r["position"],
-          "sub_position": r.get("sub_position"),
-          "current_club_id": r.get("current_club_id"),
-          "current_club_name": r.get("current_club_name"),
-          "market_value_eur": r.get("market_value_eur"),
-          "highest_market_value_eur": r.get("highest_market_value_eur"),
-          "image_url": r.get("image_url"),
-          "height_in_cm": r.get("height_in_cm"),
-          "dob": fmt_date(r.get("dob")),
-          "country_of_citizenship": r.get("country_of_citizenship"),
-          "foot": r.get("foot"),
-          "city_of_birth": r.get("city_of_birth"),
-          "agent_name": r.get("agent_name"),
-          "contract_expiration_date": fmt_date(r.get("contract_expiration_date")),
-          "updated_at": int(time.time())
-        })
-        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True))
-        if len(ops) >= batch:
-            mdb.players.bulk_write(ops); n += len(ops); ops = []
-    if ops:
-        mdb.players.bulk_write(ops); n += len(ops)
-    print(f"players upserts: {n} in {time.time()-t0:.1f}s")
+    mark = ck.get("mark") or watermark_start("SELECT MAX(player_id) FROM player")
+    begin_stage(run_id, "players", mark)
+    deferred = indexes_before_load("players", not wm and not rebuild, defer_indexes)
+    conds, args = [], []
+    if wm:
+        print(f"  players deleted: {delete_docs('players', deleted_ids(wm, 'player'), batch)}")
+        conds.append("(p.updated_at > %s OR pb.updated_at > %s OR c.updated_at > %s OR p.player_id > %s)")
+        args += [wm["ts"], wm["ts"], wm["ts"], wm["max_id"]]
+    if resumed:
+        conds.append("p.player_id > %s"); args.append(ck["last_key"])
+    rows = stream(get_sql(), PLAYERS_SQL + where_sql(conds) + " ORDER BY p.player_id", args)
+    stats = run_pipeline(load_target("players", rebuild, resumed), rows, player_doc, batch,
+                         before_write=note_club_moves, insert=rebuild and not resumed, force=force,
+                         key=lambda r: r["player_id"], on_checkpoint=checkpointer(run_id, "players", ck))
+    indexes_after_load("players", deferred)
+    if rebuild:
+        swap_in("players")
+    if not wm and not resumed:
+        record_load_timing("players", rebuild, time.time() - t0)
+    save_watermark("players", mark)
+    end_stage(run_id, "players")
+    print(f"players upserts: {stats['written']} in {time.time()-t0:.1f}s")
 
 # --- ETL: Clubs (for Mongo club profile & listings) ---
-def upsert_clubs(batch=2000):
-    print("ETL clubs...")
-    t0 = time.time()
-    with sql.cursor() as cur:
-        rows = fetchall(cur, r"""
-          SELECT c.club_id, c.name, c.domestic_competition_id, c.squad_size, c.average_age,
-                 c.stadium_name, c.stadium_seats,
-                 COALESCE(SUM(p.market_value_eur),0) AS total_market_value_eur,
-                 COUNT(p.player_id) AS player_count
-          FROM club c
-          LEFT JOIN player p ON p.current_club_id = c.club_id AND p.market_value_eur IS NOT NULL
-          GROUP BY c.club_id, c.name, c.domestic_competition_id, c.squad_size, c.average_age, c.stadium_name, c.stadium_seats
-        """)
-    ops, n = [], 0
-    for r in rows:
-        doc = sanitize({
-          "_id": r["club_id"],
-          "club_id": r["club_id"],
-          "name": r.get("name"),
-          "domestic_competition_id": r.get("domestic_competition_id"),
-          "squad_size": r.get("squad_size"),
-          "average_age": r.get("average_age"),
-          "stadium_name": r.get("stadium_name"),
-          "stadium_seats": r.get("stadium_seats"),
-          "total_market_value_eur": r.get("total_market_value_eur"),
-          "player_count": r.get("player_count"),
-          "updated_at": int(time.time())
-        })
-        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True))
-        if len(ops) >= batch:
-            mdb.clubs.bulk_write(ops); n += len(ops); ops = []
+# Clubs whose totals may have moved since the watermark: changed club rows, the
+# current club of every changed or deleted player, the club those players are
+# leaving (still on their Mongo doc if the players stage has not run yet) and
+# clubs queued by note_club_moves (if it has).
+def affected_club_ids(wm, pending):
+    with get_sql().cursor() as cur:
+        clubs = fetchall(cur, "SELECT club_id FROM club WHERE updated_at > %s OR club_id > %s",
+                         (wm["ts"], wm["max_id"]))
+        moved = fetchall(cur, "SELECT player_id, current_club_id FROM player WHERE updated_at > %s",
+                         (wm["ts"],))
+    clubs += deleted_since(wm, "player", "club_id")
+    ids = {r["club_id"] for r in clubs if r["club_id"] is not None} | set(pending)
+    ids |= {r["current_club_id"] for r in moved if r["current_club_id"] is not None}
+    pids = [r["player_id"] for r in moved]
+    for i in range(0, len(pids), 5000):
+        for d in get_mdb().players.find({"_id": {"$in": pids[i:i + 5000]}}, {"current_club_id": 1}):
+            if d.get("current_club_id") is not None:
+                ids.add(d["current_club_id"])
+    return sorted(ids)
+
+CLUBS_SQL = r"""
+  SELECT c.club_id, c.name, c.domestic_competition_id, c.squad_size, c.average_age,
+         c.stadium_name, c.stadium_seats,
+         COALESCE(SUM(p.market_value_eur),0) AS total_market_value_eur,
+         COUNT(p.player_id) AS player_count
+  FROM club c
+  LEFT JOIN player p ON p.current_club_id = c.club_id AND p.market_value_eur IS NOT NULL
+  {where}
+  GROUP BY c.club_id, c.name, c.domestic_competition_id, c.squad_size, c.average_age, c.stadium_name, c.stadium_seats
+  ORDER BY c.club_id
+"""
+
+def club_doc(r):
+    return {
+      "_id": r["club_id"],
+      "club_id": r["club_id"],
+      "name": r.get("name"),
+      "domestic_competition_id": r.get("domestic_competition_id"),
+      "squad_size": r.get("squad_size"),
+      "average_age": r.get("average_age"),
+      "stadium_name": r.get("stadium_name"),
+      "stadium_seats": r.get("stadium_seats"),
+      "total_market_value_eur": r.get("total_market_value_eur"),
+      "player_count": r.get("player_count"),
+      "updated_at": int(time.time())
+    }
+
+# Dense rank by total_market_value_eur (as DENSE_RANK() in the SQL
+# club_market_totals table), stored on every club doc so the profile and
+# ranking endpoints read it instead of counting clubs. Only changed ranks are written.
+def rank_clubs_by_market_value(coll):
+    ops, rank, prev = [], 0, None
+    for d in coll.find({}, {"total_market_value_eur": 1, "market_value_rank": 1}).sort("total_market_value_eur", -1):
+        mv = d.get("total_market_value_eur") or 0
+        if mv != prev:
+            rank, prev = rank + 1, mv
+        if d.get("market_value_rank") != rank:
+            ops.append(UpdateOne({"_id": d["_id"]}, {"$set": {"market_value_rank": rank}}))
     if ops:
-        mdb.clubs.bulk_write(ops); n += len(ops)
-    print(f"clubs upserts: {n} in {time.time()-t0:.1f}s")
+        coll.bulk_write(ops, ordered=False)
+    return len(ops)
+
+@stage
+def upsert_clubs(batch=2000, since=None, rebuild=False, run_id=None, defer_indexes=False, force=False):
+    wm = resolve_since("clubs", since)
+    ck = resume_state(run_id, "clubs")
+    if ck.get("status") == "done":
+        print("clubs: already completed in this run, skipping")
+        return
+    resumed = ck.get("last_key") is not None
+    rebuild = rebuild and not wm
+    print("ETL clubs..." + since_label(wm) + resume_label(ck))
+    t0 = time.time()
+    mark = ck.get("mark") or watermark_start("SELECT MAX(club_id) FROM club")
+    begin_stage(run_id, "clubs", mark)
+    deferred = indexes_before_load("clubs", not wm and not rebuild, defer_indexes)
+    state = get_mdb().etl_state.find_one({"_id": "clubs"}) or {}
+    pending = state.get("pending_club_ids", [])
+    conds, args = [], []
+    if wm:
+        print(f"  clubs deleted: {delete_docs('clubs', deleted_ids(wm, 'club'), batch)}")
+        club_ids = affected_club_ids(wm, pending)
+        if not club_ids:
+            get_mdb().etl_state.update_one({"_id": "clubs"}, {"$pullAll": {"pending_club_ids": pending}})
+            save_watermark("clubs", mark)
+            end_stage(run_id, "clubs")
+            print(f"clubs upserts: 0 in {time.time()-t0:.1f}s (no affected clubs)")
+            return
+        conds.append("c.club_id IN (" + ",".join(["%s"] * len(club_ids)) + ")"); args += club_ids
+    if resumed:
+        conds.append("c.club_id > %s"); args.append(ck["last_key"])
+    rows = stream(get_sql(), CLUBS_SQL.format(where=where_sql(conds)), args)
+    target = load_target("clubs", rebuild, resumed)
+    stats = run_pipeline(target, rows, club_doc, batch,
+                         insert=rebuild and not resumed, force=force, key=lambda r: r["club_id"],
+                         on_checkpoint=checkpointer(run_id, "clubs", ck))
+    # Any changed total can move other clubs' ranks, so rank the whole collection
+    print(f"  market value ranks updated: {rank_clubs_by_market_value(target)}")
+    indexes_after_load("clubs", deferred)
+    if rebuild:
+        swap_in("clubs")
+    if not wm and not resumed:
+        record_load_timing("clubs", rebuild, time.time() - t0)
+    # Full and incremental runs both cover every pending club
+    get_mdb().etl_state.update_one({"_id": "clubs"}, {"$pullAll": {"pending_club_ids": pending}})
+    save_watermark("clubs", mark)
+    end_stage(run_id, "clubs")
+    print(f"clubs upserts: {stats['written']} in {time.time()-t0:.1f}s")
 
 # --- ETL: Appearances (denormalized list for Mongo list endpoint) ---
-def upsert_appearances(batch=5000):
-    print("ETL appearances...")
+APPEARANCES_SQL = r"""
+  SELECT a.appearance_id, a.game_id, a.player_id, a.player_club_id,
+         a.player_current_club_id, DATE_FORMAT(a.date,'%%Y-%%m-%%d') AS date,
+         a.yellow_cards, a.red_cards, a.goals, a.assists, a.minutes_played,
+         p.name AS player_name, c.name AS club_name
+  FROM appearance a
+  LEFT JOIN player p ON p.player_id = a.player_id
+  LEFT JOIN club c ON c.club_id = a.player_club_id
+"""
+
+def appearance_doc(r):
+    return {
+      "_id": r["appearance_id"],
+      "appearance_id": r["appearance_id"],
+      "game_id": r["game_id"],
+      "player_id": r["player_id"],
+      "player_club_id": r.get("player_club_id"),
+      "player_current_club_id": r.get("player_current_club_id"),
+      "date": r.get("date"),
+      "yellow_cards": r.get("yellow_cards"),
+      "red_cards": r.get("red_cards"),
+      "goals": r.get("goals"),
+      "assists": r.get("assists"),
+      "minutes_played": r.get("minutes_played"),
+      "player_name": r.get("player_name"),
+      "club_name": r.get("club_name"),
+      "updated_at": int(time.time())
+    }
+
+# Legacy appearance collections/field names and the canonical names appearance_doc
+# writes; app.py resolves its appearances list from these and
+# migrate_appearances.py moves the legacy ones over.
+APPEARANCE_COLLECTIONS = ("appearances", "appearance", "player_appearances")
+APPEARANCE_FIELDS = {  # canonical name -> stored names, in precedence order
+    "appearance_id": ("appearance_id", "_id"),
+    "game_id": ("game_id", "gameId", "match_id"),
+    "player_id": ("player_id", "playerId"),
+    "player_club_id": ("player_club_id", "club_id", "clubId"),
+    "player_current_club_id": ("player_current_club_id",),
+    "date": ("date", "date_str", "match_date", "game_date"),
+    "yellow_cards": ("yellow_cards", "yellow", "yc", "stats.yellow_cards"),
+    "red_cards": ("red_cards", "red", "rc", "stats.red_cards"),
+    "goals": ("goals", "goal", "goals_scored", "stats.goals"),
+    "assists": ("assists", "assist", "stats.assists"),
+    "minutes_played": ("minutes_played", "minutes", "mins", "time_played", "stats.minutes_played"),
+    "player_name": ("player_name", "name", "playerName"),
+    "club_name": ("club_name", "club", "team_name", "clubName"),
+}
+APPEARANCE_SORT_FIELDS = ("date", "match_date", "date_str", "game_date", "transfer_date")
+
+@stage
+def upsert_appearances(batch=5000, since=None, rebuild=False, run_id=None, defer_indexes=False, force=False):
+    wm = resolve_since("appearances", since)
+    ck = resume_state(run_id, "appearances")
+    if ck.get("status") == "done":
+        print("appearances: already completed in this run, skipping")
+        return
+    resumed = ck.get("last_key") is not None
+    rebuild = rebuild and not wm
+    print("ETL appearances..." + since_label(wm) + resume_label(ck))
+    t0 = time.time()
+    mark = ck.get("mark") or watermark_start()
+    begin_stage(run_id, "appearances", mark)
+    deferred = indexes_before_load("appearances", not wm and not rebuild, defer_indexes)
+    conds, args = [], []
+    if wm:
+        print(f"  appearances deleted: {delete_docs('appearances', deleted_ids(wm, 'appearance', str), batch)}")
+        # a renamed player or club changes the denormalized names
+        conds.append("(a.updated_at > %s OR a.player_id IN (SELECT player_id FROM player WHERE updated_at > %s) "
+                     "OR a.player_club_id IN (SELECT club_id FROM club WHERE updated_at > %s))")
+        args += [wm["ts"], wm["ts"], wm["ts"]]
+    if resumed:
+        conds.append("a.appearance_id > %s"); args.append(ck["last_key"])
+    # Primary-key order: a plain clustered-index scan, and the resume key for --resume
+    rows = stream(get_sql(), APPEARANCES_SQL + where_sql(conds) + " ORDER BY a.appearance_id", args)
+    stats = run_pipeline(load_target("appearances", rebuild, resumed), rows, appearance_doc, batch,
+                         insert=rebuild and not resumed, force=force, key=lambda r: r["appearance_id"],
+                         on_checkpoint=checkpointer(run_id, "appearances", ck))
+    indexes_after_load("appearances", deferred)
+    if rebuild:
+        swap_in("appearances")
+    if not wm and not resumed:
+        record_load_timing("appearances", rebuild, time.time() - t0)
+    save_watermark("appearances", mark)
+    end_stage(run_id, "appearances")
+    print(f"appearances upserts: {stats['written']} in {time.time()-t0:.1f}s")
+
+# --- ETL: Game events (flat copy of the embedded games.events, for the events list) ---
+# One doc per event with the club/player names resolved, so the Mongo events
+# list and single-event lookup are index reads instead of unpacking every
+# game's events array. Field names follow the SQL /api/game-events/list rows.
+GAME_EVENTS_FLAT_SQL = r"""
+  SELECT ge.game_event_id, ge.game_id, ge.minute, ge.type,
+         ge.club_id, c.name AS club_name,
+         ge.player_id, p1.name AS player_name,
+         ge.player_in_id, p2.name AS player_in_name,
+         ge.player_assist_id, p3.name AS assist_name,
+         ge.description
+  FROM game_events ge
+  LEFT JOIN club c ON c.club_id = ge.club_id
+  LEFT JOIN player p1 ON p1.player_id = ge.player_id
+  LEFT JOIN player p2 ON p2.player_id = ge.player_in_id
+  LEFT JOIN player p3 ON p3.player_id = ge.player_assist_id
+"""
+
+def game_event_doc(r):
+    return {
+      "_id": r["game_event_id"],
+      "game_event_id": r["game_event_id"],
+      "game_id": r["game_id"],
+      "minute": r.get("minute"),
+      "type": r.get("type"),
+      "club_id": r.get("club_id"),
+      "club_name": r.get("club_name"),
+      "player_id": r.get("player_id"),
+      "player_name": r.get("player_name"),
+      "player_in_id": r.get("player_in_id"),
+      "player_in_name": r.get("player_in_name"),
+      "player_assist_id": r.get("player_assist_id"),
+      "assist_name": r.get("assist_name"),
+      "description": r.get("description"),
+      "updated_at": int(time.time())
+    }
+
+@stage
+def upsert_game_events(batch=5000, since=None, rebuild=False, run_id=None, defer_indexes=False, force=False):
+    wm = resolve_since("game_events", since)
+    ck = resume_state(run_id, "game_events")
+    if ck.get("status") == "done":
+        print("game_events: already completed in this run, skipping")
+        return
+    resumed = ck.get("last_key") is not None
+    rebuild = rebuild and not wm
+    print("ETL game_events..." + since_label(wm) + resume_label(ck))
     t0 = time.time()
-    with sql.cursor() as cur:
-        rows = fetchall(cur, r"""
-          SELECT a.appearance_id, a.game_id, a.player_id, a.player_club_id,
-                 a.player_current_club_id, DATE_FORMAT(a.date,'%%Y-%%m-%%d') AS date,
-                 a.yellow_cards, a.red_cards, a.goals, a.assists, a.minutes_played,
-                 p.name AS player_name, c.name AS club_name
-          FROM appearance a
-          LEFT JOIN player p ON p.player_id = a.player_id
-          LEFT JOIN club c ON c.club_id = a.player_club_id
-        """)
-    ops, n = [], 0
+    mark = ck.get("mark") or watermark_start()
+    begin_stage(run_id, "game_events", mark)
+    deferred = indexes_before_load("game_events", not wm and not rebuild, defer_indexes)
+    conds, args = [], []
+    if wm:
+        # events removed by a game delete's ON DELETE CASCADE only show up as the game's entry
+        n = delete_docs("game_events", deleted_ids(wm, "game_events", str), batch)
+        n += delete_docs("game_events", deleted_ids(wm, "game"), batch, field="game_id")
+        print(f"  game_events deleted: {n}")
+        conds.append("(ge.updated_at > %s OR c.updated_at > %s OR p1.updated_at > %s "
+                     "OR p2.updated_at > %s OR p3.updated_at > %s)")
+        args += [wm["ts"]] * 5
+    if resumed:
+        conds.append("ge.game_event_id > %s"); args.append(ck["last_key"])
+    rows = stream(get_sql(), GAME_EVENTS_FLAT_SQL + where_sql(conds) + " ORDER BY ge.game_event_id", args)
+    stats = run_pipeline(load_target("game_events", rebuild, resumed), rows, game_event_doc, batch,
+                         insert=rebuild and not resumed, force=force, key=lambda r: r["game_event_id"],
+                         on_checkpoint=checkpointer(run_id, "game_events", ck))
+    indexes_after_load("game_events", deferred)
+    if rebuild:
+        swap_in("game_events")
+    if not wm and not resumed:
+        record_load_timing("game_events", rebuild, time.time() - t0)
+    save_watermark("game_events", mark)
+    end_stage(run_id, "game_events")
+    print(f"game_events upserts: {stats['written']} in {time.time()-t0:.1f}s")
+
+
+# --bench-convert: time doc building for n appearance rows through the old
+# recursive sanitize() path vs the typed converters (MySQL read excluded)
+def bench_convert(n):
+    with get_sql().cursor(pymysql.cursors.SSDictCursor) as cur:
+        cur.execute(APPEARANCES_SQL + " LIMIT %s", (n,))
+        convs = row_converters(cur.description)
+        raw = cur.fetchall()
+    copies = [dict(r) for r in raw]
+    print(f"bench-convert: {len(raw)} appearance rows, typed converters on {len(convs)} columns")
+
+    t = time.time()
+    old = [sanitize(appearance_doc(r)) for r in raw]
+    t_old = time.time() - t
+
+    t = time.time()
+    new = [appearance_doc(r) for r in convert_rows(copies, convs)]
+    t_new = time.time() - t
+
+    same = all(content_hash(a) == content_hash(b) for a, b in zip(old, new))
+    rate = lambda secs: f"{len(raw) / max(secs, 1e-9):,.0f} rows/s"
+    print(f"  sanitize path: {t_old:.2f}s ({rate(t_old)})")
+    print(f"  typed path:    {t_new:.2f}s ({rate(t_new)}), {t_old / max(t_new, 1e-9):.1f}x faster, "
+          f"docs {'identical' if same else 'DIFFER'}")
+
+# --index-report: which indexes the app's queries actually hit, what they cost.
+# Mongo: $indexStats accesses (since server start / index creation), index
+# sizes and collection write ops from $collStats. Every write maintains every
+# index of its collection, so writes x indexes approximates the upkeep.
+# MySQL: per-index reads from performance_schema, size from
+# mysql.innodb_index_stats, table writes and sys.schema_unused_indexes.
+MYSQL_INDEX_REPORT_SQL = r"""
+  SELECT s.object_name AS table_name, s.index_name, s.count_fetch,
+         ROUND(st.stat_value * @@innodb_page_size / 1048576, 1) AS size_mb,
+         w.writes,
+         u.index_name IS NOT NULL AS unused
+  FROM performance_schema.table_io_waits_summary_by_index_usage s
+  JOIN (SELECT object_schema, object_name, SUM(count_insert + count_update + count_delete) AS writes
+        FROM performance_schema.table_io_waits_summary_by_index_usage
+        GROUP BY object_schema, object_name) w
+    ON w.object_schema = s.object_schema AND w.object_name = s.object_name
+  LEFT JOIN mysql.innodb_index_stats st
+    ON st.database_name = s.object_schema AND st.table_name = s.object_name
+   AND st.index_name = s.index_name AND st.stat_name = 'size'
+  LEFT JOIN sys.schema_unused_indexes u
+    ON u.object_schema = s.object_schema AND u.object_name = s.object_name AND u.index_name = s.index_name
+  WHERE s.object_schema = DATABASE() AND s.index_name IS NOT NULL
+  ORDER BY s.object_name, s.index_name
+"""
+
+def index_report():
+    mdb = get_mdb()
+    used_by = {(name, index_name(keys)): note for name, specs in INDEXES.items() for keys, _, note in specs}
+    print("MongoDB indexes")
+    print(f"  {'collection.index':<52} {'size MB':>8} {'reads':>10}  {'since':<16}  used by")
+    for name in sorted(set(mdb.list_collection_names()) & set(INDEXES)):
+        coll = mdb[name]
+        cs = next(coll.aggregate([{"$collStats": {"storageStats": {}, "latencyStats": {}}}]))
+        sizes = cs["storageStats"].get("indexSizes", {})
+        writes = cs["latencyStats"]["writes"]["ops"]
+        for st in sorted(coll.aggregate([{"$indexStats": {}}]), key=lambda st: st["name"]):
+            ix, ops = st["name"], st["accesses"]["ops"]
+            flag = "  UNUSED" if ops == 0 and ix != "_id_" else ""
+            print(f"  {name + '.' + ix:<52} {sizes.get(ix, 0) / 2**20:>8.1f} {ops:>10}  "
+                  f"{st['accesses']['since']:%Y-%m-%d %H:%M}  {used_by.get((name, ix), '-')}{flag}")
+        print(f"  {name}: {writes} writes since startup x {len(sizes)} indexes = ~{writes * len(sizes)} index updates")
+
+    print("\nMySQL indexes")
+    try:
+        with get_sql().cursor() as cur:
+            rows = fetchall(cur, MYSQL_INDEX_REPORT_SQL)
+    except pymysql.MySQLError as err:
+        print(f"  unavailable (needs SELECT on performance_schema, sys and mysql.innodb_index_stats): {err}")
+        return
+    print(f"  {'table.index':<52} {'size MB':>8} {'reads':>10} {'table writes':>13}")
     for r in rows:
-        doc = sanitize({
-          "_id": r["appearance_id"],
-          "appearance_id": r["appearance_id"],
-          "game_id": r["game_id"],
-          "player_id": r["player_id"],
-          "player_club_id": r.get("player_club_id"),
-          "player_current_club_id": r.get("player_current_club_id"),
-          "date": r.get("date"),
-          "yellow_cards": r.get("yellow_cards"),
-          "red_cards": r.get("red_cards"),
-          "goals": r.get("goals"),
-          "assists": r.get("assists"),
-          "minutes_played": r.get("minutes_played"),
-          "player_name": r.get("player_name"),
-          "club_name": r.get("club_name"),
-          "updated_at": int(time.time())
-        })
-        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True))
-        if len(ops) >= batch:
-            mdb.appearances.bulk_write(ops); n += len(ops); ops = []
-    if ops:
-        mdb.appearances.bulk_write(ops); n += len(ops)
-    print(f"appearances upserts: {n} in {time.time()-t0:.1f}s")
+        flag = "  UNUSED" if r["unused"] else ""
+        print(f"  {r['table_name'] + '.' + r['index_name']:<52} {r['size_mb'] or 0:>8} "
+              f"{r['count_fetch']:>10} {r['writes']:>13}{flag}")
+
+# --- Stage scheduler ---
+# Flag name -> (stage, stages it waits for), listed heaviest first so the pool
+# starts the long stages early. Stages only read MySQL and each writes its own
+# collection, so they are independent; the one exception is an incremental
+# clubs run, which consumes the club moves queued by upsert_players.
+STAGES = {
+    "games":         (upsert_games, ()),
+    "appearances":   (upsert_appearances, ()),
+    "gameevents":    (upsert_game_events, ()),
+    "playerseasons": (upsert_player_seasons, ()),
+    "transfers":     (upsert_transfers, ()),
+    "transferroi":   (upsert_transfer_roi, ()),
+    "players":       (upsert_players, ()),
+    "clubs":         (upsert_clubs, ()),
+}
+INCREMENTAL_DEPS = {"clubs": ("players",)}
 
+# Pool entry point: run one stage in a worker process, hand its report back
+def run_stage(name, kwargs):
+    STAGES[name][0](**kwargs)
+    return STAGE_REPORT[-1]
+
+def stage_deps(name, names, since):
+    deps = STAGES[name][1] + (INCREMENTAL_DEPS.get(name, ()) if since else ())
+    return tuple(d for d in deps if d in names)
+
+# Run the named stages, up to `workers` at a time, each as soon as its
+# dependencies have finished. Returns {stage: error} for failed/skipped stages.
+def run_stages(names, workers, **kwargs):
+    if workers <= 1:
+        for name in names:
+            STAGES[name][0](**kwargs)
+        return {}
+    deps = {n: stage_deps(n, names, kwargs.get("since")) for n in names}
+    pending, running, done, failed = list(names), {}, set(), {}
+    # spawn: fresh interpreters, no MongoClient/pymysql state inherited via fork
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        while pending or running:
+            for name in list(pending):
+                if any(d in failed for d in deps[name]):
+                    failed[name] = "skipped: dependency failed"
+                    pending.remove(name)
+                elif all(d in done for d in deps[name]):
+                    running[pool.submit(run_stage, name, kwargs)] = name
+                    pending.remove(name)
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name = running.pop(fut)
+                try:
+                    STAGE_REPORT.append(fut.result())
+                    done.add(name)
+                except Exception as err:
+                    failed[name] = repr(err)
+                    print(f"[{name}] failed: {err!r}")
+    return failed
 
 def main():
-    ensure_indexes()
     ap = argparse.ArgumentParser()
     ap.add_argument("--games", action="store_true")
+    ap.add_argument("--games-legacy", action="store_true",
+                    help="run the games stage with one events query per game (for timing comparison)")
     ap.add_argument("--playerseasons", action="store_true")
     ap.add_argument("--transfers", action="store_true")
+    ap.add_argument("--gameevents", action="store_true",
+                    help="game_events: flat copy of games.events for the Mongo events list")
+    ap.add_argument("--transferroi", action="store_true",
+                    help="club_transfer_roi: per-transfer post-transfer totals for mongo club/roi")
     ap.add_argument("--players", action="store_true")
     ap.add_argument("--clubs", action="store_true")
     ap.add_argument("--appearances", action="store_true")
+    ap.add_argument("--since", nargs="?", const="auto", default=None, metavar="TIMESTAMP",
+                    help="incremental run: only rows changed since each collection's stored "
+                         "watermark, or since TIMESTAMP ('YYYY-MM-DD HH:MM:SS') if given")
+    ap.add_argument("--rebuild", action="store_true",
+                    help="full loads go into <collection>__building via insert_many, get their indexes "
+                         "built afterwards and are then renamed over the live collection")
+    ap.add_argument("--defer-indexes", action="store_true",
+                    help="drop the secondary indexes of fully reloaded collections during the load and "
+                         "rebuild them afterwards (first loads into empty collections always do this)")
+    ap.add_argument("--force", action="store_true",
+                    help="rewrite every extracted doc even if its stored content hash matches "
+                         "(e.g. after docs were edited in Mongo outside the app)")
+    ap.add_argument("--index-report", action="store_true",
+                    help="print Mongo $indexStats and MySQL index usage, size and write load, then exit")
+    ap.add_argument("--workers", type=int, default=int(os.getenv("ETL_WORKERS", "4")),
+                    help="stages run concurrently in this many processes (1 = sequential, in-process)")
+    ap.add_argument("--resume", action="store_true",
+                    help="continue the last run if it failed or was interrupted: finished stages are "
+                         "skipped, unfinished ones restart after their last checkpointed batch")
+    ap.add_argument("--bench-convert", type=int, nargs="?", const=1000000, metavar="N",
+                    help="benchmark sanitize() vs typed row converters on N appearance rows (default 1M) and exit")
     args = ap.parse_args()
 
-    # If no specific flag, run all
-    if not (args.games or args.playerseasons or args.transfers or args.players or args.clubs or args.appearances):
-        upsert_games()
-        upsert_player_seasons()
-        upsert_transfers()
-        upsert_players()
-        upsert_clubs()
-        upsert_appearances()
+    if args.index_report:
+        index_report()
         return
-
-    if args.games: upsert_games()
-    if args.playerseasons: upsert_player_seasons()
-    if args.transfers: upsert_transfers()
-    if args.players: upsert_players()
-    if args.clubs: upsert_clubs()
-    if args.appearances: upsert_appearances()
+    if args.bench_convert:
+        bench_convert(args.bench_convert)
+        return
+    if args.games_legacy:
+        upsert_games(legacy=True)
+        failed = {}
+    else:
+        if args.resume:
+            run = find_resumable_run()
+            if not run:
+                print("Nothing to resume: the last run finished")
+                return
+            run_id, opts = run["_id"], run["args"]
+            print(f"Resuming run {run_id} ({run['status']})")
+        else:
+            # If no specific flag, run all
+            names = [n for n in STAGES if getattr(args, n)] or list(STAGES)
+            opts = {"stages": names, "since": args.since, "rebuild": args.rebuild,
+                    "defer_indexes": args.defer_indexes, "force": args.force}
+            run_id = start_run(opts)
+        try:
+            failed = run_stages(opts["stages"], args.workers, since=opts["since"],
+                                rebuild=opts["rebuild"], defer_indexes=opts.get("defer_indexes", False),
+                                force=opts.get("force", False), run_id=run_id)
+        except BaseException as err:
+            finish_run(run_id, {"run": repr(err)})
+            raise
+        finish_run(run_id, failed)
+        if opts["since"] and not failed:
+            print(f"etl_deletes entries pruned: {prune_deletes()}")
+    print_stage_report()
+    for name, err in failed.items():
+        print(f"{name}: {err}")
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
   main()
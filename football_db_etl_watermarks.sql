@@ -0,0 +1,130 @@
+-- MODIFICATION TIMESTAMPS FOR INCREMENTAL ETL (python etl_full.py --since)
+-- Run once after football_db_setup_loading.sql. Existing rows get the ALTER time,
+-- so do one full ETL run afterwards to record the first watermarks. The delete
+-- log at the end lets incremental runs remove the Mongo docs of deleted rows.
+
+ALTER TABLE club
+  ADD COLUMN updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+  ADD INDEX ix_club_updated (updated_at);
+
+ALTER TABLE player
+  ADD COLUMN updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+  ADD INDEX ix_player_updated (updated_at);
+
+ALTER TABLE player_bio
+  ADD COLUMN updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+  ADD INDEX ix_bio_updated (updated_at);
+
+ALTER TABLE game
+  ADD COLUMN updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+  ADD INDEX ix_game_updated (updated_at);
+
+ALTER TABLE appearance
+  ADD COLUMN updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+  ADD INDEX ix_app_updated (updated_at);
+
+ALTER TABLE game_events
+  ADD COLUMN updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+  ADD INDEX ix_event_updated (updated_at);
+
+ALTER TABLE transfer
+  ADD COLUMN updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+  ADD INDEX ix_tr_updated (updated_at);
+
+-- DELETE LOG FOR INCREMENTAL ETL
+-- updated_at only marks rows that still exist. These triggers log the keys of
+-- deleted rows, plus the (player, competition, season) groups an appearance or
+-- a game moved out of (tbl = 'player_season'), so --since runs can delete or
+-- recompute the Mongo docs built from them. game_events rows removed by the
+-- game's ON DELETE CASCADE fire no trigger; the 'game' entry covers them.
+-- etl_full.py purges entries older than every collection's watermark.
+CREATE TABLE IF NOT EXISTS etl_deletes (
+  id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  tbl VARCHAR(16) NOT NULL,
+  row_id VARCHAR(64),
+  game_id INT,
+  player_id INT,
+  club_id INT,
+  competition_id VARCHAR(8),
+  season VARCHAR(16),
+  deleted_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+  INDEX ix_etl_deletes_tbl (tbl, deleted_at),
+  INDEX ix_etl_deletes_at (deleted_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+DROP TRIGGER IF EXISTS trg_game_etl_del;
+DROP TRIGGER IF EXISTS trg_game_etl_upd;
+DROP TRIGGER IF EXISTS trg_app_etl_del;
+DROP TRIGGER IF EXISTS trg_app_etl_upd;
+DROP TRIGGER IF EXISTS trg_event_etl_del;
+DROP TRIGGER IF EXISTS trg_transfer_etl_del;
+DROP TRIGGER IF EXISTS trg_player_etl_del;
+DROP TRIGGER IF EXISTS trg_club_etl_del;
+
+DELIMITER $$
+
+CREATE TRIGGER trg_game_etl_del AFTER DELETE ON game
+FOR EACH ROW
+BEGIN
+  INSERT INTO etl_deletes (tbl, row_id, game_id) VALUES ('game', OLD.game_id, OLD.game_id);
+END$$
+
+-- A game moved to another competition/season leaves its players' old groups
+CREATE TRIGGER trg_game_etl_upd AFTER UPDATE ON game
+FOR EACH ROW
+BEGIN
+  IF NOT (OLD.competition_id <=> NEW.competition_id AND OLD.season <=> NEW.season) THEN
+    INSERT INTO etl_deletes (tbl, game_id, player_id, competition_id, season)
+    SELECT 'player_season', OLD.game_id, a.player_id, OLD.competition_id, OLD.season
+    FROM appearance a
+    WHERE a.game_id IN (OLD.game_id, NEW.game_id);
+  END IF;
+END$$
+
+CREATE TRIGGER trg_app_etl_del AFTER DELETE ON appearance
+FOR EACH ROW
+BEGIN
+  INSERT INTO etl_deletes (tbl, row_id, game_id, player_id, competition_id, season)
+  SELECT 'appearance', OLD.appearance_id, OLD.game_id, OLD.player_id, g.competition_id, g.season
+  FROM (SELECT 1) one
+  LEFT JOIN game g ON g.game_id = OLD.game_id;
+END$$
+
+CREATE TRIGGER trg_app_etl_upd AFTER UPDATE ON appearance
+FOR EACH ROW
+BEGIN
+  IF NOT (OLD.player_id <=> NEW.player_id AND OLD.game_id <=> NEW.game_id) THEN
+    INSERT INTO etl_deletes (tbl, game_id, player_id, competition_id, season)
+    SELECT 'player_season', OLD.game_id, OLD.player_id, g.competition_id, g.season
+    FROM (SELECT 1) one
+    LEFT JOIN game g ON g.game_id = OLD.game_id;
+  END IF;
+END$$
+
+CREATE TRIGGER trg_event_etl_del AFTER DELETE ON game_events
+FOR EACH ROW
+BEGIN
+  INSERT INTO etl_deletes (tbl, row_id, game_id) VALUES ('game_events', OLD.game_event_id, OLD.game_id);
+END$$
+
+CREATE TRIGGER trg_transfer_etl_del AFTER DELETE ON transfer
+FOR EACH ROW
+BEGIN
+  INSERT INTO etl_deletes (tbl, row_id, player_id) VALUES ('transfer', OLD.transfer_id, OLD.player_id);
+END$$
+
+-- club_id: the club whose totals lose the player
+CREATE TRIGGER trg_player_etl_del AFTER DELETE ON player
+FOR EACH ROW
+BEGIN
+  INSERT INTO etl_deletes (tbl, row_id, player_id, club_id)
+  VALUES ('player', OLD.player_id, OLD.player_id, OLD.current_club_id);
+END$$
+
+CREATE TRIGGER trg_club_etl_del AFTER DELETE ON club
+FOR EACH ROW
+BEGIN
+  INSERT INTO etl_deletes (tbl, row_id, club_id) VALUES ('club', OLD.club_id, OLD.club_id);
+END$$
+
+DELIMITER ;
@@ -0,0 +1,21 @@
+-- INDEXES FOR KEYSET PAGINATION OF THE LIST ENDPOINTS (?after=<token>)
+-- Run once after football_db_setup_loading.sql. Each list orders by its sort
+-- column plus the primary key as a tiebreaker; these indexes return rows in
+-- that order and let the seek (sort key, id) < (last key, last id) start
+-- right at the previous page's last row.
+
+ALTER TABLE player
+  ADD INDEX ix_player_mv (market_value_eur, player_id);
+
+ALTER TABLE club
+  ADD INDEX ix_club_name_id (name, club_id);
+
+ALTER TABLE game
+  ADD INDEX ix_game_date_id (date, game_id),
+  ADD INDEX ix_game_comp_season_date (competition_id, season, date, game_id);
+
+ALTER TABLE appearance
+  ADD INDEX ix_app_date_id (date, appearance_id);
+
+ALTER TABLE transfer
+  ADD INDEX ix_tr_date_id (transfer_date, transfer_id);
@@ -0,0 +1,220 @@
+-- SUMMARY TABLES
+-- Run after football_db_setup_loading.sql / load_mysql.py (and again after any
+-- bulk reload done without load_mysql.py: TRUNCATE and bulk loads bypass the
+-- maintenance; load_mysql.py drops the triggers below for its load and reruns
+-- this script at the end). Each table is rebuilt from scratch here, then kept
+-- current row by row by the triggers below or by the app's write endpoints
+-- (noted per table).
+
+-- CLUB TRANSFER ROI (replaces view_club_transfer_roi for /api/club/roi)
+-- One row per transfer, with the totals of the player's appearances on or
+-- after the transfer date. The view grouped by (club, player, season, fee,
+-- market value) and recomputed the transfer x appearance join on every call;
+-- here ROI lookups are a range scan on (club_id, transfer_season).
+-- post_* are 0 (not NULL) when there are no appearances yet.
+
+DROP TABLE IF EXISTS club_transfer_roi;
+
+CREATE TABLE club_transfer_roi (
+  transfer_id INT PRIMARY KEY,
+  club_id INT,
+  player_id INT NOT NULL,
+  transfer_season VARCHAR(16),
+  transfer_date DATE NOT NULL,
+  transfer_fee BIGINT,
+  market_value_in_eur BIGINT,
+  post_apps INT NOT NULL DEFAULT 0,
+  post_minutes INT NOT NULL DEFAULT 0,
+  post_goals INT NOT NULL DEFAULT 0,
+  post_assists INT NOT NULL DEFAULT 0,
+  eur_per_minutes DECIMAL(20,2) AS (ROUND(NULLIF(transfer_fee,0) / NULLIF(post_minutes,0), 2)) STORED,
+  eur_per_contrib DECIMAL(20,2) AS (ROUND(NULLIF(transfer_fee,0) / NULLIF(post_goals + post_assists,0), 2)) STORED,
+  INDEX ix_roi_club_season (club_id, transfer_season),
+  INDEX ix_roi_player_date (player_id, transfer_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO club_transfer_roi
+(transfer_id, club_id, player_id, transfer_season, transfer_date, transfer_fee, market_value_in_eur,
+ post_apps, post_minutes, post_goals, post_assists)
+SELECT
+  t.transfer_id, t.to_club_id, t.player_id, t.transfer_season, t.transfer_date,
+  t.transfer_fee, t.market_value_in_eur,
+  COUNT(a.appearance_id),
+  COALESCE(SUM(a.minutes_played),0),
+  COALESCE(SUM(a.goals),0),
+  COALESCE(SUM(a.assists),0)
+FROM transfer t
+LEFT JOIN appearance a
+  ON a.player_id = t.player_id
+ AND a.date >= t.transfer_date
+GROUP BY t.transfer_id;
+
+DROP TRIGGER IF EXISTS trg_transfer_roi_ins;
+DROP TRIGGER IF EXISTS trg_transfer_roi_upd;
+DROP TRIGGER IF EXISTS trg_transfer_roi_del;
+DROP TRIGGER IF EXISTS trg_app_roi_ins;
+DROP TRIGGER IF EXISTS trg_app_roi_upd;
+DROP TRIGGER IF EXISTS trg_app_roi_del;
+
+DELIMITER $$
+
+-- A new or edited transfer gets its row (re)computed from the player's appearances
+CREATE TRIGGER trg_transfer_roi_ins AFTER INSERT ON transfer
+FOR EACH ROW
+BEGIN
+  INSERT INTO club_transfer_roi
+  (transfer_id, club_id, player_id, transfer_season, transfer_date, transfer_fee, market_value_in_eur,
+   post_apps, post_minutes, post_goals, post_assists)
+  SELECT NEW.transfer_id, NEW.to_club_id, NEW.player_id, NEW.transfer_season, NEW.transfer_date,
+         NEW.transfer_fee, NEW.market_value_in_eur,
+         COUNT(*), COALESCE(SUM(a.minutes_played),0), COALESCE(SUM(a.goals),0), COALESCE(SUM(a.assists),0)
+  FROM appearance a
+  WHERE a.player_id = NEW.player_id AND a.date >= NEW.transfer_date;
+END$$
+
+CREATE TRIGGER trg_transfer_roi_upd AFTER UPDATE ON transfer
+FOR EACH ROW
+BEGIN
+  DELETE FROM club_transfer_roi WHERE transfer_id = OLD.transfer_id;
+  INSERT INTO club_transfer_roi
+  (transfer_id, club_id, player_id, transfer_season, transfer_date, transfer_fee, market_value_in_eur,
+   post_apps, post_minutes, post_goals, post_assists)
+  SELECT NEW.transfer_id, NEW.to_club_id, NEW.player_id, NEW.transfer_season, NEW.transfer_date,
+         NEW.transfer_fee, NEW.market_value_in_eur,
+         COUNT(*), COALESCE(SUM(a.minutes_played),0), COALESCE(SUM(a.goals),0), COALESCE(SUM(a.assists),0)
+  FROM appearance a
+  WHERE a.player_id = NEW.player_id AND a.date >= NEW.transfer_date;
+END$$
+
+CREATE TRIGGER trg_transfer_roi_del AFTER DELETE ON transfer
+FOR EACH ROW
+BEGIN
+  DELETE FROM club_transfer_roi WHERE transfer_id = OLD.transfer_id;
+END$$
+
+-- An appearance counts towards every earlier transfer of its player
+CREATE TRIGGER trg_app_roi_ins AFTER INSERT ON appearance
+FOR EACH ROW
+BEGIN
+  UPDATE club_transfer_roi
+  SET post_apps = post_apps + 1,
+      post_minutes = post_minutes + COALESCE(NEW.minutes_played,0),
+      post_goals = post_goals + COALESCE(NEW.goals,0),
+      post_assists = post_assists + COALESCE(NEW.assists,0)
+  WHERE player_id = NEW.player_id AND transfer_date <= NEW.date;
+END$$
+
+CREATE TRIGGER trg_app_roi_upd AFTER UPDATE ON appearance
+FOR EACH ROW
+BEGIN
+  UPDATE club_transfer_roi
+  SET post_apps = post_apps - 1,
+      post_minutes = post_minutes - COALESCE(OLD.minutes_played,0),
+      post_goals = post_goals - COALESCE(OLD.goals,0),
+      post_assists = post_assists - COALESCE(OLD.assists,0)
+  WHERE player_id = OLD.player_id AND transfer_date <= OLD.date;
+  UPDATE club_transfer_roi
+  SET post_apps = post_apps + 1,
+      post_minutes = post_minutes + COALESCE(NEW.minutes_played,0),
+      post_goals = post_goals + COALESCE(NEW.goals,0),
+      post_assists = post_assists + COALESCE(NEW.assists,0)
+  WHERE player_id = NEW.player_id AND transfer_date <= NEW.date;
+END$$
+
+CREATE TRIGGER trg_app_roi_del AFTER DELETE ON appearance
+FOR EACH ROW
+BEGIN
+  UPDATE club_transfer_roi
+  SET post_apps = post_apps - 1,
+      post_minutes = post_minutes - COALESCE(OLD.minutes_played,0),
+      post_goals = post_goals - COALESCE(OLD.goals,0),
+      post_assists = post_assists - COALESCE(OLD.assists,0)
+  WHERE player_id = OLD.player_id AND transfer_date <= OLD.date;
+END$$
+
+DELIMITER ;
+
+-- PLAYER SEASON STATS (replaces the appearance x game aggregation in the
+-- season-summary, seasons, competitions and top-scorers endpoints)
+-- One row per (player, competition, season); a NULL competition/season is
+-- stored as '' so it can be part of the key. top_club_* is the club the player
+-- scored most for in that competition-season (what /api/top-scorers ranks by).
+-- Kept current by app.py: every appearance insert/update/delete and game
+-- update recomputes the affected keys in the same transaction.
+
+DROP TABLE IF EXISTS player_season_stats;
+
+CREATE TABLE player_season_stats (
+  player_id INT NOT NULL,
+  competition_id VARCHAR(8) NOT NULL DEFAULT '',
+  season VARCHAR(16) NOT NULL DEFAULT '',
+  apps INT NOT NULL,
+  minutes INT,
+  goals INT,
+  assists INT,
+  yellows INT,
+  reds INT,
+  top_club_id INT,
+  top_club_goals INT,
+  goals_per90 DECIMAL(8,3) AS (ROUND(COALESCE(goals,0) * 90 / NULLIF(minutes,0), 3)) STORED,
+  assists_per90 DECIMAL(8,3) AS (ROUND(COALESCE(assists,0) * 90 / NULLIF(minutes,0), 3)) STORED,
+  ga_per90 DECIMAL(8,3) AS (ROUND((COALESCE(goals,0) + COALESCE(assists,0)) * 90 / NULLIF(minutes,0), 3)) STORED,
+  PRIMARY KEY (player_id, competition_id, season),
+  INDEX ix_pss_comp_season_goals (competition_id, season, top_club_goals)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO player_season_stats
+(player_id, competition_id, season, apps, minutes, goals, assists, yellows, reds, top_club_id, top_club_goals)
+WITH per AS (
+  SELECT a.player_id, COALESCE(g.competition_id,'') AS competition_id, COALESCE(g.season,'') AS season,
+         a.player_club_id,
+         COUNT(*) AS apps, SUM(a.minutes_played) AS minutes, SUM(a.goals) AS goals,
+         SUM(a.assists) AS assists, SUM(a.yellow_cards) AS yellows, SUM(a.red_cards) AS reds
+  FROM appearance a
+  JOIN game g ON g.game_id = a.game_id
+  GROUP BY a.player_id, COALESCE(g.competition_id,''), COALESCE(g.season,''), a.player_club_id
+), ranked AS (
+  SELECT per.*,
+         ROW_NUMBER() OVER (PARTITION BY player_id, competition_id, season ORDER BY goals DESC) AS rn
+  FROM per
+)
+SELECT player_id, competition_id, season,
+       SUM(apps), SUM(minutes), SUM(goals), SUM(assists), SUM(yellows), SUM(reds),
+       MAX(CASE WHEN rn = 1 THEN player_club_id END), MAX(CASE WHEN rn = 1 THEN goals END)
+FROM ranked
+GROUP BY player_id, competition_id, season;
+
+-- CLUB MARKET TOTALS (replaces the all-clubs SUM + DENSE_RANK() window in the
+-- club profile and market-ranking endpoints)
+-- Total market value of each club's current players (those with a value),
+-- plus its dense rank, so a profile is a primary-key lookup and the ranking a
+-- scan of ix_cmt_rank. Kept current by app.py: player create/update/delete and
+-- club create/delete recompute the affected clubs' totals in their transaction,
+-- then, after commit, the ranks of the clubs at or below the highest total
+-- involved (only rows whose rank moved are written).
+
+DROP TABLE IF EXISTS club_market_totals;
+
+CREATE TABLE club_market_totals (
+  club_id INT PRIMARY KEY,
+  total_market_value_eur BIGINT NOT NULL DEFAULT 0,
+  player_count INT NOT NULL DEFAULT 0,
+  market_value_rank INT,
+  INDEX ix_cmt_rank (market_value_rank),
+  INDEX ix_cmt_total (total_market_value_eur)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO club_market_totals (club_id, total_market_value_eur, player_count)
+SELECT c.club_id, COALESCE(SUM(p.market_value_eur),0), COUNT(p.player_id)
+FROM club c
+LEFT JOIN player p
+  ON p.current_club_id = c.club_id
+ AND p.market_value_eur IS NOT NULL
+GROUP BY c.club_id;
+
+UPDATE club_market_totals t
+JOIN (
+  SELECT club_id, DENSE_RANK() OVER (ORDER BY total_market_value_eur DESC) AS r
+  FROM club_market_totals
+) x ON x.club_id = t.club_id
+SET t.market_value_rank = x.r;
@@ -0,0 +1,356 @@
+import os, re, time, argparse, tempfile, shutil, threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import pymysql
+from dotenv import load_dotenv
+
+from etl_full import sql_connect
+
+load_dotenv()
+
+# Bulk loader for the MySQL tables, driven by football_db_setup_loading.sql:
+# the staging CREATE TABLEs, LOAD DATA column lists and cleaning
+# INSERT ... SELECT statements are parsed from the file, so it stays the single
+# definition of the schema and cleaning rules. Compared to running the file:
+#  - each CSV is split into chunks that are LOADed into stg_* in parallel
+#  - FK and unique checks are off for the load sessions and switched back on after
+#  - plain secondary indexes are dropped before the INSERT ... SELECT and rebuilt
+#    in one ALTER per table once its data is in
+#  - independent INSERT ... SELECTs run concurrently (club, then player and game, ...)
+#  - if football_db_summary_tables.sql has been run, its triggers are dropped for
+#    the load and the script is rerun at the end (one rebuild per summary table)
+#  - rows/sec is reported per table and phase
+
+SQL_FILE = os.getenv("SETUP_SQL", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                               "football_db_setup_loading.sql"))
+SUMMARY_SQL = os.getenv("SUMMARY_SQL", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                   "football_db_summary_tables.sql"))
+CSV_DIR = os.getenv("CSV_DIR", ".")
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", "4"))
+
+# --- Parsing the setup script ---
+# Honours mysql-client DELIMITER lines, so trigger bodies (BEGIN ... ; ... END$$)
+# come out as one statement
+def split_statements(text):
+    text = "\n".join(l for l in text.splitlines() if not l.lstrip().startswith("--"))
+    stmts, buf, quote, delim, i = [], [], None, ";", 0
+    while i < len(text):
+        ch = text[i]
+        if not quote and (i == 0 or text[i - 1] == "\n"):
+            m = re.match(r"[ \t]*DELIMITER[ \t]+(\S+)[^\n]*\n?", text[i:], re.I)
+            if m:
+                delim = m.group(1)
+                i += m.end()
+                continue
+        if not quote and text.startswith(delim, i):
+            stmts.append("".join(buf).strip())
+            buf = []
+            i += len(delim)
+            continue
+        buf.append(ch)
+        if quote:
+            if ch == "\\":                       # backslash escape inside a string literal
+                buf.append(text[i + 1:i + 2])
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch in "'\"`":
+            quote = ch
+        i += 1
+    if "".join(buf).strip():
+        stmts.append("".join(buf).strip())
+    return [s for s in stmts if s]
+
+def parse_setup(path):
+    with open(path, encoding="utf-8") as f:
+        stmts = split_statements(f.read())
+    setup = {"create": {}, "loads": [], "inserts": {}}
+    for s in stmts:
+        head = " ".join(s.split()[:3]).upper()
+        if head.startswith("CREATE TABLE"):
+            setup["create"][re.match(r"CREATE\s+TABLE\s+(\w+)", s, re.I).group(1)] = s
+        elif head.startswith("LOAD DATA"):
+            m = re.search(r"INFILE\s+'((?:[^'\\]|\\.)*)'\s+INTO\s+TABLE\s+(\w+)", s, re.I)
+            setup["loads"].append({
+                "file": re.split(r"[\\/]+", m.group(1))[-1],   # basename of the Windows path
+                "table": m.group(2),
+                "stmt": s,
+            })
+        elif head.startswith("INSERT INTO"):
+            setup["inserts"][re.match(r"INSERT\s+INTO\s+(\w+)", s, re.I).group(1)] = s
+    return setup
+
+# Production tables an INSERT ... SELECT has to wait for: the tables it joins
+# plus the ones its foreign keys reference
+def insert_deps(setup, table):
+    refs = set(re.findall(r"\bJOIN\s+(\w+)", setup["inserts"][table], re.I))
+    refs |= set(re.findall(r"\bREFERENCES\s+(\w+)", setup["create"].get(table, ""), re.I))
+    return tuple(sorted(t for t in refs if t in setup["inserts"] and t != table))
+
+# --- Connections: one per loader thread ---
+_local = threading.local()
+_opened = []
+
+def load_conn():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = sql_connect(local_infile=True, cursorclass=pymysql.cursors.Cursor)
+        with conn.cursor() as cur:
+            cur.execute("SET SESSION foreign_key_checks = 0")
+            cur.execute("SET SESSION unique_checks = 0")
+        _opened.append(conn)
+    return conn
+
+def close_conns():
+    for conn in _opened:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET SESSION foreign_key_checks = 1")
+                cur.execute("SET SESSION unique_checks = 1")
+            conn.close()
+        except pymysql.MySQLError:
+            pass
+    _opened.clear()
+
+def execute(sql):
+    with load_conn().cursor() as cur:
+        cur.execute(sql)
+        return cur.rowcount
+
+# --- Report ---
+REPORT = []
+_report_lock = threading.Lock()
+
+def report(phase, table, rows, seconds, note=""):
+    with _report_lock:
+        REPORT.append({"phase": phase, "table": table, "rows": rows, "seconds": seconds, "note": note})
+
+def print_report(total_s):
+    print("\nphase     table              rows    seconds     rows/s  note")
+    for e in REPORT:
+        rate = f"{e['rows'] / e['seconds']:>10.0f}" if e["rows"] and e["seconds"] > 0 else "         -"
+        rows = f"{e['rows']:>10}" if e["rows"] is not None else "         -"
+        print(f"{e['phase']:<9} {e['table']:<15} {rows} {e['seconds']:>10.1f} {rate}  {e['note']}")
+    print(f"total {total_s:.1f}s")
+
+# --- Chunked CSV -> staging ---
+# Records are cut on line ends outside quoted fields (a quoted description can
+# span lines); chunks are written without the header, so IGNORE 0 LINES.
+def split_csv(path, chunk_rows, out_dir):
+    base = os.path.splitext(os.path.basename(path))[0]
+    part, n, in_quotes, out = 0, 0, False, None
+    with open(path, encoding="utf-8", newline="") as f:
+        next(f, None)
+        for line in f:
+            if out is None:
+                chunk = os.path.join(out_dir, f"{base}.{part:04d}.csv")
+                out = open(chunk, "w", encoding="utf-8", newline="")
+            out.write(line)
+            if (line.count('"') - line.count('\\"')) % 2:
+                in_quotes = not in_quotes
+            if in_quotes:
+                continue
+            n += 1
+            if n == chunk_rows:
+                out.close()
+                yield chunk
+                part, n, out = part + 1, 0, None
+    if out is not None:
+        out.close()
+        yield chunk
+
+def load_chunk(load, chunk):
+    infile = "INFILE '" + pymysql.converters.escape_string(chunk.replace("\\", "/")) + "'"
+    stmt = re.sub(r"INFILE\s+'(?:[^'\\]|\\.)*'", lambda _: infile, load["stmt"], count=1, flags=re.I)
+    stmt = re.sub(r"IGNORE\s+1\s+LINES", "IGNORE 0 LINES", stmt, flags=re.I)
+    rows = execute(stmt)
+    os.remove(chunk)
+    return rows, time.time()
+
+def load_staging(setup, pool, workers, csv_dir, chunk_rows, tmp):
+    for load in setup["loads"]:
+        execute(f"TRUNCATE TABLE {load['table']}")
+    # Chunks are submitted as soon as they are written, so splitting overlaps
+    # with loading; at most 2 chunks per worker sit on disk at a time
+    spans = {}      # table -> [first chunk submitted, last chunk loaded, rows, chunks]
+    running = {}
+
+    def collect(futures):
+        for fut in futures:
+            table = running.pop(fut)
+            rows, ended = fut.result()
+            span = spans[table]
+            span[1] = max(span[1], ended)
+            span[2] += rows
+            span[3] += 1
+
+    for load in setup["loads"]:
+        spans[load["table"]] = [time.time(), time.time(), 0, 0]
+        for chunk in split_csv(os.path.join(csv_dir, load["file"]), chunk_rows, tmp):
+            running[pool.submit(load_chunk, load, chunk)] = load["table"]
+            if len(running) >= 2 * workers:
+                collect(wait(running, return_when=FIRST_COMPLETED)[0])
+    collect(list(running))
+    for table, (t0, t1, rows, chunks) in spans.items():
+        report("stage", table, rows, t1 - t0, f"{chunks} chunks")
+
+# --- Secondary indexes ---
+# Non-unique secondary indexes on the target tables. Unique keys stay in place
+# (rebuilding them afterwards would fail on any duplicate), and so does any index
+# MySQL refuses to drop because a foreign key needs it.
+SECONDARY_INDEXES_SQL = """
+SELECT s.TABLE_NAME, s.INDEX_NAME,
+       GROUP_CONCAT(CONCAT('`', s.COLUMN_NAME, '`',
+                           IF(s.SUB_PART IS NULL, '', CONCAT('(', s.SUB_PART, ')')),
+                           IF(s.COLLATION = 'D', ' DESC', ''))
+                    ORDER BY s.SEQ_IN_INDEX SEPARATOR ', ')
+FROM information_schema.STATISTICS s
+WHERE s.TABLE_SCHEMA = DATABASE() AND s.INDEX_NAME <> 'PRIMARY' AND s.NON_UNIQUE = 1
+  AND s.TABLE_NAME IN ({tables})
+GROUP BY s.TABLE_NAME, s.INDEX_NAME
+ORDER BY s.TABLE_NAME, s.INDEX_NAME
+"""
+
+def drop_secondary_indexes(tables):
+    with load_conn().cursor() as cur:
+        cur.execute(SECONDARY_INDEXES_SQL.format(tables=", ".join(["%s"] * len(tables))), list(tables))
+        found = cur.fetchall()
+    dropped = {}
+    for table, index, cols in found:
+        try:
+            execute(f"ALTER TABLE {table} DROP INDEX `{index}`")
+            dropped.setdefault(table, []).append((index, cols))
+        except pymysql.MySQLError as err:
+            print(f"  kept {table}.{index}: {err.args[-1]}")
+    return dropped
+
+def rebuild_indexes(table, indexes):
+    if not indexes:
+        return
+    t0 = time.time()
+    execute(f"ALTER TABLE {table} " + ", ".join(f"ADD INDEX `{name}` ({cols})" for name, cols in indexes))
+    report("index", table, None, time.time() - t0, ", ".join(name for name, _ in indexes))
+
+# --- INSERT ... SELECT into production ---
+def insert_table(setup, table, dropped):
+    t0 = time.time()
+    rows = execute(setup["inserts"][table])
+    report("insert", table, rows, time.time() - t0)
+    rebuild_indexes(table, dropped.pop(table, []))
+
+# Runs every INSERT ... SELECT as soon as the tables it depends on are loaded
+def load_production(setup, pool, dropped):
+    deps = {t: insert_deps(setup, t) for t in setup["inserts"]}
+    pending, running, done = list(setup["inserts"]), {}, set()
+    while pending or running:
+        for t in [t for t in pending if all(d in done for d in deps[t])]:
+            pending.remove(t)
+            running[pool.submit(insert_table, setup, t, dropped)] = t
+        if not running:
+            raise RuntimeError(f"unresolvable insert dependencies: {pending}")
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for fut in finished:
+            t = running.pop(fut)
+            fut.result()
+            done.add(t)
+
+# --- Summary tables ---
+# TRUNCATE fires no triggers, so a reload would leave club_transfer_roi rows
+# behind (and trg_transfer_roi_ins then fails on their transfer_id), while on
+# INSERT ... SELECT trg_app_roi_ins runs once per appearance. So the summary
+# triggers are dropped before the load and the summary script is rerun after
+# it: it recreates each table from one INSERT ... SELECT, then the triggers.
+def parse_summaries(path):
+    with open(path, encoding="utf-8") as f:
+        stmts = split_statements(f.read())
+    named = lambda kind: [m.group(1) for m in (re.match(rf"CREATE\s+{kind}\s+(\w+)", s, re.I) for s in stmts) if m]
+    return {"stmts": stmts, "tables": named("TABLE"), "triggers": named("TRIGGER")}
+
+EXISTING_SQL = {
+    "tables": "SELECT TABLE_NAME FROM information_schema.TABLES "
+              "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({names})",
+    "triggers": "SELECT TRIGGER_NAME FROM information_schema.TRIGGERS "
+                "WHERE TRIGGER_SCHEMA = DATABASE() AND TRIGGER_NAME IN ({names})",
+}
+
+def existing(kind, names):
+    if not names:
+        return []
+    with load_conn().cursor() as cur:
+        cur.execute(EXISTING_SQL[kind].format(names=", ".join(["%s"] * len(names))), list(names))
+        return sorted(r[0] for r in cur.fetchall())
+
+# Returns whether the summary tables are there (and so need rebuilding after the load)
+def suspend_summaries(summary, truncate):
+    tables = existing("tables", summary["tables"])
+    if not tables:
+        return False
+    for trigger in existing("triggers", summary["triggers"]):
+        execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    if truncate:
+        for table in tables:
+            execute(f"TRUNCATE TABLE {table}")
+    return True
+
+def rebuild_summaries(summary):
+    for stmt in summary["stmts"]:
+        t0 = time.time()
+        rows = execute(stmt)
+        m = re.match(r"INSERT\s+INTO\s+(\w+)", stmt, re.I)
+        if m:
+            report("summary", m.group(1), rows, time.time() - t0)
+
+def main():
+    ap = argparse.ArgumentParser(description="Parallel bulk load of the CSVs into MySQL")
+    ap.add_argument("--csv-dir", default=CSV_DIR, help="folder with the CSV files (default $CSV_DIR or .)")
+    ap.add_argument("--sql", default=SQL_FILE, help="setup script to take the schema and cleaning SQL from")
+    ap.add_argument("--workers", type=int, default=LOAD_WORKERS, help="parallel loader connections")
+    ap.add_argument("--chunk-rows", type=int, default=100000, help="CSV records per LOAD DATA chunk")
+    ap.add_argument("--create-tables", action="store_true", help="create missing production tables first")
+    ap.add_argument("--truncate", action="store_true", help="empty the production and summary tables before loading")
+    ap.add_argument("--summary-sql", default=SUMMARY_SQL, help="summary script to rebuild after the load, if it was run")
+    args = ap.parse_args()
+
+    setup = parse_setup(args.sql)
+    summary = parse_summaries(args.summary_sql)
+    staging = {l["table"] for l in setup["loads"]}
+    # competitions.csv is LOADed straight into its production table
+    production = list(setup["inserts"]) + sorted(t for t in staging if not t.startswith("stg_"))
+    t_start = time.time()
+    tmp = tempfile.mkdtemp(prefix="football_load_")
+    pool = ThreadPoolExecutor(max_workers=max(args.workers, 1), initializer=load_conn)
+    try:
+        for name, stmt in setup["create"].items():
+            if name.startswith("stg_") or args.create_tables:
+                execute(re.sub(r"CREATE\s+TABLE\s+", "CREATE TABLE IF NOT EXISTS ", stmt, count=1, flags=re.I))
+        summaries = suspend_summaries(summary, args.truncate)
+        if args.truncate:
+            for table in production:
+                execute(f"TRUNCATE TABLE {table}")
+        dropped = drop_secondary_indexes(list(setup["inserts"]))
+        try:
+            load_staging(setup, pool, max(args.workers, 1), args.csv_dir, args.chunk_rows, tmp)
+            load_production(setup, pool, dropped)
+        except BaseException:
+            # Put the remaining indexes and the summary triggers back even when the
+            # load fails, so the schema is intact
+            for table, indexes in dropped.items():
+                try:
+                    rebuild_indexes(table, indexes)
+                except pymysql.MySQLError as err:
+                    print(f"  could not rebuild indexes on {table}: {err}")
+            if summaries:
+                try:
+                    rebuild_summaries(summary)
+                except pymysql.MySQLError as err:
+                    print(f"  could not rebuild the summary tables, rerun {args.summary_sql}: {err}")
+            raise
+        if summaries:
+            rebuild_summaries(summary)
+    finally:
+        pool.shutdown(wait=True)
+        close_conns()
+        shutil.rmtree(tmp, ignore_errors=True)
+    print_report(time.time() - t_start)
+
+if __name__ == "__main__":
+    main()
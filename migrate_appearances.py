@@ -0,0 +1,95 @@
+import time, argparse
+from dotenv import load_dotenv
+
+from etl_full import get_mdb, ensure_indexes, APPEARANCE_COLLECTIONS, APPEARANCE_FIELDS
+
+load_dotenv()
+
+# One-shot migration of legacy appearance documents to the canonical schema
+# (the fields etl_full.appearance_doc writes). The collection is renamed to
+# "appearances", every legacy field (gameId, mins, stats.goals, ...) is copied
+# to its canonical name where that is missing or empty and then unset, dates
+# stored as BSON dates become 'YYYY-MM-DD' strings, and the list indexes are
+# built. Re-running it is a no-op. Afterwards restart the app or
+# POST /api/mongo/appearances/schema/refresh so the appearances list switches
+# to the canonical projection.
+
+def legacy_fields():
+    for canonical, stored in APPEARANCE_FIELDS.items():
+        for f in stored:
+            if f not in (canonical, "_id"):
+                yield canonical, f
+
+# Aggregation-pipeline update: keep the canonical value unless it is missing,
+# NULL or "", like the old per-row pick() in the list endpoint
+def move_field(canonical, legacy):
+    keep = {"$not": [{"$in": [{"$ifNull": ["$" + canonical, ""]}, [""]]}]}
+    return [
+        {"$set": {canonical: {"$cond": [keep, "$" + canonical, "$" + legacy]}}},
+        {"$unset": legacy},
+    ]
+
+def main():
+    ap = argparse.ArgumentParser(description="Normalize legacy Mongo appearance documents to the canonical schema")
+    ap.add_argument("--dry-run", action="store_true", help="only count the documents that would change")
+    args = ap.parse_args()
+
+    mdb = get_mdb()
+    t0 = time.time()
+    names = set(mdb.list_collection_names())
+    found = [c for c in APPEARANCE_COLLECTIONS if c in names]
+    if not found:
+        print("no appearances collection, nothing to migrate")
+        return
+    if len(found) > 1:
+        raise SystemExit(f"several appearance collections exist ({', '.join(found)}); merge them by hand first")
+    name = found[0]
+    coll = mdb[name]
+
+    moves = list(legacy_fields())
+    if args.dry_run:
+        if name != "appearances":
+            print(f"would rename {name} -> appearances")
+        for canonical, legacy in moves:
+            n = coll.count_documents({legacy: {"$exists": True}})
+            if n:
+                print(f"  {legacy} -> {canonical}: {n} docs")
+        n = coll.count_documents({"appearance_id": {"$exists": False}})
+        if n:
+            print(f"  _id -> appearance_id: {n} docs")
+        n = coll.count_documents({"date": {"$type": "date"}})
+        if n:
+            print(f"  date (BSON date -> string): {n} docs")
+        return
+
+    if name != "appearances":
+        coll.rename("appearances")
+        coll = mdb["appearances"]
+        print(f"renamed {name} -> appearances")
+
+    moved = {}
+    for canonical, legacy in moves:
+        res = coll.update_many({legacy: {"$exists": True}}, move_field(canonical, legacy))
+        if res.modified_count:
+            moved[legacy] = res.modified_count
+            print(f"  {legacy} -> {canonical}: {res.modified_count} docs")
+    res = coll.update_many({"appearance_id": {"$exists": False}}, [{"$set": {"appearance_id": "$_id"}}])
+    if res.modified_count:
+        moved["_id"] = res.modified_count
+        print(f"  _id -> appearance_id: {res.modified_count} docs")
+    res = coll.update_many({"date": {"$type": "date"}},
+                           [{"$set": {"date": {"$dateToString": {"date": "$date", "format": "%Y-%m-%d"}}}}])
+    if res.modified_count:
+        moved["date"] = res.modified_count
+        print(f"  date (BSON date -> string): {res.modified_count} docs")
+    coll.update_many({"stats": {}}, {"$unset": {"stats": ""}})
+
+    ensure_indexes(["appearances"])
+    mdb.etl_state.update_one({"_id": "appearance_schema"}, {"$set": {
+        "collection": "appearances", "normalized": True, "moved": moved,
+        "migrated_at": int(time.time())}}, upsert=True)
+    print(f"appearances normalized in {time.time()-t0:.1f}s; restart the app or "
+          "POST /api/mongo/appearances/schema/refresh to pick up the canonical schema")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,564 @@
+# In-memory stand-ins for the bits of pymongo the ETL and app code use.
+# Filters support equality, dotted paths, $in/$gt/$lt/$ne and $expr; updates
+# support $set, $unset, $push, $pull, $addToSet ($each) and $pullAll;
+# aggregate() runs the stages and expression operators the app's pipelines use.
+import copy
+import threading
+
+from pymongo.errors import DuplicateKeyError
+
+MISSING = object()
+
+
+def get_path(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return MISSING
+        doc = doc[part]
+    return doc
+
+
+def matches(doc, flt, variables=None):
+    for key, cond in (flt or {}).items():
+        if key == "$expr":
+            if not evaluate(doc, cond, variables):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches(doc, f) for f in cond):
+                return False
+            continue
+        if key == "$and":
+            if not all(matches(doc, f) for f in cond):
+                return False
+            continue
+        v = get_path(doc, key)
+        if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            for op, arg in cond.items():
+                if op == "$in":
+                    ok = v in arg
+                elif op == "$nin":
+                    ok = v not in arg
+                elif op == "$ne":
+                    ok = (None if v is MISSING else v) != arg
+                elif op == "$exists":
+                    ok = (v is not MISSING) == bool(arg)
+                elif op in ("$gt", "$gte", "$lt", "$lte"):
+                    if v is MISSING or v is None:
+                        ok = False
+                    else:
+                        ok = {"$gt": v > arg, "$gte": v >= arg, "$lt": v < arg, "$lte": v <= arg}[op]
+                else:
+                    raise NotImplementedError(op)
+                if not ok:
+                    return False
+        elif (None if v is MISSING else v) != cond:
+            return False
+    return True
+
+
+def project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {k for k, v in projection.items() if v}
+    if not include - {"_id"}:
+        # exclusion projection
+        out = copy.deepcopy(doc)
+        for k, v in projection.items():
+            if not v:
+                unset_path(out, k)
+        return out
+    out = {"_id": doc["_id"]} if projection.get("_id", 1) else {}
+    for k in include:
+        v = get_path(doc, k)
+        if v is not MISSING:
+            top = k.split(".")[0]
+            out[top] = copy.deepcopy(doc[top])
+    return out
+
+
+def set_path(doc, path, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def unset_path(doc, path):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part, {})
+    doc.pop(last, None)
+
+
+def apply_update(doc, update):
+    for op, fields in update.items():
+        for path, value in fields.items():
+            if op == "$set":
+                set_path(doc, path, copy.deepcopy(value))
+            elif op == "$unset":
+                unset_path(doc, path)
+            elif op == "$addToSet":
+                cur = get_path(doc, path)
+                cur = [] if cur is MISSING else cur
+                for v in (value["$each"] if isinstance(value, dict) and "$each" in value else [value]):
+                    if v not in cur:
+                        cur.append(v)
+                set_path(doc, path, cur)
+            elif op == "$push":
+                cur = get_path(doc, path)
+                set_path(doc, path, ([] if cur is MISSING else cur) + [copy.deepcopy(value)])
+            elif op == "$pull":
+                cur = get_path(doc, path)
+                if cur is not MISSING:
+                    keep = (lambda v: not matches(v, value)) if isinstance(value, dict) else (lambda v: v != value)
+                    set_path(doc, path, [v for v in cur if keep(v)])
+            elif op == "$pullAll":
+                cur = get_path(doc, path)
+                if cur is not MISSING:
+                    set_path(doc, path, [v for v in cur if v not in value])
+            else:
+                raise NotImplementedError(op)
+
+
+class Result:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+# Sorts on the full documents, like the server, and projects on the way out
+class FakeCursor:
+    def __init__(self, docs, projection=None):
+        self.docs, self.projection = list(docs), projection
+
+    def sort(self, key, direction=None):
+        keys = key if isinstance(key, list) else [(key, direction or 1)]
+        for field, d in reversed(keys):
+            self.docs.sort(key=lambda doc: _order(get_path(doc, field)), reverse=d == -1)
+        return self
+
+    def limit(self, n):
+        if n:
+            self.docs = self.docs[:n]
+        return self
+
+    def skip(self, n):
+        self.docs = self.docs[n:]
+        return self
+
+    def __iter__(self):
+        return iter([project(d, self.projection) for d in self.docs])
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __getitem__(self, i):
+        return project(self.docs[i], self.projection)
+
+
+# --- Aggregation ---
+def _cmp_key(v):
+    # BSON order across types: missing/null < numbers < strings < documents
+    if v is MISSING or v is None:
+        return (0, 0)
+    if isinstance(v, bool):
+        return (4, v)
+    if isinstance(v, (int, float)):
+        return (1, v)
+    if isinstance(v, str):
+        return (2, v)
+    return (3, str(v))
+
+
+def evaluate(doc, e, variables=None):
+    variables = variables or {}
+    if isinstance(e, str) and e.startswith("$$"):
+        name, _, rest = e[2:].partition(".")
+        v = variables[name]
+        return get_path(v, rest) if rest else v
+    if isinstance(e, str) and e.startswith("$"):
+        return get_path(doc, e[1:])
+    if isinstance(e, list):
+        return [evaluate(doc, x, variables) for x in e]
+    if isinstance(e, dict) and len(e) == 1 and next(iter(e)).startswith("$"):
+        (op, args), = e.items()
+        if op == "$literal":
+            return args
+        ev = lambda x: evaluate(doc, x, variables)
+        vals = lambda: [ev(x) for x in (args if isinstance(args, list) else [args])]
+        none = lambda v: v is MISSING or v is None
+        if op in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte"):
+            a, b = (_cmp_key(v) for v in vals())
+            return {"$eq": a == b, "$ne": a != b, "$gt": a > b, "$gte": a >= b, "$lt": a < b, "$lte": a <= b}[op]
+        if op == "$and":
+            return all(vals())
+        if op == "$or":
+            return any(vals())
+        if op == "$not":
+            return not vals()[0]
+        if op == "$in":
+            v, arr = vals()
+            return v in arr
+        if op == "$ifNull":
+            *xs, fallback = vals()
+            return next((v for v in xs if not none(v)), fallback)
+        if op == "$cond":
+            if isinstance(args, dict):
+                args = [args["if"], args["then"], args["else"]]
+            return ev(args[1]) if ev(args[0]) else ev(args[2])
+        if op == "$arrayElemAt":
+            arr, i = vals()
+            return arr[i] if not none(arr) and -len(arr) <= i < len(arr) else MISSING
+        if op in ("$add", "$subtract", "$multiply", "$divide", "$round", "$toInt"):
+            xs = vals()
+            if any(none(v) for v in xs[:1 if op == "$round" else None]):
+                return None
+            if op == "$add":
+                return sum(xs)
+            if op == "$subtract":
+                return xs[0] - xs[1]
+            if op == "$multiply":
+                out = 1
+                for v in xs:
+                    out *= v
+                return out
+            if op == "$divide":
+                return xs[0] / xs[1]
+            if op == "$toInt":
+                return int(xs[0])
+            return round(xs[0], xs[1] if len(xs) > 1 else 0)
+        if op == "$size":
+            return len(vals()[0])
+        if op == "$concat":
+            xs = vals()
+            return None if any(none(v) for v in xs) else "".join(xs)
+        raise NotImplementedError(op)
+    if isinstance(e, dict):
+        # missing fields are left out of computed documents
+        out = {k: evaluate(doc, v, variables) for k, v in e.items()}
+        return {k: v for k, v in out.items() if v is not MISSING}
+    return e
+
+
+def _set_computed(doc, spec, variables):
+    for path, e in spec.items():
+        v = evaluate(doc, e, variables)
+        if v is MISSING:
+            unset_path(doc, path)
+        else:
+            set_path(doc, path, copy.deepcopy(v))
+
+
+def _project(doc, spec, variables):
+    if all(not v for k, v in spec.items() if k != "_id") and any(not v for v in spec.values()):
+        out = copy.deepcopy(doc)
+        for k in spec:
+            unset_path(out, k)
+        return out
+    out = {"_id": doc["_id"]} if spec.get("_id", 1) and "_id" in doc else {}
+    for k, v in spec.items():
+        if k == "_id" and v in (0, 1, True, False):
+            continue
+        val = get_path(doc, k) if v in (1, True) else evaluate(doc, v, variables)
+        if val is not MISSING:
+            set_path(out, k, copy.deepcopy(val))
+    return out
+
+
+def _accumulate(groups_docs, spec, variables):
+    out = []
+    for key, docs in groups_docs:
+        g = {"_id": key}
+        for field, acc in spec.items():
+            if field == "_id":
+                continue
+            (aop, e), = acc.items()
+            vals = [evaluate(d, e, variables) for d in docs]
+            nums = [v for v in vals if isinstance(v, (int, float)) and not isinstance(v, bool)]
+            if aop == "$sum":
+                g[field] = sum(nums)
+            elif aop == "$avg":
+                g[field] = sum(nums) / len(nums) if nums else None
+            elif aop in ("$max", "$min"):
+                present = [v for v in vals if v is not MISSING and v is not None]
+                g[field] = (max if aop == "$max" else min)(present, key=_cmp_key) if present else None
+            elif aop == "$first":
+                g[field] = vals[0] if vals else None
+            elif aop == "$push":
+                g[field] = [v for v in vals if v is not MISSING]
+            elif aop == "$addToSet":
+                g[field] = []
+                for v in vals:
+                    if v is not MISSING and v not in g[field]:
+                        g[field].append(v)
+            else:
+                raise NotImplementedError(aop)
+        out.append(g)
+    return out
+
+
+def run_stages(db, docs, pipeline, variables=None):
+    docs = [copy.deepcopy(d) for d in docs]
+    for st in pipeline:
+        (op, arg), = st.items()
+        if op == "$match":
+            docs = [d for d in docs if matches(d, arg, variables)]
+        elif op in ("$set", "$addFields"):
+            for d in docs:
+                _set_computed(d, arg, variables)
+        elif op == "$unset":
+            for d in docs:
+                for path in [arg] if isinstance(arg, str) else arg:
+                    unset_path(d, path)
+        elif op == "$project":
+            docs = [_project(d, arg, variables) for d in docs]
+        elif op == "$group":
+            groups = {}
+            for d in docs:
+                key = evaluate(d, arg["_id"], variables)
+                key = None if key is MISSING else key
+                groups.setdefault(repr(key), (key, []))[1].append(d)
+            docs = _accumulate(groups.values(), arg, variables)
+        elif op == "$lookup":
+            source = list(db[arg["from"]].docs.values())
+            for d in docs:
+                if "pipeline" in arg:
+                    inner = dict(variables or {})
+                    inner.update({k: evaluate(d, v, variables) for k, v in arg.get("let", {}).items()})
+                    found = run_stages(db, source, arg["pipeline"], inner)
+                else:
+                    local = get_path(d, arg["localField"])
+                    found = [copy.deepcopy(x) for x in source
+                             if _cmp_key(get_path(x, arg["foreignField"])) == _cmp_key(local)]
+                set_path(d, arg["as"], found)
+        elif op == "$unwind":
+            path = (arg if isinstance(arg, str) else arg["path"])[1:]
+            keep = isinstance(arg, dict) and arg.get("preserveNullAndEmptyArrays")
+            out = []
+            for d in docs:
+                arr = get_path(d, path)
+                if isinstance(arr, list) and arr:
+                    for x in arr:
+                        nd = copy.deepcopy(d)
+                        set_path(nd, path, x)
+                        out.append(nd)
+                elif keep:
+                    out.append(d)
+            docs = out
+        elif op == "$sort":
+            docs = FakeCursor(docs).sort(list(arg.items())).docs
+        elif op == "$skip":
+            docs = docs[arg:]
+        elif op == "$limit":
+            docs = docs[:arg]
+        elif op == "$count":
+            docs = [{arg: len(docs)}] if docs else []
+        elif op == "$merge":
+            target = db[arg["into"] if isinstance(arg, dict) else arg]
+            for d in docs:
+                target.docs[d["_id"]] = copy.deepcopy(d)
+            docs = []
+        else:
+            raise NotImplementedError(op)
+    return docs
+
+
+def _order(v):
+    # None/missing first, then numbers, then strings
+    if v is MISSING or v is None:
+        return (0, 0)
+    return (1, v) if isinstance(v, (int, float)) else (2, str(v))
+
+
+class FakeCollection:
+    def __init__(self, db, name):
+        self.database, self.name = db, name
+        self.docs = {}
+        self.indexes = {"_id_": {"key": [("_id", 1)]}}
+        self.log = []
+        self.lock = threading.RLock()  # the ETL pipeline writes from several threads
+
+    # reads
+    def find(self, flt=None, projection=None, sort=None):
+        with self.lock:
+            self.log.append(("find", flt))
+            out = FakeCursor([copy.deepcopy(d) for d in self.docs.values() if matches(d, flt)], projection)
+        return out.sort(sort) if sort else out
+
+    def find_one(self, flt=None, projection=None, sort=None):
+        res = self.find(flt, projection, sort)
+        return res[0] if res else None
+
+    def aggregate(self, pipeline, **kw):
+        return iter(run_stages(self.database, list(self.docs.values()), pipeline))
+
+    def count_documents(self, flt):
+        return len(self.find(flt))
+
+    def estimated_document_count(self):
+        return len(self.docs)
+
+    # writes
+    def insert_one(self, doc):
+        if doc["_id"] in self.docs:
+            raise KeyError(f"duplicate _id {doc['_id']}")
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+        self.log.append(("insert", doc["_id"]))
+        return Result(inserted_id=doc["_id"])
+
+    def insert_many(self, docs, ordered=True):
+        with self.lock:
+            for d in docs:
+                self.insert_one(d)
+        return Result(inserted_ids=[d["_id"] for d in docs])
+
+    def update_one(self, flt, update, upsert=False):
+        doc = next((d for d in self.docs.values() if matches(d, flt)), None)
+        self.log.append(("update", flt))
+        if doc is None:
+            if not upsert:
+                return Result(matched_count=0, modified_count=0, upserted_id=None)
+            doc = {k: v for k, v in flt.items() if not isinstance(v, dict)}
+            apply_update(doc, update)
+            if doc["_id"] in self.docs:
+                raise DuplicateKeyError(f"duplicate _id {doc['_id']}")
+            self.docs[doc["_id"]] = doc
+            return Result(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+        before = copy.deepcopy(doc)
+        apply_update(doc, update)
+        return Result(matched_count=1, modified_count=int(before != doc), upserted_id=None)
+
+    def update_many(self, flt, update, upsert=False):
+        n = 0
+        for d in [d for d in self.docs.values() if matches(d, flt)]:
+            apply_update(d, update)
+            n += 1
+        return Result(matched_count=n, modified_count=n)
+
+    def find_one_and_update(self, flt, update, projection=None, upsert=False, return_document=False):
+        doc = next((d for d in self.docs.values() if matches(d, flt)), None)
+        before = copy.deepcopy(doc) if doc is not None else None
+        self.update_one(flt, update, upsert=upsert)
+        after = next((d for d in self.docs.values() if matches(d, flt)), None)
+        out = after if return_document else before
+        return project(out, projection) if out is not None else None
+
+    def replace_one(self, flt, doc, upsert=False):
+        old = next((d for d in self.docs.values() if matches(d, flt)), None)
+        if old is None and not upsert:
+            return Result(matched_count=0)
+        if old is not None:
+            del self.docs[old["_id"]]
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+        return Result(matched_count=int(old is not None))
+
+    def delete_one(self, flt):
+        doc = next((d for d in self.docs.values() if matches(d, flt)), None)
+        if doc is not None:
+            del self.docs[doc["_id"]]
+        return Result(deleted_count=int(doc is not None))
+
+    def delete_many(self, flt):
+        gone = [k for k, d in self.docs.items() if matches(d, flt)]
+        for k in gone:
+            del self.docs[k]
+        self.log.append(("delete", flt))
+        return Result(deleted_count=len(gone))
+
+    def bulk_write(self, ops, ordered=True):
+        with self.lock:
+            return self._bulk_write(ops)
+
+    def _bulk_write(self, ops):
+        self.log.append(("bulk_write", len(ops)))
+        for op in ops:
+            doc = op._doc
+            if isinstance(doc, dict) and any(k.startswith("$") for k in doc):
+                self.update_one(op._filter, doc, upsert=bool(op._upsert))
+            else:
+                self.replace_one(op._filter, doc, upsert=bool(op._upsert))
+        return Result(bulk_api_result={})
+
+    # indexes / collection ops
+    def create_index(self, keys, name=None, **opts):
+        name = name or "_".join(f"{k}_{d}" for k, d in keys)
+        self.indexes[name] = {"key": list(keys), **opts}
+        return name
+
+    def create_indexes(self, models):
+        for m in models:
+            spec = m.document
+            self.indexes[spec["name"]] = {"key": list(spec["key"].items())}
+        return [m.document["name"] for m in models]
+
+    def index_information(self):
+        return copy.deepcopy(self.indexes)
+
+    def drop_index(self, name):
+        del self.indexes[name]
+
+    def rename(self, new_name, dropTarget=False):
+        db = self.database
+        if new_name in db.collections and not dropTarget:
+            raise KeyError(f"target {new_name} exists")
+        db.collections[new_name] = self
+        del db.collections[self.name]
+        self.name = new_name
+
+
+class FakeDB:
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(self, name)
+        return self.collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name):
+        return self[name]
+
+    def list_collection_names(self):
+        return [n for n, c in self.collections.items() if c.docs or len(c.indexes) > 1]
+
+    def drop_collection(self, name):
+        self.collections.pop(name, None)
+
+
+# pymysql-style connection over sqlite: dict rows, %s params, <=> as IS
+class SqliteCursor:
+    def __init__(self, db):
+        self.db, self.cur, self.description = db, None, None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        sql = sql.replace("%%", "%").replace("%s", "?").replace("<=>", "IS")
+        self.cur = self.db.execute(sql, tuple(params or ()))
+        self.description = self.cur.description
+        return self.cur.rowcount
+
+    def fetchone(self):
+        row = self.cur.fetchone()
+        return dict(zip([d[0] for d in self.description], row)) if row else None
+
+    def fetchall(self):
+        cols = [d[0] for d in self.description]
+        return [dict(zip(cols, r)) for r in self.cur.fetchall()]
+
+
+class SqliteConn:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, *args):
+        return SqliteCursor(self.db)
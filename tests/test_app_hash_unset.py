@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+
+import pytest
+
+import app
+from fakes import FakeDB
+
+
+class NoCursor:
+    def execute(self, *args):
+        pass
+
+    def fetchone(self):
+        return {"current_club_id": 1}
+
+
+@pytest.fixture
+def mdb(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(app, "mongo_db", db)
+
+    @contextmanager
+    def no_transaction():
+        yield NoCursor()
+
+    monkeypatch.setattr(app, "sql_transaction", no_transaction)
+    monkeypatch.setattr(app, "refresh_club_market_totals", lambda cur, ids: 0)
+    monkeypatch.setattr(app, "rerank_club_market", lambda bound: None)
+    monkeypatch.setattr(app, "run_sql", lambda *args, **kw: ([{"game_id": 10}], 0))
+    return db
+
+
+def test_player_update_drops_the_etl_hash_of_player_and_clubs(mdb):
+    # as left by etl_full.py: every doc carries the hash of its MySQL row
+    mdb.players.insert_one({"_id": 7, "name": "Old", "current_club_id": 1, "market_value_eur": 5, "_hash": "h"})
+    mdb.clubs.insert_many([{"_id": c, "club_id": c, "total_market_value_eur": 5 * (c == 1), "_hash": "h"}
+                           for c in (1, 2)])
+    res = app.app.test_client().post("/api/player/7/update", json={
+        "name": "New", "current_club_id": "2", "market_value_eur": "9"})
+    assert res.status_code == 200, res.get_json()
+    assert mdb.players.docs[7]["name"] == "New" and "_hash" not in mdb.players.docs[7]
+    assert mdb.clubs.docs[2]["total_market_value_eur"] == 9
+    assert all("_hash" not in d for d in mdb.clubs.docs.values())
+
+
+def test_event_delete_drops_the_etl_hash_of_the_game(mdb):
+    mdb.games.insert_one({"_id": 10, "events": [{"game_event_id": "a"}, {"game_event_id": "b"}], "_hash": "h"})
+    mdb.game_events.insert_one({"_id": "a", "game_id": 10, "_hash": "h"})
+    res = app.app.test_client().delete("/api/game-event/a")
+    assert res.status_code == 200, res.get_json()
+    assert mdb.games.docs[10]["events"] == [{"game_event_id": "b"}] and "_hash" not in mdb.games.docs[10]
+    assert "a" not in mdb.game_events.docs
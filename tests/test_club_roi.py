@@ -0,0 +1,129 @@
+import random
+
+import app
+from etl_full import transfer_roi_doc
+from fakes import FakeDB
+
+
+def seed(rnd):
+    db = FakeDB()
+    transfers, apps = [], []
+    for i in range(40):
+        transfers.append({
+            "_id": i,
+            "player_id": rnd.randint(1, 8),
+            "player_name": "p%d" % i,
+            "to": {"club_id": rnd.choice([1, 2])},
+            "transfer_date": "2020-0%d-01" % rnd.randint(1, 9),
+            "transfer_season": rnd.choice(["19/20", "20/21"]),
+            "transfer_fee": rnd.choice([0, None, 1000, 250000, 5000000]),
+            "market_value_in_eur": rnd.choice([None, 100000]),
+        })
+    for i in range(300):
+        apps.append({
+            "_id": "a%d" % i,
+            "player_id": rnd.randint(1, 8),
+            "date": "2020-%02d-15" % rnd.randint(1, 12),
+            # goals/assists may be missing on old docs and count as 0
+            "minutes_played": rnd.choice([None, 0, 45, 90]),
+            **({"goals": rnd.randint(0, 2)} if rnd.random() < 0.8 else {}),
+            **({"assists": rnd.randint(0, 1)} if rnd.random() < 0.8 else {}),
+        })
+    db.transfers.insert_many(transfers)
+    db.appearances.insert_many(apps)
+    app.mongo_refresh_transfer_roi(db, {})
+    return db, transfers, apps
+
+
+def expected_rows(transfers, apps, club_id, season=None):
+    rows = {}
+    for t in transfers:
+        if t["to"]["club_id"] != club_id or not t["transfer_fee"] or (season and t["transfer_season"] != season):
+            continue
+        post = [a for a in apps if a["player_id"] == t["player_id"] and a["date"] >= t["transfer_date"]]
+        minutes = sum(a["minutes_played"] or 0 for a in post)
+        contrib = sum(a.get("goals", 0) + a.get("assists", 0) for a in post)
+        rows[t["_id"]] = {
+            "_debug_apps": len(post),
+            "post_minutes": minutes,
+            "post_goals": sum(a.get("goals", 0) for a in post),
+            "post_assists": sum(a.get("assists", 0) for a in post),
+            "eur_per_minutes": round(t["transfer_fee"] / minutes, 2) if minutes else None,
+            "eur_per_contrib": round(t["transfer_fee"] / contrib, 2) if contrib else None,
+        }
+    return rows
+
+
+def test_mongo_club_roi_matches_per_transfer_totals(monkeypatch):
+    rnd = random.Random(22)
+    db, transfers, apps = seed(rnd)
+    monkeypatch.setattr(app, "mongo_db", db)
+    client = app.app.test_client()
+    for club_id in (1, 2):
+        for season in (None, "20/21"):
+            want = expected_rows(transfers, apps, club_id, season)
+            qs = {"club_id": club_id, "debug": "1", "sort_by": "post_minutes", "order": "asc"}
+            if season:
+                qs["season"] = season
+            rows = client.get("/api/mongo/club/roi", query_string=qs).get_json()["rows"]
+            assert len(rows) == len(want)
+            by_name = {r["player_name"]: r for r in rows}
+            for tid, exp in want.items():
+                got = by_name["p%d" % tid]
+                assert {k: got[k] for k in exp} == exp
+            assert [r["post_minutes"] for r in rows] == sorted(r["post_minutes"] for r in rows)
+
+
+def test_transfer_roi_refresh_after_appearance_write(monkeypatch):
+    rnd = random.Random(5)
+    db, transfers, apps = seed(rnd)
+    monkeypatch.setattr(app, "mongo_db", db)
+    # a late appearance for one player only changes that player's transfers
+    pid = transfers[0]["player_id"]
+    late = {"_id": "late", "player_id": pid, "date": "2021-01-01", "minutes_played": 90, "goals": 1, "assists": 0}
+    db.appearances.insert_one(late)
+    before = {d["_id"]: d for d in db.club_transfer_roi.find({})}
+    app.mongo_refresh_transfer_roi(db, {"player_id": pid})
+    after = {d["_id"]: d for d in db.club_transfer_roi.find({})}
+    for t in transfers:
+        b, a = before[t["_id"]], after[t["_id"]]
+        if t["player_id"] == pid:
+            assert a["post_minutes"] == b["post_minutes"] + 90 and a["post_goals"] == b["post_goals"] + 1
+        else:
+            a.pop("updated_at"), b.pop("updated_at")
+            assert a == b
+
+
+def test_mongo_club_roi_hides_apps_without_debug(monkeypatch):
+    db, _, _ = seed(random.Random(1))
+    monkeypatch.setattr(app, "mongo_db", db)
+    rows = app.app.test_client().get("/api/mongo/club/roi", query_string={"club_id": 1}).get_json()["rows"]
+    assert rows and all("post_apps" not in r and "_debug_apps" not in r and "_id" not in r for r in rows)
+    assert [r["post_minutes"] for r in rows] == sorted((r["post_minutes"] for r in rows), reverse=True)
+
+
+def roi_row(**kw):
+    r = dict(transfer_id=11, player_id=5, player_name="A", transfer_date="2020-07-01",
+             transfer_season="20/21", to_club_id=3, to_name="Club", transfer_fee=1000000.0,
+             market_value_in_eur=900000.0, post_apps=12, post_minutes=900, post_goals=3, post_assists=1)
+    r.update(kw)
+    return r
+
+
+def test_transfer_roi_doc():
+    doc = transfer_roi_doc(roi_row())
+    assert doc["_id"] == 11 and doc["to"] == {"club_id": 3, "name": "Club"}
+    assert doc["eur_per_minutes"] == 1111.11
+    assert doc["eur_per_contrib"] == 250000.0
+    assert isinstance(doc["updated_at"], int)
+
+
+def test_transfer_roi_doc_ratios_null_like_sql():
+    # NULLIF(fee, 0) / NULLIF(denominator, 0)
+    for kw in ({"transfer_fee": None}, {"transfer_fee": 0.0}):
+        doc = transfer_roi_doc(roi_row(**kw))
+        assert doc["eur_per_minutes"] is None and doc["eur_per_contrib"] is None
+    doc = transfer_roi_doc(roi_row(post_apps=0, post_minutes=0, post_goals=0, post_assists=0))
+    assert doc["eur_per_minutes"] is None and doc["eur_per_contrib"] is None
+    doc = transfer_roi_doc(roi_row(post_goals=0, post_assists=0))
+    assert doc["eur_per_minutes"] == 1111.11 and doc["eur_per_contrib"] is None
@@ -0,0 +1,35 @@
+import csv_to_mongo
+from csv_to_mongo import (read_csv, text, to_int, digits_int, signed_digits_int, to_decimal,
+                          card_count, mdy_date, match_time)
+
+
+def test_cleaning_rules_match_the_mysql_casts():
+    assert text("  x ") == "x" and text("   ") is None and text(None) is None
+    # CAST(... AS SIGNED) keeps the leading number and gives 0 for junk
+    assert (to_int(" 42 "), to_int("12abc"), to_int("abc"), to_int("")) == (42, 12, 0, None)
+    assert (digits_int("€1,500,000"), digits_int("-")) == (1500000, None)
+    assert (signed_digits_int(" -1.5m "), signed_digits_int("--"), signed_digits_int("")) == (-15, None, None)
+    assert (to_decimal("25.46", 1), to_decimal("n/a", 1), to_decimal(" ", 1)) == (25.5, 0.0, None)
+    assert type(to_decimal("25.0", 1)) is int and type(to_decimal("25.04", 1)) is int
+
+
+def test_card_counts_and_dates():
+    # NULLIF(TRIM(v),'0'): an explicit 0 becomes NULL, an empty value 0
+    assert (card_count("0"), card_count(""), card_count("3", hi=2), card_count("-1")) == (None, 0, 2, 0)
+    assert mdy_date("7/4/2021 00:00:00") == "2021-07-04"
+    assert mdy_date("13/40/2021") is None and mdy_date("") is None
+    assert (match_time("07:30:00 PM"), match_time(""), match_time("25:00")) == ("19:30", "00:00", "00:00")
+
+
+def test_read_csv_is_positional_like_load_data(tmp_path, monkeypatch):
+    monkeypatch.setattr(csv_to_mongo, "CSV_DIR", str(tmp_path))
+    (tmp_path / "competitions.csv").write_text(
+        'id,name,whatever\n'
+        'GB1,"Premier \\"League\\"",first_tier,England,extra\n'
+        'CL,Champions League\n', encoding="utf-8")
+    rows = list(read_csv("competitions"))
+    # header skipped, extra columns dropped, missing trailing columns NULL
+    assert rows == [
+        {"competition_id": "GB1", "name": 'Premier "League"', "type": "first_tier", "country_name": "England"},
+        {"competition_id": "CL", "name": "Champions League", "type": None, "country_name": None},
+    ]
@@ -0,0 +1,45 @@
+from datetime import date
+from decimal import Decimal
+
+from pymysql.constants import FIELD_TYPE
+
+from etl_full import row_converters, convert_rows, stream
+from test_etl_stream import FakeConn
+
+
+# cursor.description entries: (name, type_code, display_size, internal_size, precision, scale, null_ok)
+def col(name, type_code, scale=0):
+    return (name, type_code, None, None, None, scale, True)
+
+
+def test_row_converters_pick_by_column_type():
+    desc = [col("player_id", FIELD_TYPE.LONG), col("total", FIELD_TYPE.NEWDECIMAL),
+            col("avg", FIELD_TYPE.NEWDECIMAL, scale=2), col("dob", FIELD_TYPE.DATE),
+            col("name", FIELD_TYPE.VAR_STRING)]
+    assert [name for name, _ in row_converters(desc)] == ["total", "avg", "dob"]
+    assert row_converters(None) == []
+
+
+def test_convert_rows():
+    desc = [col("total", FIELD_TYPE.NEWDECIMAL), col("avg", FIELD_TYPE.DECIMAL, scale=2),
+            col("dob", FIELD_TYPE.DATE), col("name", FIELD_TYPE.VAR_STRING)]
+    rows = [{"total": Decimal("12"), "avg": Decimal("1.25"), "dob": date(2000, 2, 29), "name": "x"},
+            {"total": None, "avg": None, "dob": None, "name": None}]
+    out = convert_rows(rows, row_converters(desc))
+    assert out[0] == {"total": 12, "avg": 1.25, "dob": "2000-02-29", "name": "x"}
+    assert type(out[0]["total"]) is int and type(out[0]["avg"]) is float
+    assert out[1] == {"total": None, "avg": None, "dob": None, "name": None}
+
+
+def test_scaled_decimals_keep_whole_values_as_int():
+    # as sanitize() did: average_age DECIMAL(3,1) 25.0 is stored as 25
+    convs = row_converters([col("average_age", FIELD_TYPE.NEWDECIMAL, scale=1)])
+    rows = convert_rows([{"average_age": Decimal("25.0")}, {"average_age": Decimal("25.3")}], convs)
+    assert [type(r["average_age"]) for r in rows] == [int, float]
+    assert [r["average_age"] for r in rows] == [25, 25.3]
+
+
+def test_stream_converts_rows_with_the_query_converters():
+    desc = [col("goals", FIELD_TYPE.NEWDECIMAL), col("dob", FIELD_TYPE.DATE)]
+    conn = FakeConn([{"goals": Decimal("3"), "dob": date(1990, 1, 2)}, {"goals": None, "dob": None}], desc)
+    assert list(stream(conn, "SELECT ...")) == [{"goals": 3, "dob": "1990-01-02"}, {"goals": None, "dob": None}]
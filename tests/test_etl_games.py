@@ -0,0 +1,33 @@
+from etl_full import merge_game_events, game_doc
+
+
+def ev(game_id, event_id, minute):
+    return {"game_id": game_id, "game_event_id": event_id, "minute": minute}
+
+
+def test_merge_game_events_pairs_each_game_with_its_events():
+    games = [{"game_id": 1}, {"game_id": 3}, {"game_id": 4}, {"game_id": 7}]
+    # game 2 and 5 were dropped by the games joins; game 4 has no events
+    events = [ev(1, "a", 10), ev(1, "b", 50), ev(2, "c", 5), ev(3, "d", 1), ev(5, "e", 9), ev(7, "f", 90)]
+    out = [(g["game_id"], [e["game_event_id"] for e in evs]) for g, evs in merge_game_events(games, events)]
+    assert out == [(1, ["a", "b"]), (3, ["d"]), (4, []), (7, ["f"])]
+
+
+def test_merge_game_events_strips_the_join_key():
+    (_, evs), = merge_game_events([{"game_id": 1}], iter([ev(1, "a", 10)]))
+    assert evs == [{"game_event_id": "a", "minute": 10}]
+
+
+def test_merge_game_events_with_no_events():
+    assert [evs for _, evs in merge_game_events([{"game_id": 1}, {"game_id": 2}], [])] == [[], []]
+
+
+def test_game_doc():
+    g = {"game_id": 9, "date": "2020-01-01", "competition_id": "GB1", "competition_name": "PL",
+         "season": "2019", "round": "20", "home_club_id": 1, "home_name": "A", "home_club_goals": 2,
+         "home_club_formation": "4/4/2 ", "away_club_id": 2, "away_name": "B", "away_club_goals": 0,
+         "away_club_formation": None, "stadium": "S", "attendance": 100, "referee": "R"}
+    doc = game_doc(g, [{"game_event_id": "a"}])
+    assert doc["_id"] == 9 and doc["events"] == [{"game_event_id": "a"}]
+    assert doc["home"]["formation"] == "4-4-2" and doc["away"]["formation"] == ""
+    assert doc["home"]["club_id"] == 1 and doc["away"]["goals"] == 0
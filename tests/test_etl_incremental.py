@@ -0,0 +1,65 @@
+import pytest
+
+import etl_full
+from fakes import FakeDB
+
+
+@pytest.fixture
+def mdb(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(etl_full, "get_mdb", lambda: db)
+    return db
+
+
+def test_resolve_since(mdb):
+    assert etl_full.resolve_since("games", None) is None
+    # auto without a stored watermark falls back to a full rebuild
+    assert etl_full.resolve_since("games", "auto") is None
+    etl_full.save_watermark("games", {"ts": "2024-01-01 00:00:00", "max_id": 42})
+    assert etl_full.resolve_since("games", "auto") == {"ts": "2024-01-01 00:00:00", "max_id": 42}
+    assert etl_full.resolve_since("players", "auto") is None
+    assert etl_full.resolve_since("games", "2023-06-01") == {"ts": "2023-06-01", "max_id": None}
+
+
+def test_since_label():
+    assert etl_full.since_label(None) == ""
+    assert "2023-06-01" in etl_full.since_label({"ts": "2023-06-01", "max_id": None})
+
+
+def test_deletes_since_watermark_remove_docs(mdb, monkeypatch):
+    import sqlite3
+    from fakes import SqliteConn
+    db = sqlite3.connect(":memory:")
+    db.executescript("""
+      CREATE TABLE etl_deletes (id INTEGER PRIMARY KEY, tbl TEXT, row_id TEXT, game_id INT, player_id INT,
+                                club_id INT, competition_id TEXT, season TEXT, deleted_at INT);
+      INSERT INTO etl_deletes (tbl, row_id, game_id, deleted_at) VALUES
+        ('game', '1', 1, 5), ('game', '1', 1, 6), ('game', '2', 2, 0), ('game_events', 'ab', 3, 5);
+    """)
+    monkeypatch.setattr(etl_full, "get_sql", lambda: SqliteConn(db))
+    mdb.games.insert_many([{"_id": i} for i in (1, 2, 3)])
+    mdb.game_events.insert_many([{"_id": "ab", "game_id": 3}, {"_id": "cd", "game_id": 1}, {"_id": "ef", "game_id": 3}])
+    wm = {"ts": 1, "max_id": None}
+    assert etl_full.deleted_ids(wm, "game") == [1]
+    assert etl_full.delete_docs("games", etl_full.deleted_ids(wm, "game"), 1) == 1
+    assert etl_full.delete_docs("game_events", etl_full.deleted_ids(wm, "game"), 1, field="game_id") == 1
+    assert etl_full.delete_docs("game_events", etl_full.deleted_ids(wm, "game_events", str), 1) == 1
+    assert sorted(d["_id"] for d in mdb.games.find({})) == [2, 3]
+    assert [d["_id"] for d in mdb.game_events.find({})] == ["ef"]
+
+
+def test_prune_deletes_waits_for_every_watermark(mdb, monkeypatch):
+    import sqlite3
+    from fakes import SqliteConn
+    db = sqlite3.connect(":memory:")
+    db.executescript("""
+      CREATE TABLE etl_deletes (id INTEGER PRIMARY KEY, tbl TEXT, row_id TEXT, deleted_at INT);
+      INSERT INTO etl_deletes (tbl, row_id, deleted_at) VALUES ('game', '1', 3), ('game', '2', 5), ('game', '3', 9);
+    """)
+    monkeypatch.setattr(etl_full, "get_sql", lambda: SqliteConn(db))
+    for i, name in enumerate(etl_full.WATERMARKED[1:]):
+        etl_full.save_watermark(name, {"ts": 6 + i, "max_id": None})
+    assert etl_full.prune_deletes() == 0
+    etl_full.save_watermark("games", {"ts": 5, "max_id": None})
+    assert etl_full.prune_deletes() == 2
+    assert [r[0] for r in db.execute("SELECT row_id FROM etl_deletes")] == ["3"]
@@ -0,0 +1,65 @@
+import pytest
+from pymongo import IndexModel
+
+import etl_full
+from etl_full import INDEXES, index_name, ensure_indexes, indexes_before_load, indexes_after_load
+from fakes import FakeDB
+
+
+@pytest.fixture
+def mdb(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(etl_full, "get_mdb", lambda: db)
+    return db
+
+
+def spec_names(name):
+    return {index_name(keys) for keys, _, _ in INDEXES[name]}
+
+
+def test_index_name_matches_pymongo():
+    for specs in INDEXES.values():
+        for keys, opts, note in specs:
+            assert index_name(keys) == IndexModel(keys, **opts).document["name"]
+            assert note
+
+
+def test_ensure_indexes_skips_a_missing_appearances_collection(mdb):
+    ensure_indexes()
+    assert set(mdb.players.indexes) == {"_id_"} | spec_names("players")
+    assert "appearances" not in mdb.collections or set(mdb.appearances.indexes) == {"_id_"}
+    mdb.appearances.insert_one({"_id": "1_2"})
+    ensure_indexes(["appearances"])
+    assert set(mdb.appearances.indexes) == {"_id_"} | spec_names("appearances")
+
+
+def test_first_full_load_defers_secondary_indexes(mdb):
+    ensure_indexes(["players"])
+    assert indexes_before_load("players", True, False) is True
+    assert set(mdb.players.indexes) == {"_id_"}
+    indexes_after_load("players", True)
+    assert set(mdb.players.indexes) == {"_id_"} | spec_names("players")
+
+
+def test_loads_into_a_filled_collection_keep_their_indexes(mdb):
+    mdb.players.insert_one({"_id": 1})
+    assert indexes_before_load("players", True, False) is False
+    assert indexes_before_load("players", False, True) is False  # incremental ignores --defer-indexes
+    assert set(mdb.players.indexes) == {"_id_"} | spec_names("players")
+    assert indexes_before_load("players", True, True) is True
+    assert set(mdb.players.indexes) == {"_id_"}
+
+
+def test_stale_indexes_on_managed_collections_are_dropped(mdb):
+    # left behind by older versions of INDEXES
+    mdb.players.insert_one({"_id": 1})
+    mdb.players.create_index([("position", 1)])
+    mdb.appearances.insert_one({"_id": "1_2"})
+    mdb.appearances.create_index([("game_id", -1), ("date", -1)])
+    ensure_indexes()
+    assert set(mdb.players.indexes) == {"_id_"} | spec_names("players")
+    assert set(mdb.appearances.indexes) == {"_id_"} | spec_names("appearances")
+    # incremental loads too
+    mdb.players.create_index([("position", 1)])
+    assert indexes_before_load("players", False, False) is False
+    assert "position_1" not in mdb.players.indexes
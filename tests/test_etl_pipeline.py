@@ -0,0 +1,78 @@
+import itertools
+
+import pytest
+
+from etl_full import content_hash, run_pipeline
+from fakes import FakeDB
+
+
+def test_every_item_is_transformed_and_written_once():
+    coll = FakeDB().games
+    seen = []
+    stats = run_pipeline(coll, iter(range(1003)), lambda i: {"_id": i, "sq": i * i}, batch=100,
+                         before_write=lambda docs: seen.append(len(docs)))
+    assert sorted(coll.docs) == list(range(1003))
+    assert coll.docs[12] == {"_id": 12, "sq": 144, "_hash": content_hash({"_id": 12, "sq": 144})}
+    assert stats["read"] == stats["written"] == 1003 and stats["batches"] == 11
+    assert sorted(seen) == [3] + [100] * 10
+
+
+def test_reruns_upsert_instead_of_duplicating():
+    coll = FakeDB().games
+    coll.insert_one({"_id": 1, "sq": 0, "kept": True})
+    run_pipeline(coll, iter([1, 2]), lambda i: {"_id": i, "sq": i * i}, batch=10)
+    assert coll.docs[1]["sq"] == 1 and coll.docs[1]["kept"]
+
+
+def test_writer_error_stops_an_endless_source():
+    coll = FakeDB().games
+
+    def bulk_write(ops, ordered=True):
+        raise RuntimeError("mongo down")
+    coll.bulk_write = bulk_write
+    with pytest.raises(RuntimeError, match="mongo down"):
+        run_pipeline(coll, itertools.count(), lambda i: {"_id": i}, batch=10)
+
+
+def test_source_and_transform_errors_are_raised():
+    def source():
+        yield 1
+        raise ValueError("lost connection")
+    with pytest.raises(ValueError, match="lost connection"):
+        run_pipeline(FakeDB().games, source(), lambda i: {"_id": i}, batch=10)
+    with pytest.raises(KeyError):
+        run_pipeline(FakeDB().games, iter(range(50)), lambda i: {"_id": {}[i]}, batch=10)
+
+
+def test_content_hash_ignores_updated_at_and_key_order():
+    doc = {"_id": 1, "name": "A", "tags": [1, 2], "updated_at": 1}
+    assert content_hash(doc) == content_hash({"updated_at": 2, "tags": [1, 2], "name": "A", "_id": 1})
+    assert content_hash(doc) != content_hash({**doc, "tags": [2, 1]})
+
+
+def test_unchanged_docs_are_not_rewritten():
+    coll = FakeDB().games
+    transform = lambda i: {"_id": i, "v": i, "updated_at": 1}
+    run_pipeline(coll, iter(range(5)), transform, batch=10)
+    # doc 3 changed in MySQL, doc 5 is new; a newer updated_at alone is not a change
+    changed = lambda i: {**transform(i), "v": -3} if i == 3 else {**transform(i), "updated_at": 2}
+    stats = run_pipeline(coll, iter(range(6)), changed, batch=10)
+    assert (stats["new"], stats["changed"], stats["unchanged"], stats["written"]) == (1, 1, 4, 2)
+    assert coll.docs[3]["v"] == -3 and coll.docs[4]["updated_at"] == 1
+    # a doc without a stored hash (edited outside the ETL) is always rewritten
+    del coll.docs[4]["_hash"]
+    stats = run_pipeline(coll, iter(range(6)), changed, batch=10)
+    assert (stats["new"], stats["changed"], stats["unchanged"]) == (0, 1, 5)
+    assert coll.docs[4]["_hash"] == content_hash(transform(4))
+
+
+def test_force_rewrites_docs_with_matching_hashes():
+    coll = FakeDB().games
+    transform = lambda i: {"_id": i, "v": i}
+    run_pipeline(coll, iter(range(4)), transform, batch=10)
+    coll.docs[2]["v"] = "edited in Mongo"
+    stats = run_pipeline(coll, iter(range(4)), transform, batch=10)
+    assert stats["written"] == 0 and coll.docs[2]["v"] == "edited in Mongo"
+    stats = run_pipeline(coll, iter(range(5)), transform, batch=10, force=True)
+    assert (stats["new"], stats["changed"], stats["unchanged"], stats["written"]) == (1, 4, 0, 5)
+    assert coll.docs[2]["v"] == 2
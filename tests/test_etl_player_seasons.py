@@ -0,0 +1,137 @@
+import sqlite3
+from itertools import groupby
+
+import pytest
+
+from etl_full import CHANGED_PLAYER_SEASONS_JOIN, PLAYER_SEASONS_ORDER, PLAYER_SEASONS_SQL, player_season_doc
+
+
+# sqlite runs the window query as-is, apart from DATE_FORMAT and pymysql's %% escaping
+def sqlite_db():
+    db = sqlite3.connect(":memory:")
+    db.row_factory = sqlite3.Row
+    db.create_function("DATE_FORMAT", 2, lambda d, fmt: d)
+    db.executescript("""
+      CREATE TABLE club (club_id INTEGER PRIMARY KEY, name TEXT);
+      CREATE TABLE game (game_id INTEGER PRIMARY KEY, competition_id TEXT, season TEXT, date TEXT,
+                         home_club_id INT, away_club_id INT, home_club_goals INT, away_club_goals INT);
+      CREATE TABLE appearance (appearance_id TEXT PRIMARY KEY, game_id INT, player_id INT, player_club_id INT,
+                               minutes_played INT, goals INT, assists INT, yellow_cards INT, red_cards INT);
+      INSERT INTO club VALUES (1, 'A'), (2, 'B');
+    """)
+    return db
+
+
+def query(db, sql, args=()):
+    sql = sql.replace("%%", "%").replace("%s", "?").replace("<=>", "IS")
+    return [dict(r) for r in db.execute(sql, args)]
+
+
+def add_games(db, player_id, competition_id, season, n, first_game_id, club_id=1):
+    for i in range(n):
+        gid = first_game_id + i
+        # away club 3 has no club row: the match still counts, with a NULL name
+        db.execute("INSERT INTO game VALUES (?, ?, ?, ?, 1, ?, 1, 0)",
+                   (gid, competition_id, season, f"2020-01-{i + 1:02d}", 2 if i % 2 else 3))
+        db.execute("INSERT INTO appearance VALUES (?, ?, ?, ?, 90, ?, 1, 0, 0)",
+                   (f"{gid}_{player_id}", gid, player_id, club_id, i % 2))
+
+
+def ps_sql(changed=""):
+    return PLAYER_SEASONS_SQL.format(changed=changed, resume="", order=PLAYER_SEASONS_ORDER)
+
+
+def docs(db, sql=ps_sql(), args=()):
+    rows = query(db, sql, args)
+    return [player_season_doc(key, list(group)) for key, group in
+            groupby(rows, key=lambda r: (r["player_id"], r["competition_id"], r["season"]))]
+
+
+@pytest.fixture
+def db():
+    db = sqlite_db()
+    add_games(db, 7, "GB1", "2019", 12, 100)
+    add_games(db, 7, "CL", "2019", 2, 200)
+    add_games(db, 8, "GB1", "2019", 1, 300)
+    return db
+
+
+def test_one_doc_per_group_with_totals_over_all_matches(db):
+    out = {d["_id"]: d for d in docs(db)}
+    assert sorted(out) == ["7_CL_2019", "7_GB1_2019", "8_GB1_2019"]
+    t = out["7_GB1_2019"]["totals"]
+    assert (t["apps"], t["minutes"], t["goals"], t["assists"]) == (12, 1080, 6, 12)
+    assert t["ga_per90"] == round(18 * 90 / 1080, 3)
+
+
+def test_latest_matches_are_the_ten_most_recent(db):
+    out = {d["_id"]: d for d in docs(db)}
+    latest = out["7_GB1_2019"]["latest_matches"]
+    assert [m["date"] for m in latest] == [f"2020-01-{d:02d}" for d in range(12, 2, -1)]
+    assert latest[0]["away_name"] == "B" and latest[1]["away_name"] is None
+    assert len(out["7_CL_2019"]["latest_matches"]) == 2
+
+
+ETL_DELETES = """
+  CREATE TABLE etl_deletes (id INTEGER PRIMARY KEY, tbl TEXT, row_id TEXT, game_id INT, player_id INT,
+                            club_id INT, competition_id TEXT, season TEXT, deleted_at INT);
+"""
+
+
+def incremental(db):
+    db.executescript("""
+      ALTER TABLE game ADD COLUMN updated_at INT DEFAULT 0;
+      ALTER TABLE appearance ADD COLUMN updated_at INT DEFAULT 0;
+      ALTER TABLE club ADD COLUMN updated_at INT DEFAULT 0;
+    """ + ETL_DELETES)
+
+
+def test_incremental_join_recomputes_whole_touched_groups(db):
+    incremental(db)
+    db.executescript("""
+      UPDATE appearance SET updated_at = 5 WHERE appearance_id = '105_7';
+      -- a group with a NULL season must still match its etl_deletes entry
+      INSERT INTO game VALUES (400, 'CL', NULL, '2020-02-01', 1, 2, 0, 0, 0);
+      INSERT INTO appearance VALUES ('400_8', 400, 8, 1, 90, 0, 0, 0, 0, 0);
+      INSERT INTO etl_deletes (tbl, row_id, player_id, competition_id, season, deleted_at)
+      VALUES ('appearance', '401_8', 8, 'CL', NULL, 5);
+    """)
+    changed = docs(db, ps_sql(CHANGED_PLAYER_SEASONS_JOIN), (1,) * 4)
+    assert sorted(d["_id"] for d in changed) == ["7_GB1_2019", "8_CL_None"]
+    # the whole group is re-read, not just the changed appearance
+    assert next(d for d in changed if d["player_id"] == 7)["totals"]["apps"] == 12
+
+    db.execute("UPDATE game SET updated_at = 5 WHERE game_id = 200")
+    changed = docs(db, ps_sql(CHANGED_PLAYER_SEASONS_JOIN), (1,) * 4)
+    assert "7_CL_2019" in {d["_id"] for d in changed}
+
+
+def test_incremental_join_picks_up_renamed_clubs(db):
+    incremental(db)
+    # club 2 only plays in player 7's GB1 games (every other match)
+    db.execute("UPDATE club SET name = 'B2', updated_at = 5 WHERE club_id = 2")
+    changed = docs(db, ps_sql(CHANGED_PLAYER_SEASONS_JOIN), (1,) * 4)
+    assert sorted(d["_id"] for d in changed) == ["7_CL_2019", "7_GB1_2019"]
+    assert "B2" in {m["away_name"] for m in changed[1]["latest_matches"]}
+
+
+def test_sweep_only_removes_emptied_groups_from_the_log(db, monkeypatch):
+    import etl_full
+    from fakes import SqliteConn
+    incremental(db)
+    monkeypatch.setattr(etl_full, "get_sql", lambda: SqliteConn(db))
+    db.executescript("""
+      -- player 8 lost his only GB1 appearance; player 7 moved one CL game to 2020
+      DELETE FROM appearance WHERE appearance_id = '300_8';
+      INSERT INTO etl_deletes (tbl, row_id, player_id, competition_id, season, deleted_at)
+      VALUES ('appearance', '300_8', 8, 'GB1', '2019', 5);
+      UPDATE game SET season = '2020' WHERE game_id = 200;
+      INSERT INTO etl_deletes (tbl, player_id, competition_id, season, deleted_at)
+      VALUES ('player_season', 7, 'CL', '2019', 5);
+      -- older than the watermark: already applied
+      INSERT INTO etl_deletes (tbl, row_id, player_id, competition_id, season, deleted_at)
+      VALUES ('appearance', 'x', 9, 'GB1', '2019', 0);
+    """)
+    assert etl_full.sweep_player_seasons({"ts": 1}) == ["8_GB1_2019"]
+    db.execute("UPDATE game SET season = '2020' WHERE game_id = 201")
+    assert etl_full.sweep_player_seasons({"ts": 1}) == ["7_CL_2019", "8_GB1_2019"]
@@ -0,0 +1,38 @@
+import pytest
+
+import etl_full
+from etl_full import SHADOW_SUFFIX, load_target, run_pipeline, swap_in
+from fakes import FakeDB
+
+
+@pytest.fixture
+def mdb(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(etl_full, "get_mdb", lambda: db)
+    return db
+
+
+def test_load_target_uses_a_fresh_shadow_only_for_rebuilds(mdb):
+    mdb.players.insert_one({"_id": 1})
+    mdb["players" + SHADOW_SUFFIX].insert_one({"_id": "left over"})
+    assert load_target("players", False) is mdb.players
+    shadow = load_target("players", True)
+    assert shadow.name == "players" + SHADOW_SUFFIX and shadow.docs == {}
+    assert mdb.players.docs == {1: {"_id": 1}}
+
+
+def test_swap_in_indexes_the_shadow_and_replaces_the_live_collection(mdb):
+    mdb.players.insert_many([{"_id": 1, "name": "old"}, {"_id": 2, "name": "gone"}])
+    shadow = load_target("players", True)
+    stats = run_pipeline(shadow, iter([1, 3]), lambda i: {"_id": i, "name": "new"}, batch=10, insert=True)
+    assert stats["written"] == 2 and ("insert", 1) in shadow.log
+    # the live collection is untouched until the swap
+    assert mdb.players.docs[1]["name"] == "old"
+
+    swap_in("players")
+    live = mdb.players
+    assert live is shadow and live.name == "players"
+    assert sorted(live.docs) == [1, 3] and live.docs[1]["name"] == "new"
+    assert "players" + SHADOW_SUFFIX not in mdb.list_collection_names()
+    # secondary indexes were built on the shadow before it went live
+    assert len(live.indexes) == 1 + len(etl_full.INDEXES["players"])
@@ -0,0 +1,104 @@
+import random
+import sqlite3
+import time
+
+import pytest
+
+import etl_full
+from etl_full import (run_pipeline, checkpointer, start_run, find_resumable_run, finish_run,
+                      resume_state, begin_stage, end_stage, resume_label,
+                      PLAYER_SEASONS_ORDER, player_season_resume_args)
+from fakes import FakeDB
+
+
+@pytest.fixture
+def mdb(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(etl_full, "get_mdb", lambda: db)
+    return db
+
+
+class SlowColl:
+    """Writers finish their batches out of order; optionally fail on one item."""
+    name = "slow"
+
+    def __init__(self, fail_on=None):
+        self.written, self.fail_on = set(), fail_on
+
+    def find(self, flt, projection=None):
+        return []
+
+    def bulk_write(self, ops, ordered=True):
+        time.sleep(random.random() * 0.01)
+        ids = [op._filter["_id"] for op in ops]
+        if self.fail_on in ids:
+            raise RuntimeError("write failed")
+        self.written.update(ids)
+
+
+def test_checkpoints_only_cover_contiguously_written_batches():
+    random.seed(1)
+    coll, seen = SlowColl(), []
+
+    def on_checkpoint(last, batches, rows):
+        # everything up to the checkpointed key is already in Mongo
+        assert set(range(last + 1)) <= coll.written
+        seen.append((last, batches, rows))
+    run_pipeline(coll, iter(range(500)), lambda i: {"_id": i}, batch=10, key=lambda i: i,
+                 on_checkpoint=on_checkpoint)
+    assert [s[0] for s in seen] == sorted(s[0] for s in seen)
+    assert seen[-1] == (499, 50, 500)
+
+
+def test_failed_batch_holds_the_checkpoint_back():
+    random.seed(2)
+    coll, seen = SlowColl(fail_on=255), []
+    with pytest.raises(RuntimeError):
+        run_pipeline(coll, iter(range(500)), lambda i: {"_id": i}, batch=10, key=lambda i: i,
+                     on_checkpoint=lambda last, b, r: seen.append(last))
+    assert all(last < 250 for last in seen)
+
+
+def test_run_and_stage_checkpoints(mdb):
+    assert find_resumable_run() is None
+    run_id = start_run({"since": None})
+    assert find_resumable_run()["_id"] == run_id
+    begin_stage(run_id, "players", {"ts": "t0", "max_id": 9})
+    save = checkpointer(run_id, "players", {})
+    save(41, 2, 4000)
+    ck = resume_state(run_id, "players")
+    assert (ck["status"], ck["mark"], ck["last_key"], ck["rows"]) == ("running", {"ts": "t0", "max_id": 9}, 41, 4000)
+    assert "resuming after 41" in resume_label(ck)
+
+    # a resumed stage keeps counting from its checkpoint; tuple keys are stored as lists
+    checkpointer(run_id, "players", ck)((7, "GB1", "2020"), 1, 10)
+    ck = resume_state(run_id, "players")
+    assert (ck["last_key"], ck["batches"], ck["rows"]) == ([7, "GB1", "2020"], 3, 4010)
+    end_stage(run_id, "players")
+    assert resume_state(run_id, "players")["status"] == "done"
+    assert resume_state(None, "players") == {} and checkpointer(None, "players", {}) is None
+
+    finish_run(run_id, {})
+    assert find_resumable_run() is None
+    # only the latest run counts
+    started = mdb.etl_runs.docs[run_id]["started_at"]
+    mdb.etl_runs.insert_one({"_id": "older", "status": "failed", "started_at": started - 10})
+    assert find_resumable_run() is None
+    mdb.etl_runs.insert_one({"_id": "newer", "status": "running", "started_at": started + 10})
+    finish_run("newer", {"clubs": "boom"})
+    assert find_resumable_run()["_id"] == "newer"
+
+
+def test_player_season_resume_args_follow_the_stream_order():
+    # sqlite evaluates the same ORDER BY and row-value comparison as MySQL
+    keys = [(1, None, None), (1, None, "2019"), (1, "", "2019"), (1, "GB1", None), (1, "GB1", ""),
+            (1, "GB1", "2019"), (1, "GB1", "2020"), (2, None, "2019"), (2, "ES1", "2018"), (10, "CL", None)]
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE x (player_id INTEGER, competition_id TEXT, season TEXT)")
+    db.executemany("INSERT INTO x VALUES (?, ?, ?)", keys[::-1])
+    streamed = db.execute(f"SELECT player_id, competition_id, season FROM x ORDER BY {PLAYER_SEASONS_ORDER}").fetchall()
+    assert len(set(streamed)) == len(keys)
+    for i, key in enumerate(streamed):
+        rest = db.execute(f"SELECT player_id, competition_id, season FROM x WHERE ({PLAYER_SEASONS_ORDER}) > (?, ?, ?, ?, ?) "
+                          f"ORDER BY {PLAYER_SEASONS_ORDER}", player_season_resume_args(key)).fetchall()
+        assert rest == streamed[i + 1:], key
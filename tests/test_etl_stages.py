@@ -0,0 +1,27 @@
+import etl_full
+from etl_full import STAGES, INCREMENTAL_DEPS, stage_deps
+
+
+def test_stage_deps_run_before_their_dependents():
+    # --workers 1 runs the stages in STAGES order, so every dependency must come first
+    order = list(STAGES)
+    for name in order:
+        for since in (None, "auto"):
+            for dep in stage_deps(name, order, since):
+                assert dep in STAGES and order.index(dep) < order.index(name), (name, dep)
+    assert set(INCREMENTAL_DEPS) <= set(STAGES)
+
+
+def test_stage_deps_incremental_and_selection():
+    assert stage_deps("clubs", list(STAGES), None) == ()
+    assert stage_deps("clubs", list(STAGES), "auto") == ("players",)
+    # a dependency that was not selected is not waited for
+    assert stage_deps("clubs", ["clubs"], "auto") == ()
+
+
+def test_single_worker_runs_stages_in_order(monkeypatch):
+    ran = []
+    stages = {name: (lambda name=name, **kw: ran.append((name, kw)), deps) for name, (_, deps) in STAGES.items()}
+    monkeypatch.setattr(etl_full, "STAGES", stages)
+    assert etl_full.run_stages(["players", "clubs"], 1, since="auto") == {}
+    assert ran == [("players", {"since": "auto"}), ("clubs", {"since": "auto"})]
@@ -0,0 +1,73 @@
+import time
+
+import pymysql
+import pytest
+
+import etl_full
+from etl_full import stream, stage
+
+
+class FakeSSCursor:
+    def __init__(self, rows, log, description=None):
+        self.rows, self.log, self.description = list(rows), log, description
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.log.append("closed")
+
+    def execute(self, q, args=()):
+        self.log.append(("execute", q, tuple(args)))
+
+    def fetchmany(self, n):
+        self.log.append(("fetchmany", n))
+        out, self.rows = self.rows[:n], self.rows[n:]
+        return out
+
+
+class FakeConn:
+    def __init__(self, rows, description=None):
+        self.rows, self.log, self.description = rows, [], description
+
+    def cursor(self, cls=None):
+        self.log.append(("cursor", cls))
+        return FakeSSCursor(self.rows, self.log, self.description)
+
+
+def test_stream_reads_in_chunks_on_a_server_side_cursor():
+    conn = FakeConn([{"id": i} for i in range(5)])
+    rows = stream(conn, "SELECT id FROM t WHERE x > %s", [1], chunk=2)
+    assert conn.log == []  # nothing runs until the first row is pulled
+    assert next(rows) == {"id": 0}
+    assert conn.log[:3] == [("cursor", pymysql.cursors.SSDictCursor),
+                            ("execute", "SELECT id FROM t WHERE x > %s", (1,)), ("fetchmany", 2)]
+    assert [r["id"] for r in rows] == [1, 2, 3, 4]
+    assert [e for e in conn.log if e[0] == "fetchmany"] == [("fetchmany", 2)] * 4
+    assert conn.log[-1] == "closed"
+
+
+def test_stage_reports_time_and_peak_rss():
+    @stage
+    def big():
+        blob = bytearray(64 * 2**20)
+        blob[::4096] = b"x" * len(blob[::4096])  # touch every page
+        time.sleep(0.5)  # held across a couple of 0.2s samples, freed before the end sample
+        return len(blob)
+
+    before = len(etl_full.STAGE_REPORT)
+    assert big() == 64 * 2**20
+    entry = etl_full.STAGE_REPORT[-1]
+    assert len(etl_full.STAGE_REPORT) == before + 1 and entry["stage"] == "big"
+    if entry["start_rss_mb"] is not None:
+        assert entry["peak_rss_mb"] >= entry["start_rss_mb"] + 48
+
+
+def test_stage_reports_failed_stages_too():
+    @stage
+    def broken():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        broken()
+    assert etl_full.STAGE_REPORT[-1]["stage"] == "broken"
@@ -0,0 +1,74 @@
+import pytest
+
+import app
+from etl_full import game_event_doc
+from fakes import FakeDB
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = FakeDB()
+    minutes = [12, None, 45, 12, 90, 3, None, 45, 12, 67]
+    db.game_events.insert_many([
+        game_event_doc({"game_event_id": "e%02d" % i, "game_id": 1 + i % 2, "minute": m,
+                        "type": "Goals" if i % 3 else "Cards", "player_id": i, "player_name": "p%d" % i})
+        for i, m in enumerate(minutes)])
+    monkeypatch.setattr(app, "mongo_db", db)
+    app._count_cache.clear()
+    yield app.app.test_client()
+    app._count_cache.clear()
+
+
+def expected(db_filter=lambda d: True):
+    minutes = [12, None, 45, 12, 90, 3, None, 45, 12, 67]
+    ids = [("e%02d" % i, m) for i, m in enumerate(minutes) if db_filter(i)]
+    # MongoDB orders NULL lowest, ties broken by _id
+    return [i for i, m in sorted(ids, key=lambda x: (x[1] is not None, x[1] or 0, x[0]))]
+
+
+def page_through(client, **qs):
+    seen, after = [], None
+    while True:
+        body = client.get("/api/mongo/game-events/list",
+                          query_string={"page_size": 3, **qs, **({"after": after} if after else {})}).get_json()
+        assert all("_id" not in r and "updated_at" not in r for r in body["rows"])
+        seen += [r["game_event_id"] for r in body["rows"]]
+        after = body["next_after"]
+        if not after:
+            return seen, body["total"]
+
+
+def test_game_event_doc_shape():
+    doc = game_event_doc({"game_event_id": "abc", "game_id": 7, "minute": 12, "type": "Goals",
+                          "club_id": 3, "club_name": "Club"})
+    assert doc["_id"] == doc["game_event_id"] == "abc"
+    assert doc["club_name"] == "Club" and doc["player_name"] is None
+    assert isinstance(doc["updated_at"], int)
+
+
+def test_keyset_pages_cover_every_event_once(client):
+    seen, total = page_through(client)
+    assert seen == expected() and total == 10
+
+
+def test_filters_by_game_and_type(client):
+    seen, total = page_through(client, game_id="2", type="Goals")
+    assert seen == expected(lambda i: i % 2 == 1 and i % 3) and total == len(seen)
+    # unknown types are ignored rather than matching nothing
+    assert page_through(client, type="Nope")[0] == expected()
+
+
+def test_skip_paging_matches_keyset(client):
+    rows = []
+    for page in (1, 2, 3, 4):
+        body = client.get("/api/mongo/game-events/list", query_string={"page": page, "page_size": 3}).get_json()
+        rows += [r["game_event_id"] for r in body["rows"]]
+    assert rows == expected()
+
+
+def test_bad_params_and_single_lookup(client):
+    assert client.get("/api/mongo/game-events/list", query_string={"game_id": "x"}).status_code == 400
+    assert client.get("/api/mongo/game-events/list", query_string={"after": "junk"}).status_code == 400
+    row = client.get("/api/mongo/game-event/e04").get_json()["row"]
+    assert row["minute"] == 90 and "_id" not in row
+    assert client.get("/api/mongo/game-event/missing").status_code == 404
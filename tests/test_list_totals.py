@@ -0,0 +1,86 @@
+import pytest
+from flask import Response
+
+import app
+from app import list_total, invalidate_counts
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    app._count_cache.clear()
+    app._count_gen.clear()
+    yield
+    app._count_cache.clear()
+    app._count_gen.clear()
+
+
+def counter(total=42):
+    calls = []
+    def count():
+        calls.append(1)
+        return total
+    return count, calls
+
+
+def test_filtered_counts_are_cached_per_normalized_filter():
+    count, calls = counter()
+    assert list_total("sql", "player", {"search": " Messi "}, count) == (42, False)
+    assert list_total("sql", "player", {"search": "messi", "page": ""}, count) == (42, False)
+    assert len(calls) == 1
+    # other backends and filters count on their own
+    list_total("mongo", "player", {"search": "messi"}, count)
+    list_total("sql", "player", {"search": "ronaldo"}, count)
+    assert len(calls) == 3
+
+
+def test_unfiltered_totals_use_the_estimate(monkeypatch):
+    count, calls = counter()
+    assert list_total("sql", "game", {"date": "", "season": None}, count, lambda: 74000) == (74000, True)
+    assert calls == []
+    monkeypatch.setattr(app, "COUNT_ESTIMATE_UNFILTERED", False)
+    assert list_total("sql", "game", {}, count, lambda: 74000) == (42, False)
+
+
+def test_expired_entries_are_recounted(monkeypatch):
+    count, calls = counter()
+    monkeypatch.setattr(app, "COUNT_CACHE_TTL", -1)
+    list_total("sql", "club", {"search": "a"}, count)
+    list_total("sql", "club", {"search": "a"}, count)
+    assert len(calls) == 2
+
+
+def test_writes_drop_the_affected_tables_only():
+    count, calls = counter()
+    list_total("sql", "transfer", {"search": "a"}, count)
+    list_total("mongo", "game", {"season": "2020"}, count)
+    invalidate_counts("transfer")
+    list_total("sql", "transfer", {"search": "a"}, count)
+    list_total("mongo", "game", {"season": "2020"}, count)
+    assert len(calls) == 3
+
+
+def test_a_count_racing_a_write_is_not_cached():
+    calls = []
+    def count():
+        calls.append(1)
+        invalidate_counts("appearance")  # a write commits while the COUNT runs
+        return 1
+    list_total("sql", "appearance", {"search": "x"}, count)
+    list_total("sql", "appearance", {"search": "x"}, count)
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("method, path, status, dropped", [
+    ("DELETE", "/api/transfer/5", 200, {"transfer"}),
+    ("POST", "/api/mongo/player", 200, {"player", "appearance", "transfer"}),
+    ("POST", "/api/player/7/update", 200, {"player", "appearance", "transfer"}),
+    ("DELETE", "/api/transfer/5", 500, set()),
+    ("GET", "/api/transfer/5", 200, set()),
+])
+def test_write_endpoints_invalidate_their_lists(method, path, status, dropped):
+    for table in ("player", "club", "game", "appearance", "transfer"):
+        app._count_cache[("sql", table, ())] = (1, 0)
+    with app.app.test_request_context(path, method=method):
+        app._invalidate_list_counts(Response(status=status))
+    remaining = {k[1] for k in app._count_cache}
+    assert remaining == {"player", "club", "game", "appearance", "transfer"} - dropped
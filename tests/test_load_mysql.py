@@ -0,0 +1,97 @@
+import os
+
+import load_mysql
+from load_mysql import split_statements, parse_setup, insert_deps, split_csv, load_chunk
+
+SETUP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "football_db_setup_loading.sql")
+
+
+def test_split_statements_respects_quotes_and_comments():
+    text = ("-- a comment; with a semicolon\n"
+            "INSERT INTO t VALUES ('a;b', \"c\\\";d\");\n"
+            "  SELECT `x;y` FROM t  ;\n"
+            "SELECT 1")
+    assert split_statements(text) == ["INSERT INTO t VALUES ('a;b', \"c\\\";d\")", "SELECT `x;y` FROM t", "SELECT 1"]
+
+
+def test_parse_setup_reads_the_real_script():
+    setup = parse_setup(SETUP)
+    loads = {l["table"]: l["file"] for l in setup["loads"]}
+    assert loads["stg_club"] == "clubs.csv" and loads["competition"] == "competitions.csv"
+    assert {"club", "player", "game", "appearance", "transfer"} <= set(setup["inserts"])
+    # every INSERT ... SELECT waits for the tables it joins or references, never for itself
+    assert insert_deps(setup, "club") == ()
+    assert insert_deps(setup, "appearance") == ("club", "game", "player")
+    assert insert_deps(setup, "player_bio") == ("player",)
+
+
+def test_split_csv_cuts_records_outside_quotes(tmp_path):
+    src = tmp_path / "events.csv"
+    src.write_text('id,desc\n1,"one"\n2,"two\nlines"\n3,"say \\"hi\\""\n4,four\n5,five\n', encoding="utf-8")
+    chunks = list(split_csv(str(src), 2, str(tmp_path)))
+    parts = [open(c, encoding="utf-8").read() for c in chunks]
+    assert parts == ['1,"one"\n2,"two\nlines"\n', '3,"say \\"hi\\""\n4,four\n', "5,five\n"]
+    assert [os.path.basename(c) for c in chunks] == ["events.0000.csv", "events.0001.csv", "events.0002.csv"]
+
+
+def test_load_chunk_points_the_load_at_the_chunk(tmp_path, monkeypatch):
+    ran = []
+    monkeypatch.setattr(load_mysql, "execute", lambda sql: ran.append(sql) or 7)
+    chunk = tmp_path / "clubs.0003.csv"
+    chunk.write_text("x\n")
+    load = next(l for l in parse_setup(SETUP)["loads"] if l["table"] == "stg_club")
+    rows, _ = load_chunk(load, str(chunk))
+    assert rows == 7 and not chunk.exists()
+    assert f"INFILE '{chunk}'" in ran[0] and "Users" not in ran[0]
+    assert "IGNORE 0 LINES" in ran[0] and "INTO TABLE stg_club" in ran[0]
+
+
+SUMMARY = os.path.join(os.path.dirname(SETUP), "football_db_summary_tables.sql")
+
+
+def test_split_statements_keeps_trigger_bodies_whole():
+    text = ("DROP TRIGGER IF EXISTS t1;\n"
+            "DELIMITER $$\n"
+            "CREATE TRIGGER t1 AFTER INSERT ON x\nFOR EACH ROW\nBEGIN\n  UPDATE y SET n = ';';\n  DELETE FROM z;\nEND$$\n"
+            "DELIMITER ;\n"
+            "SELECT 1;")
+    assert split_statements(text) == [
+        "DROP TRIGGER IF EXISTS t1",
+        "CREATE TRIGGER t1 AFTER INSERT ON x\nFOR EACH ROW\nBEGIN\n  UPDATE y SET n = ';';\n  DELETE FROM z;\nEND",
+        "SELECT 1",
+    ]
+
+
+def test_parse_summaries_reads_the_real_script():
+    summary = load_mysql.parse_summaries(SUMMARY)
+    assert summary["tables"] == ["club_transfer_roi", "player_season_stats", "club_market_totals"]
+    assert {"trg_transfer_roi_ins", "trg_app_roi_ins"} <= set(summary["triggers"])
+    assert sum(s.startswith("CREATE TRIGGER") for s in summary["stmts"]) == len(summary["triggers"])
+
+
+def test_summaries_are_suspended_for_the_load_and_rebuilt_once(monkeypatch):
+    summary = load_mysql.parse_summaries(SUMMARY)
+    ran = []
+    monkeypatch.setattr(load_mysql, "execute", lambda sql: ran.append(sql) or 3)
+    # summary script never run: nothing to do
+    monkeypatch.setattr(load_mysql, "existing", lambda kind, names: [])
+    assert load_mysql.suspend_summaries(summary, True) is False and ran == []
+
+    monkeypatch.setattr(load_mysql, "existing", lambda kind, names: sorted(names))
+    assert load_mysql.suspend_summaries(summary, False) is True
+    assert ran == [f"DROP TRIGGER IF EXISTS {t}" for t in sorted(summary["triggers"])]
+    ran.clear()
+    # --truncate also empties the summary tables (TRUNCATE fires no triggers)
+    load_mysql.suspend_summaries(summary, True)
+    assert [s for s in ran if s.startswith("TRUNCATE")] == \
+        [f"TRUNCATE TABLE {t}" for t in sorted(summary["tables"])]
+
+    ran.clear()
+    load_mysql.REPORT.clear()
+    load_mysql.rebuild_summaries(summary)
+    assert ran == summary["stmts"]
+    # every table is filled by one INSERT ... SELECT before its triggers come back
+    assert [e["table"] for e in load_mysql.REPORT if e["phase"] == "summary"] == summary["tables"]
+    assert ran.index(next(s for s in ran if s.startswith("INSERT INTO club_transfer_roi"))) < \
+        ran.index(next(s for s in ran if s.startswith("CREATE TRIGGER trg_app_roi_ins")))
+    load_mysql.REPORT.clear()
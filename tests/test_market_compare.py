@@ -0,0 +1,56 @@
+from datetime import date
+
+import pytest
+
+from app import age_dob_bounds
+
+
+def age_on(dob, today):
+    # TIMESTAMPDIFF(YEAR, dob, today): whole years, birthday counts on the day
+    return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
+
+@pytest.mark.parametrize("today", [date(2024, 6, 15), date(2024, 2, 29), date(2025, 2, 28),
+                                   date(2025, 3, 1), date(2025, 1, 1), date(2024, 12, 31)])
+@pytest.mark.parametrize("dob", [date(2000, 2, 29), date(2000, 3, 1), date(2000, 2, 28),
+                                 date(1999, 6, 15), date(1999, 6, 16), date(2000, 1, 1),
+                                 date(1999, 12, 31), date(2001, 6, 14)])
+def test_age_dob_bounds_match_timestampdiff(today, dob):
+    s = dob.isoformat()
+    for age in range(20, 28):
+        lo, hi = age_dob_bounds(age, today)
+        assert (lo < s <= hi) == (age_on(dob, today) == age), (age, lo, hi)
+
+
+def test_age_dob_bounds_format():
+    assert age_dob_bounds(25, date(2024, 6, 5)) == ("1998-06-05", "1999-06-05")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import app
+    from fakes import FakeDB
+    db = FakeDB()
+    db.players.insert_many([
+        {"_id": 1, "player_id": 1, "name": "a", "position": "Attack", "current_club_id": 5, "market_value_eur": 10},
+        {"_id": 2, "player_id": 2, "name": "b", "position": "Attack", "current_club_id": 5, "market_value_eur": 30},
+        {"_id": 3, "player_id": 3, "name": "c", "position": "Attack", "current_club_id": 6, "market_value_eur": None},
+        {"_id": 4, "player_id": 4, "name": "d", "position": "Defender", "current_club_id": 5, "market_value_eur": 20},
+    ])
+    monkeypatch.setattr(app, "mongo_db", db)
+    return app.app.test_client()
+
+
+def test_mongo_market_compare_filters_in_the_query(client):
+    body = client.get("/api/mongo/market-compare?category=position&value=Attack").get_json()
+    # players without a market value are left out, the rest come in value order
+    assert body["rows"] == [{"player_id": 2, "name": "b", "market_value_eur": 30},
+                            {"player_id": 1, "name": "a", "market_value_eur": 10}]
+    body = client.get("/api/mongo/market-compare?category=club&value=5&limit=2").get_json()
+    assert [r["player_id"] for r in body["rows"]] == [2, 4]
+
+
+@pytest.mark.parametrize("query", ["category=club&value=x", "category=age&value=old",
+                                   "category=height&value=1", "category=position"])
+def test_mongo_market_compare_rejects_bad_params(client, query):
+    assert client.get("/api/mongo/market-compare?" + query).status_code == 400
@@ -0,0 +1,83 @@
+import copy
+
+import pytest
+
+from migrate_appearances import legacy_fields, move_field
+from etl_full import APPEARANCE_FIELDS
+
+MISSING = object()
+
+
+def get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return MISSING
+        doc = doc[part]
+    return doc
+
+
+# Minimal evaluator for the aggregation expressions move_field builds
+def expr(doc, e):
+    if isinstance(e, str) and e.startswith("$"):
+        return get(doc, e[1:])
+    if isinstance(e, dict):
+        (op, args), = e.items()
+        if op == "$ifNull":
+            v = expr(doc, args[0])
+            return expr(doc, args[1]) if v is MISSING or v is None else v
+        if op == "$in":
+            return expr(doc, args[0]) in args[1]
+        if op == "$not":
+            return not expr(doc, args[0])
+        if op == "$cond":
+            return expr(doc, args[1]) if expr(doc, args[0]) else expr(doc, args[2])
+        raise NotImplementedError(op)
+    return e
+
+
+def unset(doc, path):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part, {})
+    doc.pop(last, None)
+
+
+def run_pipeline(doc, pipeline):
+    doc = copy.deepcopy(doc)
+    for stage in pipeline:
+        (op, arg), = stage.items()
+        if op == "$set":
+            for field, e in arg.items():
+                v = expr(doc, e)
+                if v is MISSING:
+                    doc.pop(field, None)  # a missing field path sets nothing
+                else:
+                    doc[field] = v
+        else:
+            unset(doc, arg)
+    return doc
+
+
+@pytest.mark.parametrize("doc, legacy, want", [
+    ({"_id": 1, "goal": 4}, "goal", {"_id": 1, "goals": 4}),
+    ({"_id": 1, "goals": None, "goal": 4}, "goal", {"_id": 1, "goals": 4}),
+    ({"_id": 1, "goals": "", "goal": 4}, "goal", {"_id": 1, "goals": 4}),
+    # a real canonical value, 0 included, wins over the legacy one
+    ({"_id": 1, "goals": 2, "goal": 4}, "goal", {"_id": 1, "goals": 2}),
+    ({"_id": 1, "goals": 0, "goal": 4}, "goal", {"_id": 1, "goals": 0}),
+    ({"_id": 1, "stats": {"goals": 5, "assists": 1}}, "stats.goals", {"_id": 1, "goals": 5, "stats": {"assists": 1}}),
+])
+def test_move_field(doc, legacy, want):
+    assert run_pipeline(doc, move_field("goals", legacy)) == want
+
+
+def test_move_field_is_idempotent():
+    doc = run_pipeline({"_id": 1, "mins": 90}, move_field("minutes_played", "mins"))
+    assert run_pipeline(doc, move_field("minutes_played", "mins")) == doc == {"_id": 1, "minutes_played": 90}
+
+
+def test_legacy_fields():
+    moves = list(legacy_fields())
+    assert ("game_id", "gameId") in moves and ("goals", "stats.goals") in moves
+    # canonical names and _id (copied to appearance_id separately) are never moved
+    assert not any(legacy in APPEARANCE_FIELDS or legacy == "_id" for _, legacy in moves)
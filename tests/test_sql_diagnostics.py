@@ -0,0 +1,112 @@
+from contextlib import contextmanager
+
+import pytest
+
+import app
+from app import param_shape, sql_fingerprint
+
+
+class FakeCursor:
+    def __init__(self, log):
+        self.log = log
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        self.log.append(sql)
+        if sql.startswith("SHOW SESSION STATUS"):
+            self.rows = [{"Value": str(10 * len(self.log))}]
+        elif sql.startswith("EXPLAIN ANALYZE"):
+            self.rows = [{"EXPLAIN": "-> Table scan on player"}]
+        else:
+            self.rows = [{"player_id": 1}, {"player_id": 2}]
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+class RunNow:
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+@pytest.fixture
+def sql_log(monkeypatch):
+    log = []
+
+    @contextmanager
+    def connection():
+        class Conn:
+            def cursor(self):
+                return FakeCursor(log)
+        yield Conn()
+    monkeypatch.setattr(app, "sql_connection", connection)
+    monkeypatch.setattr(app, "_diag_worker", RunNow())
+    monkeypatch.setattr(app, "_diag_cache", app.OrderedDict())
+    return log
+
+
+SQL = "SELECT player_id FROM player WHERE current_club_id = %s LIMIT %s"
+
+
+def test_param_shape_buckets():
+    assert param_shape(None) == ""
+    assert param_shape([None, True, 7, 1234567, 2.5]) == "n,b,i1,i7,i1"
+    # string lengths bucket by powers of two, capped at 255
+    assert param_shape(["", "ab", "abc", "x" * 1000]) == "s0,s2,s2,s8"
+
+
+def test_sql_fingerprint_by_text_and_shape():
+    sql = "SELECT * FROM player WHERE name LIKE %s LIMIT %s"
+    assert sql_fingerprint(sql, ["ab%", 50]) == sql_fingerprint(sql.replace(" WHERE", "\n  WHERE"), ["xy%", 20])
+    assert sql_fingerprint(sql, ["ab%", 50]) != sql_fingerprint(sql, ["a" * 40, 50])
+    assert sql_fingerprint(sql, ["ab%", 50]) != sql_fingerprint(sql, [None, 50])
+
+
+def test_demand_mode_runs_only_the_query(sql_log, monkeypatch):
+    monkeypatch.setattr(app, "SQL_DIAG_MODE", "demand")
+    with app.app.test_request_context("/api/players"):
+        rows, ms, perf = app.run_sql_ex(SQL, (5, 20))
+    assert sql_log == [SQL] and len(rows) == 2
+    assert perf["diagnostics"] == "off" and perf["explain"] is None and perf["rows_sent"] == 2
+
+
+def test_perf_request_explains_inline(sql_log, monkeypatch):
+    monkeypatch.setattr(app, "SQL_DIAG_MODE", "demand")
+    with app.app.test_request_context("/api/players?perf=1"):
+        rows, ms, perf = app.run_sql_ex(SQL, (5, 20))
+    assert any(s.startswith("EXPLAIN ANALYZE") for s in sql_log)
+    assert perf["diagnostics"] == "inline" and perf["explain_type"] == "analyze"
+    assert perf["rows_examined"] is not None
+
+
+def test_async_mode_captures_once_and_labels_samples(sql_log, monkeypatch):
+    monkeypatch.setattr(app, "SQL_DIAG_MODE", "async")
+    with app.app.test_request_context("/api/players"):
+        _, _, first = app.run_sql_ex(SQL, (5, 20))
+        assert first["diagnostics"] == "scheduled"
+        explains = sum(s.startswith("EXPLAIN") for s in sql_log)
+        _, _, same = app.run_sql_ex(SQL, (5, 20))
+        _, _, other = app.run_sql_ex(SQL, (7, 30))
+        _, _, shape = app.run_sql_ex(SQL, (123456, 20))
+    assert sum(s.startswith("EXPLAIN") for s in sql_log) == explains + 1  # only the new shape
+    assert same["diagnostics"] == "cached" and same["explain_same_params"]
+    assert other["diagnostics"] == "cached_sample" and other["explain_query"].endswith("= 5 LIMIT 20")
+    assert shape["diagnostics"] == "scheduled"
+
+
+def test_sampled_mode_captures_one_in_n(sql_log, monkeypatch):
+    monkeypatch.setattr(app, "SQL_DIAG_MODE", "sampled")
+    monkeypatch.setattr(app, "SQL_DIAG_SAMPLE_N", 3)
+    monkeypatch.setattr(app, "_diag_counter", app.itertools.count(1))
+    with app.app.test_request_context("/api/players"):
+        labels = [app.run_sql_ex(SQL, (5, 20))[2]["diagnostics"] for _ in range(4)]
+    assert labels == ["off", "off", "scheduled", "cached"]
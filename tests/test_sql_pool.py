@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+import app
+from app import MySQLPool, PoolTimeout
+
+
+class FakeConn:
+    def __init__(self):
+        self.open = True
+        self.pings = 0
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if not self.open:
+            raise ConnectionError("gone")
+
+    def close(self):
+        self.open = False
+
+
+@pytest.fixture
+def connects(monkeypatch):
+    made = []
+
+    def connect(**kw):
+        made.append(FakeConn())
+        return made[-1]
+    monkeypatch.setattr(app.pymysql, "connect", connect)
+    return made
+
+
+def make_pool(size=2, max_lifetime=60, ping_after=30, timeout=0.2):
+    return MySQLPool(size=size, max_lifetime=max_lifetime, ping_after=ping_after, timeout=timeout)
+
+
+def test_checkout_reuses_returned_connections(connects):
+    pool = make_pool()
+    c1 = pool.acquire()
+    pool.release(c1)
+    assert pool.acquire() is c1
+    assert len(connects) == 1
+    s = pool.snapshot()
+    assert (s["checkouts"], s["created"], s["reused"], s["open"], s["in_use"]) == (2, 1, 1, 1, 1)
+
+
+def test_checkout_blocks_then_times_out_when_exhausted(connects):
+    pool = make_pool(size=1, timeout=0.1)
+    c1 = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert pool.snapshot()["timeouts"] == 1
+    # a release wakes a waiting checkout
+    threading.Timer(0.02, pool.release, (c1,)).start()
+    pool.timeout = 2
+    assert pool.acquire() is c1
+    assert pool.snapshot()["waits"] == 1
+
+
+def test_broken_and_expired_connections_are_replaced(connects):
+    pool = make_pool(size=1, max_lifetime=60, ping_after=0)
+    c1 = pool.acquire()
+    pool.release(c1, broken=True)
+    assert not c1.open and pool.snapshot()["open"] == 0
+
+    c2 = pool.acquire()
+    pool.release(c2)
+    c2.open = False  # server went away while idle: the checkout ping fails
+    pool._idle[-1] = (c2, time.time(), time.time() - 1)
+    c3 = pool.acquire()
+    assert c3 is not c2 and c2.pings == 1
+    pool.release(c3)
+
+    pool._idle[-1] = (c3, time.time() - 120, time.time())
+    c4 = pool.acquire()
+    assert c4 is not c3 and not c3.open
+    s = pool.snapshot()
+    assert (s["discarded_broken"], s["retired_lifetime"], s["open"]) == (2, 1, 1)
+
+
+def test_failed_connect_frees_the_slot(monkeypatch):
+    pool = make_pool(size=1)
+
+    def boom(**kw):
+        raise OSError("refused")
+    monkeypatch.setattr(app.pymysql, "connect", boom)
+    with pytest.raises(OSError):
+        pool.acquire()
+    assert pool.snapshot()["open"] == 0
+
+
+def test_request_pins_one_connection_until_teardown(connects, monkeypatch):
+    pool = make_pool()
+    monkeypatch.setattr(app, "sql_pool", pool)
+    with app.app.app_context(), app.app.test_request_context():
+        with app.sql_connection() as a:
+            pass
+        with app.sql_connection() as b:
+            pass
+        assert a is b and pool.snapshot()["in_use"] == 1
+    s = pool.snapshot()
+    assert (s["checkouts"], s["in_use"], s["idle"]) == (1, 0, 1)
+
+
+def test_connection_outside_a_request_is_returned(connects, monkeypatch):
+    pool = make_pool()
+    monkeypatch.setattr(app, "sql_pool", pool)
+    with app.sql_connection():
+        assert pool.snapshot()["in_use"] == 1
+    assert pool.snapshot()["in_use"] == 0
+    with pytest.raises(app.pymysql.err.OperationalError):
+        with app.sql_connection():
+            raise app.pymysql.err.OperationalError(2006, "gone away")
+    assert pool.snapshot()["open"] == 0
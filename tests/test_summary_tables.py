@@ -0,0 +1,409 @@
+import os
+import random
+import re
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+import app
+from fakes import FakeDB
+from app import (PLAYER_SEASON_REFRESH_SQL, PLAYER_SEASON_EMPTY_SQL, player_season_keys, refresh_player_season_stats,
+                 refresh_club_market_totals, dense_rank_changes, rerank_club_market,
+                 mongo_refresh_club_market)
+
+SUMMARY_SQL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "football_db_summary_tables.sql")
+
+
+# A section of football_db_summary_tables.sql in sqlite's dialect: sqlite runs
+# the same statements and triggers once the MySQL-only table options, inline
+# indexes and DELIMITER lines are gone
+def summary_script(start, end):
+    with open(SUMMARY_SQL, encoding="utf-8") as f:
+        text = f.read()
+    # end: the header of the next section, if the file has one yet
+    text = text[text.index(start):text.index(end) if end in text else None]
+    text = re.sub(r"(?m)^DELIMITER.*$", "", text).replace("END$$", "END;")
+    text = re.sub(r",\s*INDEX \w+ \([^)]*\)", "", text)
+    text = re.sub(r"\)\s*ENGINE=[^;]*;", ");", text)
+    return text.replace("NULLIF(transfer_fee,0) /", "NULLIF(transfer_fee,0) * 1.0 /")
+
+
+def roi_script():
+    return summary_script("-- CLUB TRANSFER ROI", "DELIMITER ;")
+
+
+@pytest.fixture
+def db():
+    db = sqlite3.connect(":memory:")
+    db.executescript("""
+      CREATE TABLE transfer (transfer_id INTEGER PRIMARY KEY, player_id INT, transfer_date TEXT,
+                             transfer_season TEXT, from_club_id INT, to_club_id INT,
+                             transfer_fee INT, market_value_in_eur INT);
+      CREATE TABLE appearance (appearance_id TEXT PRIMARY KEY, player_id INT, date TEXT,
+                               minutes_played INT, goals INT, assists INT);
+      INSERT INTO transfer VALUES (1, 7, '2020-01-01', '19/20', 1, 2, 1000000, 500000),
+                                  (2, 7, '2021-07-01', '21/22', 2, 3, 0, 800000);
+      INSERT INTO appearance VALUES ('a', 7, '2019-12-01', 90, 1, 0), ('b', 7, '2020-02-01', 90, 1, NULL),
+                                    ('c', 7, '2021-08-01', 45, NULL, 1);
+    """)
+    db.executescript(roi_script())
+    return db
+
+
+ROI_COLS = "transfer_id, club_id, player_id, post_apps, post_minutes, post_goals, post_assists"
+
+
+def roi(db):
+    return db.execute(f"SELECT {ROI_COLS} FROM club_transfer_roi ORDER BY transfer_id").fetchall()
+
+
+def recomputed(db):
+    return db.execute(f"""
+      SELECT t.transfer_id, t.to_club_id, t.player_id, COUNT(a.appearance_id), COALESCE(SUM(a.minutes_played),0),
+             COALESCE(SUM(a.goals),0), COALESCE(SUM(a.assists),0)
+      FROM transfer t LEFT JOIN appearance a ON a.player_id = t.player_id AND a.date >= t.transfer_date
+      GROUP BY t.transfer_id ORDER BY t.transfer_id""").fetchall()
+
+
+def test_backfill_counts_appearances_on_or_after_the_transfer(db):
+    assert roi(db) == [(1, 2, 7, 2, 135, 1, 1), (2, 3, 7, 1, 45, 0, 1)]
+    fee = db.execute("SELECT eur_per_minutes, eur_per_contrib FROM club_transfer_roi ORDER BY transfer_id").fetchall()
+    # a zero fee has no ratio
+    assert fee == [(round(1000000 / 135, 2), 500000.0), (None, None)]
+
+
+def test_triggers_keep_the_table_equal_to_a_rebuild(db):
+    rng = random.Random(5)
+    days = [f"20{y}-{m:02d}-01" for y in (19, 20, 21, 22) for m in (1, 4, 7, 10)]
+    for step in range(300):
+        op = rng.random()
+        apps = [r[0] for r in db.execute("SELECT appearance_id FROM appearance")]
+        transfers = [r[0] for r in db.execute("SELECT transfer_id FROM transfer")]
+        if op < 0.35:
+            db.execute("INSERT INTO appearance VALUES (?, ?, ?, ?, ?, ?)",
+                       (f"x{step}", rng.choice((7, 8)), rng.choice(days), rng.randint(0, 90),
+                        rng.choice((None, 0, 1, 2)), rng.choice((None, 0, 1))))
+        elif op < 0.55 and apps:
+            db.execute("UPDATE appearance SET player_id = ?, date = ?, goals = ? WHERE appearance_id = ?",
+                       (rng.choice((7, 8)), rng.choice(days), rng.choice((None, 3)), rng.choice(apps)))
+        elif op < 0.7 and apps:
+            db.execute("DELETE FROM appearance WHERE appearance_id = ?", (rng.choice(apps),))
+        elif op < 0.8:
+            db.execute("INSERT INTO transfer VALUES (?, ?, ?, '', 1, ?, ?, 0)",
+                       (100 + step, rng.choice((7, 8)), rng.choice(days), rng.randint(1, 5), rng.randint(0, 10**6)))
+        elif op < 0.92 and transfers:
+            db.execute("UPDATE transfer SET transfer_date = ?, to_club_id = ? WHERE transfer_id = ?",
+                       (rng.choice(days), rng.randint(1, 5), rng.choice(transfers)))
+        elif transfers:
+            db.execute("DELETE FROM transfer WHERE transfer_id = ?", (rng.choice(transfers),))
+        assert roi(db) == recomputed(db), step
+
+
+# pymysql-style DictCursor over sqlite for the app's upkeep statements.
+# ON DUPLICATE KEY UPDATE maps onto sqlite's upsert; unlike MySQL, an unchanged
+# row counts as affected, which only costs refresh_player_season_stats its
+# emptiness check. sqlite has no row locks, so FOR UPDATE is dropped.
+def to_sqlite(sql):
+    sql = sql.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET").replace("FOR UPDATE", "")
+    return re.sub(r"VALUES\((\w+)\)", r"excluded.\1", sql).replace("%s", "?")
+
+
+class SqliteCursor:
+    def __init__(self, db):
+        self.db, self.cur = db, None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        self.cur = self.db.execute(to_sqlite(sql), params)
+        self.rowcount = self.cur.rowcount
+
+    def executemany(self, sql, seq):
+        self.cur = self.db.executemany(to_sqlite(sql), seq)
+        self.rowcount = self.cur.rowcount
+
+    def fetchone(self):
+        row = self.cur.fetchone()
+        return dict(zip([d[0] for d in self.cur.description], row)) if row else None
+
+    def fetchall(self):
+        cols = [d[0] for d in self.cur.description]
+        return [dict(zip(cols, r)) for r in self.cur.fetchall()]
+
+
+@pytest.fixture
+def stats_db():
+    db = sqlite3.connect(":memory:")
+    db.executescript("""
+      CREATE TABLE game (game_id INTEGER PRIMARY KEY, competition_id TEXT, season TEXT);
+      CREATE TABLE appearance (appearance_id TEXT PRIMARY KEY, game_id INT, player_id INT, player_club_id INT,
+                               minutes_played INT, goals INT, assists INT, yellow_cards INT, red_cards INT);
+      INSERT INTO game VALUES (1, 'GB1', '2020'), (2, 'GB1', '2020'), (3, NULL, '2020'), (4, 'CL', NULL);
+      INSERT INTO appearance VALUES ('1_7', 1, 7, 10, 90, 2, 0, 1, 0), ('2_7', 2, 7, 11, 80, 1, 1, 0, 0),
+                                    ('3_7', 3, 7, 10, 90, NULL, 0, 0, 0), ('4_8', 4, 8, 12, 10, 0, NULL, 0, 1);
+    """)
+    db.executescript(summary_script("-- PLAYER SEASON STATS", "-- CLUB MARKET TOTALS"))
+    return db
+
+
+STATS_COLS = "player_id, competition_id, season, apps, minutes, goals, assists, yellows, reds, top_club_id, top_club_goals"
+
+
+def stats(db):
+    return db.execute(f"SELECT {STATS_COLS} FROM player_season_stats ORDER BY player_id, competition_id, season").fetchall()
+
+
+def test_backfill_keys_null_competition_and_season_as_empty(stats_db):
+    assert stats(stats_db) == [(7, "", "2020", 1, 90, None, 0, 0, 0, 10, None),
+                               (7, "GB1", "2020", 2, 170, 3, 1, 1, 0, 10, 2),
+                               (8, "CL", "", 1, 10, 0, None, 0, 1, 12, 0)]
+
+
+def test_refresh_matches_a_rebuild_after_every_write(stats_db):
+    db, cur, rng = stats_db, SqliteCursor(stats_db), random.Random(3)
+    rebuild = summary_script("INSERT INTO player_season_stats", "-- CLUB MARKET TOTALS")
+    rebuild = rebuild[rebuild.index("WITH per AS"):].strip().rstrip(";") + " ORDER BY 1, 2, 3"
+
+    def keys_of(where, params):
+        return player_season_keys(cur, where, params)
+
+    for step in range(200):
+        apps = [r[0] for r in db.execute("SELECT appearance_id FROM appearance")]
+        op = rng.random()
+        if op < 0.4:
+            aid = f"x{step}"
+            db.execute("INSERT INTO appearance VALUES (?, ?, ?, ?, 90, ?, 0, 0, 0)",
+                       (aid, rng.randint(1, 4), rng.choice((7, 8)), rng.choice((10, 11)), rng.choice((None, 0, 1, 2))))
+            keys = keys_of("a.appearance_id = ?", (aid,))
+        elif op < 0.6 and apps:
+            aid = rng.choice(apps)
+            keys = keys_of("a.appearance_id = ?", (aid,))
+            db.execute("UPDATE appearance SET game_id = ?, goals = ? WHERE appearance_id = ?",
+                       (rng.randint(1, 4), rng.randint(0, 3), aid))
+            keys |= keys_of("a.appearance_id = ?", (aid,))
+        elif op < 0.8 and apps:
+            aid = rng.choice(apps)
+            keys = keys_of("a.appearance_id = ?", (aid,))
+            db.execute("DELETE FROM appearance WHERE appearance_id = ?", (aid,))
+        else:
+            gid = rng.randint(1, 4)
+            keys = keys_of("a.game_id = ?", (gid,))
+            db.execute("UPDATE game SET competition_id = ?, season = ? WHERE game_id = ?",
+                       (rng.choice(("GB1", "CL", None)), rng.choice(("2020", "2021", None)), gid))
+            keys |= keys_of("a.game_id = ?", (gid,))
+        refresh_player_season_stats(cur, keys)
+        assert stats(db) == db.execute(rebuild).fetchall(), step
+
+
+class ScriptedCursor:
+    def __init__(self, affected, empty):
+        self.affected, self.empty, self.log = affected, empty, []
+
+    def execute(self, sql, params=()):
+        self.log.append((sql, params))
+        self.rowcount = self.affected.get(params[:3], 0)
+
+    def fetchone(self):
+        return self.empty[self.log[-1][1][:3]]
+
+
+def test_refresh_upserts_in_key_order_and_deletes_only_emptied_rows():
+    keys = {(9, "GB1", "2020"), (2, "", "2021"), (5, "CL", "")}
+    cur = ScriptedCursor(affected={(9, "GB1", "2020"): 1},
+                         empty={(2, "", "2021"): {"has_apps": 0, "has_row": 1},
+                                (5, "CL", ""): {"has_apps": 1, "has_row": 1}})  # unchanged
+    refresh_player_season_stats(cur, keys)
+    upserts = [p[:3] for sql, p in cur.log if sql is PLAYER_SEASON_REFRESH_SQL]
+    assert upserts == sorted(keys)
+    deletes = [p for sql, p in cur.log if sql.startswith("DELETE")]
+    assert deletes == [(2, "", "2021")]
+    assert sum(sql is PLAYER_SEASON_EMPTY_SQL for sql, _ in cur.log) == 2
+
+
+def test_dense_rank_changes_only_returns_changed_rows():
+    rows = [(1, 900, 1), (2, 800, 2), (3, 800, 2), (4, 700, 4), (5, 600, None)]
+    assert dense_rank_changes(rows, 0) == [(3, 4), (4, 5)]
+    assert dense_rank_changes([(7, 500, 3)], 2) == []
+    assert dense_rank_changes([], 5) == []
+
+
+@pytest.fixture
+def market_db(monkeypatch):
+    db = sqlite3.connect(":memory:", check_same_thread=False)
+    db.executescript("""
+      CREATE TABLE club (club_id INTEGER PRIMARY KEY, name TEXT);
+      CREATE TABLE player (player_id INTEGER PRIMARY KEY, current_club_id INT, market_value_eur INT);
+    """)
+    rng = random.Random(18)
+    db.executemany("INSERT INTO club VALUES (?, '')", [(c,) for c in range(1, 16)])
+    db.executemany("INSERT INTO player VALUES (?, ?, ?)",
+                   [(p, rng.randint(1, 15), rng.choice((None, 100, 200, 300, 500))) for p in range(60)])
+    # the backfill's UPDATE ... JOIN is MySQL-only: the first full re-rank sets the ranks instead
+    db.executescript(summary_script("-- CLUB MARKET TOTALS", "UPDATE club_market_totals t"))
+
+    # GET_LOCK / RELEASE_LOCK as MySQL's named locks, without the wait
+    NAMED_LOCKS.clear()
+    db.create_function("GET_LOCK", 2, lambda name, timeout: 0 if name in NAMED_LOCKS else NAMED_LOCKS.add(name) or 1)
+    db.create_function("RELEASE_LOCK", 1, lambda name: NAMED_LOCKS.discard(name) or 1)
+
+    class Conn:
+        def cursor(self):
+            return SqliteCursor(db)
+
+    @contextmanager
+    def connection():
+        yield Conn()
+
+    @contextmanager
+    def transaction():
+        TRANSACTIONS.append(set(NAMED_LOCKS))
+        yield SqliteCursor(db)
+        db.commit()
+    monkeypatch.setattr(app, "sql_connection", connection)
+    monkeypatch.setattr(app, "sql_transaction", transaction)
+    rerank_club_market(10**18)
+    return db
+
+
+NAMED_LOCKS, TRANSACTIONS = set(), []
+
+
+def market(db):
+    return db.execute("SELECT club_id, total_market_value_eur, player_count, market_value_rank "
+                      "FROM club_market_totals ORDER BY club_id").fetchall()
+
+
+def rebuilt_market(db):
+    return db.execute("""
+      SELECT club_id, total, n, DENSE_RANK() OVER (ORDER BY total DESC) FROM (
+        SELECT c.club_id, COALESCE(SUM(p.market_value_eur),0) AS total, COUNT(p.player_id) AS n
+        FROM club c LEFT JOIN player p ON p.current_club_id = c.club_id AND p.market_value_eur IS NOT NULL
+        GROUP BY c.club_id) ORDER BY club_id""").fetchall()
+
+
+def test_club_market_stays_equal_to_a_full_rank(market_db):
+    db, rng = market_db, random.Random(7)
+    assert market(db) == rebuilt_market(db)
+    for step in range(200):
+        op = rng.random()
+        clubs = [r[0] for r in db.execute("SELECT club_id FROM club")]
+        pid = rng.randrange(80)
+        old = db.execute("SELECT current_club_id FROM player WHERE player_id = ?", (pid,)).fetchone()
+        touched = {old[0]} if old else set()
+        if op < 0.8:
+            club = rng.choice(clubs)
+            db.execute("INSERT INTO player VALUES (?, ?, ?) ON CONFLICT DO UPDATE SET "
+                       "current_club_id = excluded.current_club_id, market_value_eur = excluded.market_value_eur",
+                       (pid, club, rng.choice((None, 0, 100, 200, 300, 500, 800))))
+            touched.add(club)
+        elif op < 0.9:
+            db.execute("DELETE FROM player WHERE player_id = ?", (pid,))
+        elif op < 0.95:
+            cid = max(clubs) + 1
+            db.execute("INSERT INTO club VALUES (?, '')", (cid,))
+            touched = {cid}
+        else:
+            cid = rng.choice(clubs)
+            db.execute("DELETE FROM club WHERE club_id = ?", (cid,))
+            db.execute("UPDATE player SET current_club_id = NULL WHERE current_club_id = ?", (cid,))
+            touched = {cid}
+        # as the app does it: totals in the write transaction, ranks after commit
+        with app.sql_transaction() as cur:
+            bound = refresh_club_market_totals(cur, touched)
+        rerank_club_market(bound)
+        assert market(db) == rebuilt_market(db), step
+
+
+def test_rerank_queued_behind_a_running_one_is_not_lost(market_db):
+    db = market_db
+    db.execute("UPDATE player SET market_value_eur = 99999 WHERE player_id = 0")
+    club = db.execute("SELECT current_club_id FROM player WHERE player_id = 0").fetchone()[0]
+    with app.sql_transaction() as cur:
+        bound = refresh_club_market_totals(cur, {club})
+    # another thread is re-ranking: this call only queues its bound
+    app._club_rank_running.acquire()
+    try:
+        rerank_club_market(bound)
+        assert market(db) != rebuilt_market(db)
+    finally:
+        app._club_rank_running.release()
+    # the next re-rank (for any bound) drains the queued, higher one
+    rerank_club_market(0)
+    assert market(db) == rebuilt_market(db)
+
+
+def test_rerank_is_serialised_across_processes(market_db):
+    db = market_db
+    TRANSACTIONS.clear()
+    rerank_club_market(0)
+    assert TRANSACTIONS == [{"club_market_rerank"}] and not NAMED_LOCKS
+    db.execute("UPDATE player SET market_value_eur = 99999 WHERE player_id = 0")
+    club = db.execute("SELECT current_club_id FROM player WHERE player_id = 0").fetchone()[0]
+    with app.sql_transaction() as cur:
+        bound = refresh_club_market_totals(cur, {club})
+    # another app process is re-ranking: this one gives up without touching the ranks
+    NAMED_LOCKS.add("club_market_rerank")
+    with pytest.raises(TimeoutError):
+        rerank_club_market(bound)
+    assert market(db) != rebuilt_market(db)
+    NAMED_LOCKS.clear()
+    # ... and its bound is still queued for the next re-rank
+    rerank_club_market(0)
+    assert market(db) == rebuilt_market(db) and not NAMED_LOCKS
+
+
+def test_mongo_club_market_refresh_takes_the_lock(monkeypatch):
+    from datetime import datetime, timedelta
+    monkeypatch.setattr(app, "CLUB_RANK_LOCK_TIMEOUT", 0)
+    db = FakeDB()
+    db.clubs.insert_many([{"_id": c, "club_id": c} for c in (1, 2)])
+    db.players.insert_one({"_id": 1, "current_club_id": 2, "market_value_eur": 100})
+    db.locks.insert_one({"_id": "club_market_rerank", "owner": "other", "expires": datetime.utcnow() + timedelta(minutes=1)})
+    with pytest.raises(TimeoutError):
+        mongo_refresh_club_market(db, [2])
+    assert "market_value_rank" not in db.clubs.docs[2]
+    # a lock left behind by a dead process expires
+    db.locks.docs["club_market_rerank"]["expires"] = datetime.utcnow() - timedelta(seconds=1)
+    mongo_refresh_club_market(db, [2])
+    assert db.clubs.docs[2]["market_value_rank"] == 1 and db.clubs.docs[1]["market_value_rank"] == 2
+    assert db.locks.docs == {}
+
+
+def test_mongo_club_market_refresh_matches_a_full_rank():
+    rng = random.Random(21)
+    db = FakeDB()
+    db.clubs.insert_many([{"_id": c, "club_id": c} for c in range(1, 13)])
+    db.players.insert_many([{"_id": p, "current_club_id": rng.randint(1, 12),
+                             "market_value_eur": rng.choice((None, 100, 300))} for p in range(40)])
+    mongo_refresh_club_market(db, range(1, 13))
+
+    def expected():
+        totals = {c: 0 for c in db.clubs.docs}
+        for p in db.players.docs.values():
+            if p.get("market_value_eur") is not None and p.get("current_club_id") in totals:
+                totals[p["current_club_id"]] += p["market_value_eur"]
+        order = sorted(set(totals.values()), reverse=True)
+        return {c: (t, order.index(t) + 1) for c, t in totals.items()}
+
+    def stored():
+        return {c: (d["total_market_value_eur"], d["market_value_rank"]) for c, d in db.clubs.docs.items()}
+
+    assert stored() == expected()
+    for step in range(150):
+        pid = rng.randrange(50)
+        before = db.players.find_one({"_id": pid}) or {}
+        if rng.random() < 0.85:
+            doc = {"_id": pid, "current_club_id": rng.randint(1, 12), "market_value_eur": rng.choice((None, 0, 100, 300, 900))}
+            db.players.replace_one({"_id": pid}, doc, upsert=True)
+            touched = [before.get("current_club_id"), doc["current_club_id"]]
+        else:
+            db.players.delete_one({"_id": pid})
+            touched = [before.get("current_club_id")]
+        mongo_refresh_club_market(db, touched)
+        assert stored() == expected(), step